@@ -32,6 +32,35 @@ OPTS = [
                help='The Agent TCP Backlog'),
     cfg.FloatOpt('tcp-recv-timeout', default=0.5,
                  help='Agent TCP Receive Timeout'),
+    cfg.FloatOpt('tcp-idle-timeout', default=10.0,
+                 help='Seconds an idle TCP connection is kept open waiting '
+                      'for further queries'),
+    cfg.IntOpt('tcp-max-connections', default=16,
+               help='Maximum number of TCP connections a single client '
+                    'address may hold open, 0 for no limit'),
+    cfg.IntOpt('udp-recv-size', default=8192,
+               help='Size in bytes of the buffer UDP queries are received '
+                    'into, larger queries are truncated'),
+    cfg.IntOpt('edns-udp-size', default=1232,
+               help='EDNS0 UDP payload size advertised in responses, and the '
+                    'largest UDP response sent, larger responses are '
+                    'truncated for the requester to retry over TCP'),
+    cfg.FloatOpt('graceful-shutdown-timeout', default=10.0,
+                 help='Seconds a stopping worker waits for the requests it '
+                      'is handling to complete'),
+    cfg.IntOpt('stats-interval', default=300,
+               help='Interval in seconds at which each worker logs its '
+                    'request counters, 0 disables'),
+    cfg.IntOpt('handler-pool-size', default=100,
+               help='Number of greenthreads handling DNS requests in each '
+                    'worker'),
+    cfg.IntOpt('handler-queue-depth', default=1000,
+               help='Number of DNS requests that may wait for a handler, '
+                    'further requests are shed'),
+    cfg.StrOpt('overload-policy', default='refuse',
+               choices=['drop', 'refuse'],
+               help='How requests are shed when the handler queue is full, '
+                    'either drop them or answer REFUSED'),
     cfg.ListOpt('allow-notify', default=[],
                 help='List of IP addresses allowed to NOTIFY The Agent'),
     cfg.ListOpt('masters', default=[],
@@ -41,8 +70,9 @@ OPTS = [
     cfg.StrOpt('transfer-source', default=None,
                help='An IP address to be used to fetch zones transferred in'),
     cfg.FloatOpt('notify-delay', default=0.0,
-               help='Delay after a NOTIFY arrives for a zone that the Agent '
-               'will pause and drop subsequent NOTIFYs for that zone'),
+                 help='Delay after a NOTIFY arrives for a zone before the '
+                      'Agent updates it, further NOTIFYs for the zone in '
+                      'the meantime are coalesced into the one update'),
 ]
 
 cfg.CONF.register_opts(OPTS, group='service:agent')
@@ -148,24 +148,16 @@ class RequestHandler(object):
         * Does a serial check to see if further action needs to be taken
         * Kicks off an AXFR and returns a valid response
         """
+        refused = self.check_notify(request)
+        if refused is not None:
+            return refused
+
         response = dns.message.make_response(request)
 
         question = request.question[0]
         requester = request.environ['addr'][0]
         domain_name = question.name.to_text()
 
-        if not self._allowed(request, requester, "NOTIFY", domain_name):
-            response.set_rcode(dns.rcode.from_text("REFUSED"))
-            return response
-
-        serial = self.backend.find_domain_serial(domain_name)
-
-        if serial is None:
-            LOG.warn(_LW("Refusing NOTIFY for %(name)s, doesn't exist") %
-                 {'name': domain_name})
-            response.set_rcode(dns.rcode.from_text("REFUSED"))
-            return response
-
         LOG.debug("Received %(verb)s for %(name)s from %(host)s" %
                  {'verb': "NOTIFY", 'name': domain_name, 'host': requester})
 
@@ -190,6 +182,33 @@ class RequestHandler(object):
 
         return response
 
+    def check_notify(self, request):
+        """
+        Checks whether a NOTIFY should be acted on.
+
+        * Checks if the master sending the NOTIFY is allowed to notify
+        * Checks if the zone exists
+
+        :param request: The decoded NOTIFY from the wire.
+        :return: A REFUSED response if the NOTIFY should be refused, otherwise
+                 None
+        """
+        question = request.question[0]
+        requester = request.environ['addr'][0]
+        domain_name = question.name.to_text()
+
+        if not self._allowed(request, requester, "NOTIFY", domain_name):
+            return self._handle_query_error(request, dns.rcode.REFUSED)
+
+        serial = self.backend.find_domain_serial(domain_name)
+
+        if serial is None:
+            LOG.warn(_LW("Refusing NOTIFY for %(name)s, doesn't exist") %
+                 {'name': domain_name})
+            return self._handle_query_error(request, dns.rcode.REFUSED)
+
+        return None
+
     def _handle_delete(self, request):
         """
         Constructs the response to a DELETE and acts accordingly on it.
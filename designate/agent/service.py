@@ -34,6 +34,8 @@ class Service(service.DNSService, service.Service):
         backend_driver = cfg.CONF['service:agent'].backend_driver
         self.backend = agent_backend.get_backend(backend_driver, self)
 
+        self.notify_limiter = None
+
     @property
     def service_name(self):
         return 'agent'
@@ -45,10 +47,20 @@ class Service(service.DNSService, service.Service):
         application = handler.RequestHandler()
         if cfg.CONF['service:agent'].notify_delay > 0.0:
             application = dnsutils.LimitNotifyMiddleware(application)
-        application = dnsutils.SerializationMiddleware(application)
+            self.notify_limiter = application
+        application = dnsutils.SerializationMiddleware(
+            application, edns_udp_size=cfg.CONF['service:agent'].edns_udp_size)
 
         return application
 
+    def dns_stats(self):
+        stats = super(Service, self).dns_stats()
+
+        if self.notify_limiter is not None:
+            stats.update(self.notify_limiter.stats())
+
+        return stats
+
     def start(self):
         super(Service, self).start()
         self.backend.start()
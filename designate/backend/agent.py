@@ -123,6 +123,10 @@ class AgentPoolBackend(base.Backend):
                  {'msg': str(opcode),
                   'zone': domain_name, 'server': dest_ip,
                   'port': dest_port})
+        # The agent only answers a CREATE once it has transferred and
+        # created the zone, its round trip time says nothing of how quickly
+        # it will answer the next message, so the configured timeout is
+        # always used.
         response = self._send_dns_message(
             dns_message, dest_ip, dest_port, timeout)
 
@@ -135,6 +139,7 @@ class AgentPoolBackend(base.Backend):
                       'port': dest_port, 'timeout': timeout,
                       'retry': retry})
             response = None
+            return (response, retry)
         elif isinstance(response, dns_query.BadResponse):
             LOG.warn(_LW("Got BadResponse while trying to send '%(msg)s' "
                          "for '%(zone)s' to '%(server)s:%(port)d'. Timeout"
@@ -145,9 +150,10 @@ class AgentPoolBackend(base.Backend):
                       'retry': retry})
             response = None
             return (response, retry)
+
         # Check that we actually got a NOERROR in the rcode and and an
         # authoritative answer
-        elif not (response.flags & dns.flags.AA) or dns.rcode.from_flags(
+        if not (response.flags & dns.flags.AA) or dns.rcode.from_flags(
                 response.flags, response.ednsflags) != dns.rcode.NOERROR:
             LOG.warn(_LW("Failed to get expected response while trying to "
                          "send '%(msg)s' for '%(zone)s' to '%(server)s:"
@@ -156,9 +162,6 @@ class AgentPoolBackend(base.Backend):
                       'zone': domain_name, 'server': dest_ip,
                       'port': dest_port, 'resp': str(response)})
             response = None
-            return (response, retry)
-        else:
-            return (response, retry)
 
         return (response, retry)
 
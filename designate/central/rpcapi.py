@@ -36,6 +36,8 @@ class CentralAPI(rpc_proxy.RpcProxy):
         3.1 - Add floating ip ptr methods
         3.2 - TLD Api changes
         3.3 - Add methods for blacklisted domains
+        3.4 - Add purge_journal
+        3.5 - Add apply_domain_changes
     """
     def __init__(self, topic=None):
         topic = topic if topic else cfg.CONF.central_topic
@@ -221,6 +223,18 @@ class CentralAPI(rpc_proxy.RpcProxy):
 
         return self.call(context, msg)
 
+    def apply_domain_changes(self, context, domain_id, values, recordsets,
+                             deletions):
+        LOG.info("apply_domain_changes: Calling central's "
+                 "apply_domain_changes.")
+        msg = self.make_msg('apply_domain_changes',
+                            domain_id=domain_id,
+                            values=values,
+                            recordsets=recordsets,
+                            deletions=deletions)
+
+        return self.call(context, msg, version='3.5')
+
     def delete_domain(self, context, domain_id):
         LOG.info("delete_domain: Calling central's delete_domain.")
         msg = self.make_msg('delete_domain', domain_id=domain_id)
@@ -524,3 +538,11 @@ class CentralAPI(rpc_proxy.RpcProxy):
         msg = self.make_msg('delete_blacklist', blacklist_id=blacklist_id)
 
         return self.call(context, msg, version='3.3')
+
+    # Zone Journal Methods
+    def purge_journal(self, context, max_age=None, max_versions=None):
+        LOG.info("purge_journal: Calling central's purge_journal.")
+        msg = self.make_msg('purge_journal', max_age=max_age,
+                            max_versions=max_versions)
+
+        return self.call(context, msg, version='3.4')
@@ -16,7 +16,9 @@
 # under the License.
 import re
 import contextlib
+import datetime
 from oslo.config import cfg
+from oslo_utils import timeutils
 from designate.openstack.common import log as logging
 from designate.openstack.common.rpc import service as rpc_service
 from designate.openstack.common.notifier import proxy as notifier
@@ -45,7 +47,7 @@ def wrap_backend_call():
 
 
 class Service(rpc_service.Service):
-    RPC_API_VERSION = '3.3'
+    RPC_API_VERSION = '3.5'
 
     def __init__(self, *args, **kwargs):
         backend_driver = cfg.CONF['service:central'].backend_driver
@@ -260,6 +262,44 @@ class Service(rpc_service.Service):
 
         return domain
 
+    def _journal_record_change(self, context, domain, updated_domain,
+                               recordset, deleted=(), added=()):
+        """
+        Record the RRs removed from and added to a domain by a serial
+        increment, so mdns can answer IXFR requests with the difference.
+
+        Must be called within the storage transaction changing the records,
+        the journal entries are then only committed along with the records
+        and the serial increment.
+        """
+        ttl = recordset['ttl'] or domain['ttl']
+
+        def _entry(operation, record):
+            return {
+                'serial': updated_domain['serial'],
+                'previous_serial': domain['serial'],
+                'operation': operation,
+                'name': recordset['name'],
+                'type': recordset['type'],
+                'ttl': ttl,
+                'data': record['data'],
+            }
+
+        entries = [_entry('DELETE', r) for r in deleted]
+        entries.extend(_entry('ADD', r) for r in added)
+
+        # Storage transactions nest, this one is a part of the caller's
+        with self.storage_api.create_journal_entries(
+                context, domain['id'], entries):
+            pass  # NOTE: No other systems need updating
+
+    def _invalidate_journal(self, context, domain_id):
+        # Changes made without a serial increment can't be expressed as a
+        # difference between two versions, drop the journal so IXFR clients
+        # fall back to a full AXFR.
+        with self.storage_api.delete_journal_entries(context, domain_id):
+            pass  # NOTE: No other systems need updating
+
     # Quota Enforcement Methods
     def _enforce_domain_quota(self, context, tenant_id):
         criterion = {'tenant_id': tenant_id}
@@ -639,6 +679,81 @@ class Service(rpc_service.Service):
 
         return domain
 
+    def apply_domain_changes(self, context, domain_id, values, recordsets,
+                             deletions):
+        """
+        Bring a secondary domain up to date with a transfer from its masters
+
+        :param values: The domain values taken from the transferred SOA.
+        :param recordsets: The RecordSets which are new or differ from the
+                           stored ones, as dicts of name, type, ttl and a list
+                           of the records' data.
+        :param deletions: The (name, type) of RecordSets no longer in the
+                          domain.
+        """
+        domain = self.storage_api.get_domain(context, domain_id)
+
+        target = {
+            'domain_id': domain_id,
+            'domain_name': domain['name'],
+            'tenant_id': domain['tenant_id']
+        }
+
+        policy.check('update_domain', context, target)
+
+        # The serial is the masters', so none of the changes increment it
+        for name, type_ in deletions:
+            try:
+                recordset = self.storage_api.find_recordset(
+                    context, {'domain_id': domain_id, 'name': name,
+                              'type': type_})
+            except exceptions.RecordSetNotFound:
+                continue
+
+            self.delete_recordset(context, domain_id, recordset['id'],
+                                  increment_serial=False)
+
+        for recordset_values in recordsets:
+            self._apply_recordset_changes(context, domain_id,
+                                          recordset_values)
+
+        values = dict(values, transferred_at=timeutils.utcnow())
+
+        return self.update_domain(context, domain_id, values,
+                                  increment_serial=False)
+
+    def _apply_recordset_changes(self, context, domain_id, values):
+        criterion = {'domain_id': domain_id, 'name': values['name'],
+                     'type': values['type']}
+
+        try:
+            recordset = self.storage_api.find_recordset(context, criterion)
+        except exceptions.RecordSetNotFound:
+            recordset = self.create_recordset(
+                context, domain_id, {'name': values['name'],
+                                     'type': values['type'],
+                                     'ttl': values['ttl']})
+        else:
+            if recordset['ttl'] != values['ttl']:
+                recordset = self.update_recordset(
+                    context, domain_id, recordset['id'],
+                    {'ttl': values['ttl']}, increment_serial=False)
+
+        # Only the records which differ are deleted and created
+        data = set(values['records'])
+
+        criterion = {'domain_id': domain_id, 'recordset_id': recordset['id']}
+        for record in self.storage_api.find_records(context, criterion):
+            if record['data'] in data:
+                data.remove(record['data'])
+            else:
+                self.delete_record(context, domain_id, recordset['id'],
+                                   record['id'], increment_serial=False)
+
+        for item in sorted(data):
+            self.create_record(context, domain_id, recordset['id'],
+                               {'data': item}, increment_serial=False)
+
     def delete_domain(self, context, domain_id):
         domain = self.storage_api.get_domain(context, domain_id)
 
@@ -849,6 +964,9 @@ class Service(rpc_service.Service):
             if increment_serial:
                 self._increment_domain_serial(context, domain_id)
 
+            # Changes to a whole RecordSet are not journaled
+            self._invalidate_journal(context, domain_id)
+
         # Send RecordSet update notification
         self.notifier.info(context, 'dns.recordset.update', recordset)
 
@@ -880,6 +998,9 @@ class Service(rpc_service.Service):
             if increment_serial:
                 self._increment_domain_serial(context, domain_id)
 
+            # Changes to a whole RecordSet are not journaled
+            self._invalidate_journal(context, domain_id)
+
         # Send Record deletion notification
         self.notifier.info(context, 'dns.recordset.delete', recordset)
 
@@ -922,7 +1043,12 @@ class Service(rpc_service.Service):
                 self.backend.create_record(context, domain, recordset, record)
 
             if increment_serial:
-                self._increment_domain_serial(context, domain_id)
+                updated_domain = self._increment_domain_serial(
+                    context, domain_id)
+                self._journal_record_change(context, domain, updated_domain,
+                                            recordset, added=[record])
+            else:
+                self._invalidate_journal(context, domain_id)
 
         # Send Record creation notification
         self.notifier.info(context, 'dns.record.create', record)
@@ -1029,6 +1155,8 @@ class Service(rpc_service.Service):
 
         policy.check('update_record', context, target)
 
+        original_record = record
+
         # Update the record
         with self.storage_api.update_record(
                 context, record_id, values) as record:
@@ -1036,7 +1164,14 @@ class Service(rpc_service.Service):
                 self.backend.update_record(context, domain, recordset, record)
 
             if increment_serial:
-                self._increment_domain_serial(context, domain_id)
+                updated_domain = self._increment_domain_serial(
+                    context, domain_id)
+                self._journal_record_change(context, domain, updated_domain,
+                                            recordset,
+                                            deleted=[original_record],
+                                            added=[record])
+            else:
+                self._invalidate_journal(context, domain_id)
 
         # Send Record update notification
         self.notifier.info(context, 'dns.record.update', record)
@@ -1074,7 +1209,12 @@ class Service(rpc_service.Service):
                 self.backend.delete_record(context, domain, recordset, record)
 
             if increment_serial:
-                self._increment_domain_serial(context, domain_id)
+                updated_domain = self._increment_domain_serial(
+                    context, domain_id)
+                self._journal_record_change(context, domain, updated_domain,
+                                            recordset, deleted=[record])
+            else:
+                self._invalidate_journal(context, domain_id)
 
         # Send Record deletion notification
         self.notifier.info(context, 'dns.record.delete', record)
@@ -1092,6 +1232,23 @@ class Service(rpc_service.Service):
         policy.check('count_records', context, target)
         return self.storage_api.count_records(context, criterion)
 
+    # Zone Journal Methods
+    def purge_journal(self, context, max_age=None, max_versions=None):
+        policy.check('purge_journal', context)
+
+        created_before = None
+        if max_age:
+            created_before = timeutils.utcnow() - datetime.timedelta(
+                seconds=max_age)
+
+        with self.storage_api.purge_journal(
+                context, created_before, max_versions) as count:
+            pass  # NOTE: No other systems need updating
+
+        LOG.debug('Purged %d zone journal entries', count)
+
+        return count
+
     # Diagnostics Methods
     def sync_domains(self, context):
         policy.check('diagnostics_sync_domains', context)
@@ -13,17 +13,26 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import collections
 import random
 import socket
+import struct
 import base64
 import time
-from threading import Lock
 
 import six
 import dns
 import dns.exception
+import dns.flags
+import dns.message
+import dns.query
+import dns.rcode
+import dns.rdatatype
 import dns.zone
 import eventlet
+import eventlet.event
+import eventlet.queue
+import eventlet.semaphore
 from dns import rdatatype
 from oslo_log import log as logging
 from oslo_config import cfg
@@ -33,14 +42,37 @@ from designate import exceptions
 from designate import objects
 from designate.i18n import _LE
 from designate.i18n import _LI
+from designate.i18n import _LW
 
 LOG = logging.getLogger(__name__)
 
 
 util_opts = [
-    cfg.IntOpt('xfr_timeout', help="Timeout in seconds for XFR's.", default=10)
+    cfg.IntOpt('xfr_timeout', help="Timeout in seconds for XFR's.",
+               default=10),
+    cfg.FloatOpt('min_timeout', default=0.5,
+                 help='Lower bound in seconds of the timeout adapted to the '
+                      'round trip time of each nameserver'),
+    cfg.FloatOpt('max_retry_interval', default=60.0,
+                 help='Upper bound in seconds of the exponential backoff '
+                      'between retries to a nameserver'),
+    cfg.IntOpt('down_after', default=3,
+               help='Consecutive timeouts after which a nameserver is '
+                    'considered down, 0 never considers it down'),
+    cfg.FloatOpt('down_period', default=30.0,
+                 help='Seconds messages to a nameserver which is down fail '
+                      'without being sent'),
+    cfg.BoolOpt('xfr_probe_masters', default=False,
+                help="Query the SOA of every master concurrently before a "
+                     "transfer, and transfer from the first to answer with "
+                     "the highest serial, rather than try them in turn"),
+    cfg.FloatOpt('xfr_probe_stagger', default=0.25,
+                 help='Seconds between starting the SOA queries to each '
+                      'master, fastest first, when probing masters'),
 ]
 
+RTT_ESTIMATORS = {}
+
 
 class DNSMiddleware(object):
     """Base DNS Middleware class with some utility methods"""
@@ -78,11 +110,20 @@ class DNSMiddleware(object):
 
 
 class SerializationMiddleware(DNSMiddleware):
-    """DNS Middleware to serialize/deserialize DNS Packets"""
+    """
+    DNS Middleware to serialize/deserialize DNS Packets
+
+    Responses to requests carrying an EDNS0 OPT (RFC 6891) carry one too,
+    advertising edns_udp_size as our UDP payload size. Responses sent over
+    UDP are limited to the payload size of the requester, or 512 bytes
+    without EDNS0, and no more than edns_udp_size. Those which don't fit are
+    truncated, with the TC bit set for the requester to retry over TCP.
+    """
 
-    def __init__(self, application, tsig_keyring=None):
+    def __init__(self, application, tsig_keyring=None, edns_udp_size=1232):
         self.application = application
         self.tsig_keyring = tsig_keyring
+        self.edns_udp_size = edns_udp_size
 
     def __call__(self, request):
         # Generate the initial context. This may be updated by other middleware
@@ -133,32 +174,98 @@ class SerializationMiddleware(DNSMiddleware):
             response = self._build_error_response()
 
         else:
+            if message.edns > 0:
+                # We only speak EDNS version 0
+                yield self._to_wire(self._build_badvers_response(message),
+                                    512)
+                raise StopIteration
+
+            max_size = self._max_size(message, request.get('protocol'))
+
             # Hand the Deserialized packet onto the Application
             for response in self.application(message):
                 # Serialize and return the response if present
                 if isinstance(response, dns.message.Message):
-                    yield response.to_wire(max_size=65535)
+                    yield self._to_wire(response, max_size)
 
                 elif isinstance(response, dns.renderer.Renderer):
                     yield response.get_wire()
 
+    def _max_size(self, request, protocol):
+        """The largest response which may be sent for a request"""
+        return max_response_size(
+            protocol, request.payload if request.edns >= 0 else None,
+            self.edns_udp_size)
+
+    def _build_badvers_response(self, request):
+        response = dns.message.make_response(request)
+        response.use_edns(0, 0, self.edns_udp_size)
+        response.set_rcode(dns.rcode.BADVERS)
+
+        return response
+
+    def _to_wire(self, response, max_size):
+        if response.edns >= 0:
+            # Advertise our own payload size, not dnspython's default
+            response.payload = self.edns_udp_size
+
+        try:
+            return response.to_wire(max_size=max_size)
+        except dns.exception.TooBig:
+            pass
+
+        # The additional section is optional, try without it first (RFC 2181
+        # section 9), and failing that send the header and question alone.
+        response.additional = []
+
+        try:
+            return response.to_wire(max_size=max_size)
+        except dns.exception.TooBig:
+            LOG.debug('Response to %(q)s exceeds %(size)d bytes, truncating',
+                      {'q': response.question, 'size': max_size})
+
+        response.answer = []
+        response.authority = []
+        response.flags |= dns.flags.TC
+
+        return response.to_wire(max_size=max_size)
+
+
+def max_response_size(protocol, payload, edns_udp_size):
+    """
+    The largest response which may be sent to a requester
+
+    :param protocol: The protocol of the request, 'udp' or 'tcp'
+    :param payload: The EDNS0 UDP payload size of the request, None if it
+                    has no EDNS0 OPT
+    :param edns_udp_size: Our own EDNS0 UDP payload size
+    """
+    if protocol != 'udp':
+        return 65535
+
+    # Requesters without EDNS0 take 512 bytes over UDP (RFC 1035), and no
+    # requester may advertise less (RFC 6891)
+    if payload is None:
+        return 512
+
+    return max(min(payload, edns_udp_size), 512)
+
 
 class TsigInfoMiddleware(DNSMiddleware):
     """Middleware which looks up the information available for a TsigKey"""
 
-    def __init__(self, application, storage):
+    def __init__(self, application, storage, cache=None):
         super(TsigInfoMiddleware, self).__init__(application)
 
         self.storage = storage
+        self.cache = cache or TsigKeyCache(storage)
 
     def process_request(self, request):
         if not request.had_tsig:
             return None
 
         try:
-            criterion = {'name': request.keyname.to_text(True)}
-            tsigkey = self.storage.find_tsigkey(
-                    context.get_current(), criterion)
+            tsigkey, secret = self.cache.get(request.keyname.to_text(True))
 
             request.environ['tsigkey'] = tsigkey
             request.environ['context'].tsigkey_id = tsigkey.id
@@ -171,97 +278,495 @@ class TsigInfoMiddleware(DNSMiddleware):
         return None
 
 
+class TsigKeyCache(object):
+    """
+    A cache of TsigKeys along with their decoded secrets, shared between the
+    TsigKeyring and TsigInfoMiddleware so a signed request is served with at
+    most one storage lookup.
+
+    Entries are fetched from storage again once older than ``ttl`` seconds,
+    and the whole cache is dropped when central notifies us of a TsigKey
+    being created, updated or deleted. A ``ttl`` of 0 disables caching.
+    """
+    EVENT_TYPES = ('dns.tsigkey.create', 'dns.tsigkey.update',
+                   'dns.tsigkey.delete')
+
+    def __init__(self, storage, ttl=0):
+        self.storage = storage
+        self.ttl = ttl
+
+        self._entries = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name):
+        """
+        Fetch a TsigKey by name
+
+        :param name: The name of the TsigKey
+        :return: A tuple of the TsigKey and its decoded secret
+        :raises: TsigKeyNotFound
+        """
+        now = time.time()
+        entry = self._entries.get(name)
+
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+
+        tsigkey = self.storage.find_tsigkey(
+            context.get_current(), {'name': name})
+        value = (tsigkey, base64.decodestring(tsigkey.secret))
+
+        if self.ttl > 0:
+            self._entries[name] = (now + self.ttl, value)
+
+        return value
+
+    def invalidate(self):
+        self._entries.clear()
+
+    def info(self, ctxt, publisher_id, event_type, payload, metadata):
+        """Notification endpoint, invalidating the cache on TsigKey events"""
+        if event_type in self.EVENT_TYPES:
+            LOG.debug('Invalidating the TsigKey cache on %s', event_type)
+            self.invalidate()
+
+
 class TsigKeyring(object):
     """Implements the DNSPython KeyRing API, backed by the Designate DB"""
 
-    def __init__(self, storage):
+    def __init__(self, storage, cache=None):
         self.storage = storage
+        self.cache = cache or TsigKeyCache(storage)
 
     def __getitem__(self, key):
         return self.get(key)
 
     def get(self, key, default=None):
         try:
-            criterion = {'name': key.to_text(True)}
-            tsigkey = self.storage.find_tsigkey(
-                context.get_current(), criterion)
-
-            return base64.decodestring(tsigkey.secret)
+            tsigkey, secret = self.cache.get(key.to_text(True))
+            return secret
 
         except exceptions.TsigKeyNotFound:
             return default
 
 
-class ZoneLock(object):
-    """A Lock across all zones that enforces a rate limit on NOTIFYs"""
+class RTTEstimator(object):
+    """
+    Tracks the round trip time to each nameserver we send messages to, in
+    the manner of TCP's retransmission timer (RFC 6298), to adapt the
+    timeout of each message to its destination.
+
+    Consecutive timeouts double the timeout, and after ``down_after`` of
+    them the destination is considered down for ``down_period`` seconds,
+    during which messages to it should fail straight away rather than wait
+    for the timeout. Once the period has passed a single message is let
+    through to probe it.
+    """
+    ALPHA = 1 / 8.0
+    BETA = 1 / 4.0
+    K = 4
+
+    def __init__(self, min_timeout=0.5, max_retry_interval=60.0,
+                 down_after=3, down_period=30.0):
+        self.min_timeout = min_timeout
+        self.max_retry_interval = max_retry_interval
+        self.down_after = down_after
+        self.down_period = down_period
+
+        # destination -> [srtt, rttvar, consecutive timeouts, down until]
+        self._destinations = {}
+
+    @classmethod
+    def get_instance(cls, group):
+        """The estimator shared by every sender in a service"""
+        if group not in RTT_ESTIMATORS:
+            conf = cfg.CONF[group]
+            RTT_ESTIMATORS[group] = cls(
+                conf.min_timeout, conf.max_retry_interval, conf.down_after,
+                conf.down_period)
+
+        return RTT_ESTIMATORS[group]
+
+    def _state(self, destination):
+        return self._destinations.setdefault(
+            destination, [None, None, 0, 0.0])
+
+    def timeout(self, destination, max_timeout):
+        """
+        The timeout for the next message to a destination
 
-    def __init__(self, delay):
-        self.lock = Lock()
-        self.data = {}
-        self.delay = delay
+        :param destination: A (host, port) tuple
+        :param max_timeout: The configured timeout, which is used until the
+                            round trip time is known and is never exceeded.
+        """
+        srtt, rttvar, timeouts, down_until = self._state(destination)
+
+        if srtt is None:
+            return max_timeout
 
-    def acquire(self, zone):
-        with self.lock:
-            # If no one holds the lock for the zone, grant it
-            if zone not in self.data:
-                self.data[zone] = time.time()
-                return True
+        timeout = max(srtt + self.K * rttvar, self.min_timeout)
+        timeout = timeout * 2 ** timeouts
 
-            # Otherwise, get the time that it was locked
-            locktime = self.data[zone]
-            now = time.time()
+        return min(timeout, max_timeout)
 
-            period = now - locktime
+    def backoff(self, retry_interval, attempt):
+        """
+        The time to wait before retrying a message for the attempt'th time,
+        doubling from retry_interval with each attempt, and jittered so
+        retries to a struggling nameserver don't arrive in lockstep.
+        """
+        interval = min(retry_interval * 2 ** max(attempt - 1, 0),
+                       max(self.max_retry_interval, retry_interval))
 
-            # If it has been locked for longer than the allowed period
-            # give the lock to the new requester
-            if period > self.delay:
-                self.data[zone] = now
-                return True
+        return random.uniform(interval / 2.0, interval)
 
-            LOG.debug('Lock for %(zone)s can\'t be releaesed for %(period)s'
-                      'seconds' % {'zone': zone,
-                                   'period': str(self.delay - period)})
+    def is_down(self, destination):
+        state = self._state(destination)
 
-            # Don't grant the lock for the zone
+        if state[3] == 0.0:
             return False
 
-    def release(self, zone):
-        # Release the lock
-        with self.lock:
+        if time.time() < state[3]:
+            return True
+
+        # The down period is over, let one probe through. Another timeout
+        # marks the destination down again straight away.
+        state[3] = 0.0
+        state[2] = max(self.down_after - 1, 0)
+        return False
+
+    def sample(self, destination, rtt):
+        """Record the round trip time of a response from a destination"""
+        state = self._state(destination)
+
+        if state[0] is None:
+            state[0] = rtt
+            state[1] = rtt / 2.0
+        else:
+            state[1] = ((1 - self.BETA) * state[1] +
+                        self.BETA * abs(state[0] - rtt))
+            state[0] = (1 - self.ALPHA) * state[0] + self.ALPHA * rtt
+
+        state[2] = 0
+        state[3] = 0.0
+
+    def failure(self, destination):
+        """Record a message to a destination timing out"""
+        state = self._state(destination)
+        state[2] += 1
+
+        if self.down_after and state[2] >= self.down_after:
+            if state[3] == 0.0:
+                LOG.warning(_LW('Nameserver %(host)s:%(port)s is down after '
+                                '%(timeouts)d timeouts') %
+                            {'host': destination[0], 'port': destination[1],
+                             'timeouts': state[2]})
+            state[3] = time.time() + self.down_period
+
+    def stats(self, destination):
+        srtt, rttvar, timeouts, down_until = self._state(destination)
+        return {'srtt': srtt, 'rttvar': rttvar, 'timeouts': timeouts,
+                'down': time.time() < down_until}
+
+
+class TCPConnection(object):
+    """
+    A TCP connection to a nameserver, on which any number of queries may be
+    outstanding at once. Responses are matched to their query by message ID
+    by a reader greenthread, and anything which isn't a response to a query
+    we sent on the connection is discarded.
+    """
+    def __init__(self, host, port, timeout):
+        self.destination = (host, port)
+        self.sock = socket.create_connection(self.destination, timeout)
+        self.sock.settimeout(None)
+
+        self.closed = False
+        self.last_used = time.time()
+
+        # message id -> (query, event the response is sent to)
+        self._pending = {}
+        self._write_lock = eventlet.semaphore.Semaphore()
+        self._reader = eventlet.spawn(self._read)
+
+    @property
+    def idle(self):
+        return not self._pending
+
+    def query(self, message, timeout):
+        """
+        Sends message and waits for the response to it
+
+        :raises: dns.exception.Timeout if there is no response in timeout
+                 seconds, socket.error or EOFError if the connection fails.
+        """
+        while True:
+            message_id = random.randint(0, 65535)
+            if message_id not in self._pending:
+                break
+
+        message.id = message_id
+        wire = message.to_wire()
+
+        event = eventlet.event.Event()
+        self._pending[message_id] = (message, event)
+        self.last_used = time.time()
+
+        try:
+            with self._write_lock:
+                self.sock.sendall(struct.pack('!H', len(wire)) + wire)
+
+            with eventlet.Timeout(timeout, dns.exception.Timeout):
+                return event.wait()
+        finally:
+            self._pending.pop(message_id, None)
+            self.last_used = time.time()
+
+    def close(self, error=None):
+        if self.closed:
+            return
+
+        self.closed = True
+        self._reader.kill()
+        self.sock.close()
+
+        # Fail the queries still waiting for a response
+        error = error or EOFError()
+        for message, event in self._pending.values():
+            if not event.ready():
+                event.send_exception(error)
+
+    def _recv(self, count):
+        data = b''
+        while len(data) < count:
+            chunk = self.sock.recv(count - len(data))
+            if not chunk:
+                raise EOFError()
+            data += chunk
+        return data
+
+    def _read(self):
+        while True:
+            try:
+                (length,) = struct.unpack('!H', self._recv(2))
+                wire = self._recv(length)
+            except (socket.error, EOFError) as e:
+                # The nameserver closed the connection, or it failed
+                eventlet.spawn_n(self.close, e)
+                return
+
             try:
-                self.data.pop(zone)
-            except KeyError:
-                pass
+                response = dns.message.from_wire(wire)
+            except dns.exception.DNSException:
+                LOG.debug('Discarding malformed response from %s:%s' %
+                          self.destination)
+                continue
+
+            query, event = self._pending.get(response.id, (None, None))
+            if query is None or not query.is_response(response):
+                continue
+
+            if not event.ready():
+                event.send(response)
+
+
+class TCPConnectionPool(object):
+    """
+    Keeps a TCP connection open to each nameserver queried, rather than
+    connect for every query, and pipelines concurrent queries on it.
+
+    Connections left idle for idle_timeout seconds are closed. A query on
+    a connection which turns out to have been closed by the nameserver is
+    retried once on a new connection.
+    """
+    def __init__(self, idle_timeout=30.0):
+        self.idle_timeout = idle_timeout
+
+        # (host, port) -> TCPConnection
+        self._connections = {}
+
+        self.connects = 0
+        self.reused = 0
+
+    def query(self, message, host, port, timeout):
+        """
+        Sends message to host:port over TCP, and returns the response
+
+        :raises: dns.exception.Timeout if there is no response in timeout
+                 seconds, socket.error if the connection fails.
+        """
+        self._evict()
+
+        connection = self._connections.get((host, port))
+        if connection is not None and not connection.closed:
+            self.reused += 1
+
+            try:
+                return connection.query(message, timeout)
+            except (socket.error, EOFError):
+                # Reconnect below
+                connection.close()
+
+        connection = self._connect(host, port, timeout)
+
+        try:
+            return connection.query(message, timeout)
+        except EOFError:
+            raise socket.error('Connection to %s:%s closed' % (host, port))
+
+    def close(self):
+        for connection in self._connections.values():
+            connection.close()
+        self._connections = {}
+
+    def stats(self):
+        return {
+            'tcp_connections': len(self._connections),
+            'tcp_connects': self.connects,
+            'tcp_reused': self.reused,
+        }
+
+    def _connect(self, host, port, timeout):
+        connection = TCPConnection(host, port, timeout)
+
+        existing = self._connections.get((host, port))
+        if existing is not None and not existing.closed:
+            # Another query connected while we were connecting
+            connection.close()
+            return existing
+
+        self._connections[(host, port)] = connection
+        self.connects += 1
+        return connection
+
+    def _evict(self):
+        horizon = time.time() - self.idle_timeout
+
+        for destination, connection in list(self._connections.items()):
+            if connection.closed or (connection.idle and
+                                     connection.last_used < horizon):
+                connection.close()
+                del self._connections[destination]
 
 
 class LimitNotifyMiddleware(DNSMiddleware):
-    """Middleware that rate limits NOTIFYs to the Agent"""
+    """
+    Middleware that rate limits NOTIFYs to the Agent
+
+    NOTIFYs are answered as soon as they arrive, and the first NOTIFY for a
+    zone schedules it to be handled once notify_delay seconds have passed.
+    Any further NOTIFYs for the zone in the meantime are coalesced into that
+    one, so a burst of NOTIFYs for a zone results in a single transfer.
+
+    NOTIFYs the application would refuse, from a server not allowed to
+    notify or for a zone that doesn't exist, are refused before they are
+    coalesced so they can never take the place of a pending NOTIFY.
+    """
 
     def __init__(self, application):
         super(LimitNotifyMiddleware, self).__init__(application)
 
         self.delay = cfg.CONF['service:agent'].notify_delay
-        self.locker = ZoneLock(self.delay)
+
+        # The zones waiting for their delay to pass, and the NOTIFY to handle
+        # for each. As every zone waits for the same delay, the deque is
+        # always ordered by deadline.
+        self._pending = {}
+        self._deadlines = collections.deque()
+        self._timer = None
+        self._pool = eventlet.GreenPool()
+
+        self.coalesced = 0
+        self.executed = 0
 
     def process_request(self, request):
         opcode = request.opcode()
         if opcode != dns.opcode.NOTIFY:
             return None
 
+        # Refuse the NOTIFY now if the application would, the requester
+        # can't be told about it once the delay has passed.
+        response = self.application.check_notify(request)
+        if response is not None:
+            return (response,)
+
         zone_name = request.question[0].name.to_text()
 
-        if self.locker.acquire(zone_name):
-            time.sleep(self.delay)
-            self.locker.release(zone_name)
-            return None
+        if zone_name in self._pending:
+            LOG.debug('Coalesced NOTIFY for %(zone)s into the pending '
+                      'update.' % {'zone': zone_name})
+            # Keep the NOTIFY for the highest serial, or the first one
+            # received if the NOTIFYs don't carry a serial.
+            serial = self._serial(request)
+            pending_serial = self._serial(self._pending[zone_name])
+            if serial is not None and (pending_serial is None or
+                                       serial > pending_serial):
+                self._pending[zone_name] = request
+            self.coalesced += 1
+
         else:
-            LOG.debug('Threw away NOTIFY for %(zone)s, already '
-                     'working on an update.' % {'zone': zone_name})
-            response = dns.message.make_response(request)
-            # Provide an authoritative answer
-            response.flags |= dns.flags.AA
-            return (response,)
+            self._pending[zone_name] = request
+            self._deadlines.append((time.time() + self.delay, zone_name))
+
+            if self._timer is None:
+                self._timer = eventlet.spawn(self._run)
+
+        response = dns.message.make_response(request)
+        # Provide an authoritative answer
+        response.flags |= dns.flags.AA
+        return (response,)
+
+    @staticmethod
+    def _serial(request):
+        """The serial from the SOA in a NOTIFY's answer, if it has one"""
+        for rrset in request.answer:
+            if rrset.rdtype == dns.rdatatype.SOA and len(rrset) > 0:
+                return rrset[0].serial
+
+        return None
+
+    def _run(self):
+        """Handle each pending zone once its delay has passed"""
+        try:
+            while self._deadlines:
+                deadline, zone_name = self._deadlines[0]
+
+                wait = deadline - time.time()
+                if wait > 0:
+                    eventlet.sleep(wait)
+                    continue
+
+                self._deadlines.popleft()
+                request = self._pending.pop(zone_name)
+
+                self.executed += 1
+                self._pool.spawn_n(self._execute, zone_name, request)
+
+        finally:
+            self._timer = None
+
+    def _execute(self, zone_name, request):
+        try:
+            # The requester has had its response, only the side effects of
+            # handling the NOTIFY matter now.
+            for response in self.application(request):
+                pass
+
+        except Exception:
+            LOG.exception(_LE('Failed handling the NOTIFY for %(zone)s') %
+                          {'zone': zone_name})
+
+    def stats(self):
+        return {
+            'notify_coalesced': self.coalesced,
+            'notify_executed': self.executed,
+            'notify_pending': len(self._pending),
+        }
 
 
 def from_dnspython_zone(dnspython_zone):
@@ -323,12 +828,131 @@ def dnspythonrecord_to_recordset(rname, rdataset):
     return rrset
 
 
+def _master_preference(rtt, server):
+    stats = rtt.stats((server['host'], server['port']))
+    srtt = stats['srtt'] if stats['srtt'] is not None else float('inf')
+
+    # Masters which answer, fastest first, then those we know nothing of
+    return (stats['down'], srtt, random.random())
+
+
+def probe_masters(zone_name, servers, timeout, stagger, rtt=None):
+    """
+    Queries the SOA of a zone on its masters concurrently, and returns them
+    best first for a transfer
+
+    Like happy eyeballs (RFC 6555), the masters are queried in order of
+    preference, each query starting stagger seconds after the previous one,
+    or as soon as it fails. Once a master answers, those already queried get
+    stagger seconds more to answer too. The masters which answered come
+    first, highest serial first and then quickest, followed by the rest in
+    order of preference.
+
+    The round trip time and timeouts of each master are recorded by rtt, a
+    :class:`RTTEstimator`, and decide the order of preference next time.
+    """
+    rtt = rtt or RTTEstimator.get_instance('service:mdns')
+    pending = sorted(servers, key=lambda srv: _master_preference(rtt, srv))
+    results = eventlet.queue.LightQueue()
+
+    def _probe(srv):
+        destination = (srv['host'], srv['port'])
+        query = dns.message.make_query(zone_name, dns.rdatatype.SOA)
+        serial = None
+
+        start = time.time()
+        try:
+            response = dns.query.udp(query, srv['host'], port=srv['port'],
+                                     timeout=timeout)
+        except dns.exception.Timeout:
+            rtt.failure(destination)
+        except (dns.exception.DNSException, socket.error) as e:
+            LOG.debug('SOA query for %s to %s failed: %r' %
+                      (zone_name, srv, e))
+        else:
+            rtt.sample(destination, time.time() - start)
+
+            if (response.rcode() == dns.rcode.NOERROR and
+                    len(response.answer) == 1 and
+                    response.answer[0].rdtype == dns.rdatatype.SOA):
+                serial = response.answer[0][0].serial
+
+        results.put((srv, serial))
+
+    threads = []
+    started = []
+    answered = []
+    failed = []
+    grace_until = None
+
+    while True:
+        running = len(threads) - len(answered) - len(failed)
+
+        if answered and (running == 0 or time.time() >= grace_until):
+            break
+
+        if not answered and running == 0:
+            if not pending:
+                break
+            started.append(pending.pop(0))
+            threads.append(eventlet.spawn(_probe, started[-1]))
+            continue
+
+        if answered:
+            wait = grace_until - time.time()
+        elif pending:
+            wait = stagger
+        else:
+            wait = None
+
+        try:
+            srv, serial = results.get(timeout=wait)
+        except eventlet.queue.Empty:
+            if not answered and pending:
+                # The masters queried so far are slow, try the next too
+                started.append(pending.pop(0))
+                threads.append(eventlet.spawn(_probe, started[-1]))
+            continue
+
+        if serial is None:
+            failed.append(srv)
+        else:
+            answered.append((serial, len(answered), srv))
+            if grace_until is None:
+                grace_until = time.time() + stagger
+
+    for thread in threads:
+        thread.kill()
+
+    # Serial number wrap around is not accounted for, as in the poller
+    answered.sort(key=lambda answer: (-answer[0], answer[1]))
+    answered = [a_srv for _serial, _i, a_srv in answered]
+
+    LOG.debug('Probed masters of %s, best first: %s' % (zone_name, answered))
+
+    # Masters still to answer when we stopped waiting come before those
+    # which failed to
+    unanswered = [s_srv for s_srv in started
+                  if s_srv not in answered and s_srv not in failed]
+
+    return answered + pending + unanswered + failed
+
+
+def _order_masters(zone_name, servers, timeout):
+    if cfg.CONF["service:mdns"].xfr_probe_masters and len(servers) > 1:
+        return probe_masters(zone_name, servers, timeout,
+                             cfg.CONF["service:mdns"].xfr_probe_stagger)
+
+    random.shuffle(servers)
+    return servers
+
+
 def do_axfr(zone_name, servers, timeout=None, source=None):
     """
     Performs an AXFR for a given zone name
     """
-    random.shuffle(servers)
     timeout = timeout or cfg.CONF["service:mdns"].xfr_timeout
+    servers = _order_masters(zone_name, servers, timeout)
 
     xfr = None
 
@@ -371,3 +995,92 @@ def do_axfr(zone_name, servers, timeout=None, source=None):
     LOG.debug("AXFR Successful for %s" % raw_zone.origin.to_text())
 
     return raw_zone
+
+
+def do_ixfr(zone_name, servers, serial, timeout=None, source=None):
+    """
+    Performs an IXFR for a given zone name, for the changes made since serial
+
+    :returns: A tuple of (soa, changes) where soa is a (ttl, rdata) tuple of
+              the zone's current SOA and changes is a list of ('DELETE' or
+              'ADD', name, ttl, rdata) tuples in the order the master made
+              them, SOA changes excluded. None if the master sent the whole
+              zone rather than the changes.
+    """
+    timeout = timeout or cfg.CONF["service:mdns"].xfr_timeout
+    servers = _order_masters(zone_name, servers, timeout)
+
+    rrs = None
+
+    for srv in servers:
+        to = eventlet.Timeout(timeout)
+        log_info = {'name': zone_name, 'host': srv, 'serial': serial}
+        try:
+            LOG.info(_LI("Doing IXFR for %(name)s from %(host)s since serial "
+                         "%(serial)s") % log_info)
+
+            rrs = []
+            for message in dns.query.xfr(
+                    srv['host'], zone_name, rdtype=dns.rdatatype.IXFR,
+                    relativize=False, timeout=1, port=srv['port'],
+                    source=source, serial=serial):
+                for rrset in message.answer:
+                    for rdata in rrset:
+                        rrs.append((rrset.name, rrset.ttl, rdata))
+
+            # Every transfer starts with the zone's current SOA
+            if rrs and rrs[0][2].rdtype == dns.rdatatype.SOA:
+                break
+
+            msg = _LE("IXFR of %(name)s from %(host)s didn't start with an "
+                      "SOA. Trying next server.")
+            LOG.error(msg % log_info)
+        except eventlet.Timeout as t:
+            if t == to:
+                msg = _LE("IXFR timed out for %(name)s from %(host)s")
+                LOG.error(msg % log_info)
+                continue
+        except dns.exception.DNSException:
+            # Including masters refusing IXFR requests
+            msg = _LE("IXFR of %(name)s failed from %(host)s. Trying next "
+                      "server.")
+            LOG.error(msg % log_info)
+        except socket.error:
+            msg = _LE("Connection error when doing IXFR for %(name)s from "
+                      "%(host)s")
+            LOG.error(msg % log_info)
+        except Exception:
+            msg = _LE("Problem doing IXFR %(name)s from %(host)s. "
+                      "Trying next server.")
+            LOG.exception(msg % log_info)
+        finally:
+            to.cancel()
+        continue
+    else:
+        msg = _LE("IXFR failed for %(name)s. No servers in %(servers)s was "
+                  "reached.")
+        raise exceptions.XFRFailure(
+            msg % {"name": zone_name, "servers": servers})
+
+    origin, soa_ttl, soa = rrs[0]
+
+    if len(rrs) > 1 and rrs[1][2].rdtype != dns.rdatatype.SOA:
+        # RFC 1995 allows masters to send the whole zone instead
+        LOG.debug("IXFR for %s returned the whole zone" % zone_name)
+        return None
+
+    # The changes are sequences of the old SOA, the RRs deleted, the new SOA
+    # and the RRs added, for each version between serial and the current
+    # one, followed by the current SOA again.
+    changes = []
+    operation = None
+    for name, ttl, rdata in rrs[1:-1]:
+        if rdata.rdtype == dns.rdatatype.SOA and name == origin:
+            operation = 'ADD' if operation == 'DELETE' else 'DELETE'
+            continue
+
+        changes.append((operation, name, ttl, rdata))
+
+    LOG.debug("IXFR Successful for %s" % zone_name)
+
+    return ((soa_ttl, soa), changes)
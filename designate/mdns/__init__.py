@@ -24,7 +24,8 @@ cfg.CONF.register_group(cfg.OptGroup(
 
 OPTS = [
     cfg.IntOpt('workers', default=None,
-               help='Number of mdns worker processes to spawn'),
+               help='Number of mdns worker processes to spawn, each binds '
+                    'its own SO_REUSEPORT sockets'),
     cfg.IntOpt('threads', default=1000,
                help='Number of mdns greenthreads to spawn'),
     cfg.StrOpt('host', default='0.0.0.0',
@@ -35,6 +36,35 @@ OPTS = [
                help='mDNS TCP Backlog'),
     cfg.FloatOpt('tcp-recv-timeout', default=0.5,
                  help='mDNS TCP Receive Timeout'),
+    cfg.FloatOpt('tcp-idle-timeout', default=10.0,
+                 help='Seconds an idle TCP connection is kept open waiting '
+                      'for further queries'),
+    cfg.IntOpt('tcp-max-connections', default=16,
+               help='Maximum number of TCP connections a single client '
+                    'address may hold open, 0 for no limit'),
+    cfg.IntOpt('udp-recv-size', default=8192,
+               help='Size in bytes of the buffer UDP queries are received '
+                    'into, larger queries are truncated'),
+    cfg.IntOpt('edns-udp-size', default=1232,
+               help='EDNS0 UDP payload size advertised in responses, and the '
+                    'largest UDP response sent, larger responses are '
+                    'truncated for the requester to retry over TCP'),
+    cfg.FloatOpt('graceful-shutdown-timeout', default=10.0,
+                 help='Seconds a stopping worker waits for the requests it '
+                      'is handling to complete'),
+    cfg.IntOpt('stats-interval', default=300,
+               help='Interval in seconds at which each worker logs its '
+                    'request counters, 0 disables'),
+    cfg.IntOpt('handler-pool-size', default=100,
+               help='Number of greenthreads handling DNS requests in each '
+                    'worker'),
+    cfg.IntOpt('handler-queue-depth', default=1000,
+               help='Number of DNS requests that may wait for a handler, '
+                    'further requests are shed'),
+    cfg.StrOpt('overload-policy', default='refuse',
+               choices=['drop', 'refuse'],
+               help='How requests are shed when the handler queue is full, '
+                    'either drop them or answer REFUSED'),
     cfg.BoolOpt('all-tcp', default=False,
                 help='Send all traffic over TCP'),
     cfg.BoolOpt('query-enforce-tsig', default=False,
@@ -44,6 +74,45 @@ OPTS = [
                help='The storage driver to use'),
     cfg.IntOpt('max-message-size', default=65535,
                help='Maximum message size to emit'),
+    cfg.IntOpt('axfr-cache-size', default=67108864,
+               help='Maximum size in bytes of rendered AXFR responses to '
+                    'cache, 0 disables the cache'),
+    cfg.IntOpt('tsigkey-cache-ttl', default=60,
+               help='Seconds a TSIG key is cached before being read from '
+                    'storage again, 0 disables the cache'),
+    cfg.IntOpt('poll-sockets', default=4,
+               help='Number of UDP sockets, per address family, which SOA '
+                    'queries polling nameservers for serials are sent from'),
+    cfg.IntOpt('poll-batch-size', default=100,
+               help='Number of serial poll results reported to the pool '
+                    'manager at once'),
+    cfg.FloatOpt('poll-batch-interval', default=1.0,
+                 help='Seconds a serial poll result may wait to be reported '
+                      'with others'),
+    cfg.FloatOpt('tcp-pool-idle-timeout', default=30.0,
+                 help='Seconds a TCP connection to a nameserver is kept open '
+                      'without queries when all_tcp is set'),
+    cfg.FloatOpt('notify-coalesce-window', default=0.0,
+                 help='Seconds a NOTIFY waits to be coalesced with NOTIFYs '
+                      'for later changes to the same zone and target, the '
+                      'delay requested for the NOTIFY is used if longer'),
+    cfg.IntOpt('zone-tree-size', default=0,
+               help='Maximum number of zones held in memory to answer record '
+                    'queries from, 0 answers every query from storage'),
+    cfg.IntOpt('zone-tree-ttl', default=5,
+               help='Seconds a zone held in memory is trusted before its '
+                    'serial is checked against storage again'),
+    cfg.BoolOpt('wire-fast-path', default=True,
+                help='Answer plain, unsigned, queries for zones held in '
+                     'memory from responses rendered ahead of time, without '
+                     'fully parsing them. Requires zone_tree_size'),
+    cfg.IntOpt('zone-filter-interval', default=0,
+               help='Interval in seconds at which the filter of hosted zone '
+                    'names, which refuses queries for other names without '
+                    'reading storage, is rebuilt, 0 disables the filter'),
+    cfg.FloatOpt('zone-filter-error-rate', default=0.01,
+                 help='False positive rate the hosted zone filter is sized '
+                      'for, false positives are answered from storage'),
 ]
 
 cfg.CONF.register_opts(OPTS, group='service:mdns')
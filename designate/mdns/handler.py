@@ -13,6 +13,13 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import collections
+import copy
+import itertools
+import struct
+import time
+
+import six
 import dns
 import dns.flags
 import dns.opcode
@@ -20,11 +27,18 @@ import dns.rcode
 import dns.rdataclass
 import dns.rdatatype
 import dns.message
+import dns.name
+import dns.rdata
+import dns.rrset
 from oslo_config import cfg
 from oslo_log import log as logging
 
+from designate import context
+from designate import dnsutils
 from designate import exceptions
 from designate.mdns import xfr
+from designate.mdns import xfrcache
+from designate.mdns import zonetree
 from designate.central import rpcapi as central_api
 from designate.i18n import _LI
 from designate.i18n import _LW
@@ -40,14 +54,33 @@ CONF.import_opt('default_pool_id', 'designate.central',
 # name (restricted in designate to 160 chars), 1 byte for trailing dot.
 TSIG_RRSIZE = 10 + 64 + 160 + 1
 
+# Most responses rendered from each version of a zone kept by the wire fast
+# path, responses to further questions are rendered for each query.
+MAX_ZONE_TEMPLATES = 1024
+
+HEADER = struct.Struct('!HHHHHH')
+
 
 class RequestHandler(xfr.XFRMixin):
 
-    def __init__(self, storage, tg):
+    def __init__(self, storage, tg, zone_filter=None, zone_tree=None):
         # Get a storage connection
         self.storage = storage
         self.tg = tg
 
+        # Refuses queries for names outside of the zones we host, if given
+        self.zone_filter = zone_filter
+
+        self.axfr_cache = xfrcache.AXFRCache(
+            CONF['service:mdns'].axfr_cache_size)
+
+        if zone_tree is None:
+            zone_tree = zonetree.ZoneTree(
+                CONF['service:mdns'].zone_tree_size,
+                CONF['service:mdns'].zone_tree_ttl)
+
+        self.zone_tree = zone_tree
+
     @property
     def central_api(self):
         return central_api.CentralAPI.get_instance()
@@ -66,15 +99,24 @@ class RequestHandler(xfr.XFRMixin):
                 raise StopIteration
 
             q_rrset = request.question[0]
-            # Handle AXFR and IXFR requests with an AXFR responses for now.
-            # It is permissible for a server to send an AXFR response when
-            # receiving an IXFR request.
-            # TODO(Ron): send IXFR response when receiving IXFR request.
-            if q_rrset.rdtype in (dns.rdatatype.AXFR, dns.rdatatype.IXFR):
+
+            # Questions no hosted zone could answer are refused straight
+            # away, sparing storage the stray and scanning traffic.
+            if (self.zone_filter is not None and
+                    self.zone_filter.excludes(q_rrset.name)):
+                yield self._handle_query_error(request, dns.rcode.REFUSED)
+                raise StopIteration
+
+            if q_rrset.rdtype == dns.rdatatype.AXFR:
                 for response in self._handle_axfr(request):
                     yield response
                 raise StopIteration
 
+            elif q_rrset.rdtype == dns.rdatatype.IXFR:
+                for response in self._handle_ixfr(request):
+                    yield response
+                raise StopIteration
+
             else:
                 for response in self._handle_record_query(request):
                     yield response
@@ -225,46 +267,39 @@ class RequestHandler(xfr.XFRMixin):
 
         return r_rrset
 
-    def _handle_axfr(self, request):
+    def _find_xfr_domain(self, request):
+        """
+        Find the domain a zone transfer was requested for, returning None if
+        it does not exist or the requester is not permitted to transfer it.
+        """
         context = request.environ['context']
         q_rrset = request.question[0]
+        xfr = dns.rdatatype.to_text(q_rrset.rdtype).lower()
 
-        # First check if there is an existing zone
         # TODO(vinod) once validation is separated from the api,
         # validate the parameters
         try:
             criterion = self._domain_criterion_from_request(
                 request, {'name': q_rrset.name.to_text()})
-            domain = self.storage.find_domain(context, criterion)
+            return self.storage.find_domain(context, criterion)
 
         except exceptions.DomainNotFound:
-            LOG.warning(_LW("DomainNotFound while handling axfr request. "
-                            "Question was %(qr)s") % {'qr': q_rrset})
-
-            yield self._handle_query_error(request, dns.rcode.REFUSED)
-            raise StopIteration
+            LOG.warning(_LW("DomainNotFound while handling %(xfr)s request. "
+                            "Question was %(qr)s") %
+                        {'xfr': xfr, 'qr': q_rrset})
 
         except exceptions.Forbidden:
-            LOG.warning(_LW("Forbidden while handling axfr request. "
-                            "Question was %(qr)s") % {'qr': q_rrset})
+            LOG.warning(_LW("Forbidden while handling %(xfr)s request. "
+                            "Question was %(qr)s") %
+                        {'xfr': xfr, 'qr': q_rrset})
 
-            yield self._handle_query_error(request, dns.rcode.REFUSED)
-            raise StopIteration
+        return None
 
-        # The AXFR response needs to have a SOA at the beginning and end.
-        criterion = {'domain_id': domain.id, 'type': 'SOA'}
-        soa_records = self.storage.find_recordsets_axfr(context, criterion)
-
-        # Get all the records other than SOA
-        criterion = {'domain_id': domain.id, 'type': '!SOA'}
-        records = self.storage.find_recordsets_axfr(context, criterion)
-
-        # Place the SOA RRSet at the front and end of the RRSet list
-        records.insert(0, soa_records[0])
-        records.append(soa_records[0])
-
-        # Build up a dummy response, we're stealing it's logic for building
-        # the Flags.
+    def _xfr_response(self, request):
+        """
+        Build up a dummy response, we're stealing it's logic for building
+        the Flags, along with the max size of each message.
+        """
         response = dns.message.make_response(request)
         response.flags |= dns.flags.AA
         response.set_rcode(dns.rcode.NOERROR)
@@ -281,55 +316,296 @@ class RequestHandler(xfr.XFRMixin):
             # rendered message.
             max_message_size = max_message_size - TSIG_RRSIZE
 
-        # Render the results, yielding a packet after each TooBig exception.
-        i, renderer = 0, None
-        while i < len(records):
-            record = records[i]
-
-            # No renderer? Build one
-            if renderer is None:
-                renderer = dns.renderer.Renderer(
-                    response.id, response.flags, max_message_size)
-                for q in request.question:
-                    renderer.add_question(q.name, q.rdtype, q.rdclass)
-
-            # Build a DNSPython RRSet from the RR
-            rrset = dns.rrset.from_text_list(
-                str(record[3]),     # name
-                int(record[2]) if record[2] is not None else domain.ttl,  # ttl
-                dns.rdataclass.IN,  # class
-                str(record[1]),     # rrtype
-                [str(record[4])],   # rdata
-            )
+        return response, max_message_size
 
-            try:
-                renderer.add_rrset(dns.renderer.ANSWER, rrset)
-                i += 1
-            except dns.exception.TooBig:
-                if renderer.counts[dns.renderer.ANSWER] == 0:
-                    # We've received a TooBig from the first attempted RRSet in
-                    # this packet. Log a warning and abort the AXFR.
-                    LOG.warning(_LW('Aborted AXFR of %(domain)s, a single RR '
-                                    '(%(rrset_type)s %(rrset_name)s) '
-                                    'exceeded the max message size.'),
-                                {'domain': domain.name,
-                                 'rrset_type': record[1],
-                                 'rrset_name': record[3]})
-
-                    yield self._handle_query_error(request, dns.rcode.SERVFAIL)
-                    raise StopIteration
-
-                else:
-                    yield self._finalize_packet(renderer, request)
+    def _handle_axfr(self, request):
+        context = request.environ['context']
+        q_rrset = request.question[0]
+
+        # First check if there is an existing zone
+        domain = self._find_xfr_domain(request)
+
+        if domain is None:
+            yield self._handle_query_error(request, dns.rcode.REFUSED)
+            raise StopIteration
+
+        response, max_message_size = self._xfr_response(request)
+
+        # Replay a previous rendering of this zone and serial if we have one,
+        # only the header and TSIG differ between requests.
+        variant = (max_message_size, q_rrset.name.to_text(), q_rrset.rdtype)
+        packets = self.axfr_cache.get(domain.id, domain.serial, variant)
+
+        if packets is not None:
+            LOG.debug('AXFR cache hit for %(domain)s serial %(serial)s',
+                      {'domain': domain.name, 'serial': domain.serial})
+
+            for packet in packets:
+                renderer = self._renderer_from_wire(
+                    packet, response, max_message_size)
+                yield self._finalize_packet(renderer, request)
+
+            raise StopIteration
+
+        # The AXFR response needs to have a SOA at the beginning and end.
+        criterion = {'domain_id': domain.id, 'type': 'SOA'}
+        soa_records = self.storage.find_recordsets_axfr(context, criterion)
+        soa = list(self._record_rrsets(domain, soa_records))[:1]
+
+        # Stream all the records other than SOA, they are rendered as they
+        # are read rather than being loaded up front.
+        criterion = {'domain_id': domain.id, 'type': '!SOA'}
+        records = self.storage.find_recordsets_axfr(context, criterion)
+
+        # Place the SOA RRSet at the front and end of the RRSet stream
+        rrsets = itertools.chain(
+            soa, self._record_rrsets(domain, records), soa)
+
+        # Collect the unsigned packets as we go, so they can be cached once
+        # the whole zone has been rendered.
+        packets = [] if self.axfr_cache.enabled else None
+
+        try:
+            for renderer in self._render_xfr(
+                    request, response, domain, max_message_size,
+                    rrsets, packets):
+                yield renderer
+
+        except dns.exception.TooBig:
+            yield self._handle_query_error(request, dns.rcode.SERVFAIL)
+            raise StopIteration
+
+        if packets is not None:
+            self.axfr_cache.store(domain.id, domain.serial, variant, packets)
+            LOG.debug('AXFR cache stats: %s', self.axfr_cache.stats())
+
+        raise StopIteration
+
+    def _handle_ixfr(self, request):
+        """
+        Answer an IXFR request (RFC 1995) from the zone journal, falling back
+        to a full AXFR response whenever the journal can't bridge the gap
+        between the requester's serial and ours.
+        """
+        context = request.environ['context']
+
+        client_serial = self._ixfr_client_serial(request)
+
+        if client_serial is None:
+            LOG.debug('IXFR request without a SOA in the authority section, '
+                      'sending AXFR')
+            for response in self._handle_axfr(request):
+                yield response
+            raise StopIteration
+
+        domain = self._find_xfr_domain(request)
+
+        if domain is None:
+            yield self._handle_query_error(request, dns.rcode.REFUSED)
+            raise StopIteration
+
+        criterion = {'domain_id': domain.id, 'type': 'SOA'}
+        soa_records = self.storage.find_recordsets_axfr(context, criterion)
+        soa = list(self._record_rrsets(domain, soa_records))[0]
+
+        if client_serial >= domain.serial:
+            # The requester is up to date, a single SOA tells it so.
+            versions = None
+
+        else:
+            entries = self.storage.find_journal_entries(
+                context, domain.id, client_serial)
+            versions = self._journal_versions(
+                entries, client_serial, domain.serial)
+
+            if versions is None:
+                LOG.debug('Zone journal of %(domain)s does not cover serial '
+                          '%(serial)s, sending AXFR',
+                          {'domain': domain.name, 'serial': client_serial})
+                for response in self._handle_axfr(request):
+                    yield response
+                raise StopIteration
+
+        response, max_message_size = self._xfr_response(request)
+
+        try:
+            for renderer in self._render_xfr(
+                    request, response, domain, max_message_size,
+                    self._ixfr_rrsets(domain, soa, versions)):
+                yield renderer
+
+        except dns.exception.TooBig:
+            yield self._handle_query_error(request, dns.rcode.SERVFAIL)
+
+        raise StopIteration
+
+    def _ixfr_client_serial(self, request):
+        """Returns the serial of the SOA an IXFR request carries, if any"""
+        for rrset in request.authority:
+            if rrset.rdtype == dns.rdatatype.SOA and len(rrset) > 0:
+                return rrset[0].serial
+
+        return None
+
+    def _journal_versions(self, entries, serial, current_serial):
+        """
+        Group zone journal entries into a list of
+        (previous_serial, serial, deleted, added) tuples, one for each zone
+        version after `serial`. Returns None if the entries don't form an
+        unbroken chain from `serial` to `current_serial`.
+        """
+        versions = []
+
+        for entry in entries:
+            if not versions or versions[-1][1] != entry['serial']:
+                if entry['previous_serial'] != serial:
+                    return None
+
+                versions.append((entry['previous_serial'], entry['serial'],
+                                 [], []))
+                serial = entry['serial']
+
+            if entry['operation'] == 'DELETE':
+                versions[-1][2].append(entry)
+            else:
+                versions[-1][3].append(entry)
+
+        if serial != current_serial:
+            return None
+
+        return versions
+
+    def _ixfr_rrsets(self, domain, soa, versions):
+        """
+        Yields the RRSets of an IXFR response, the current SOA followed by
+        each version's old SOA, deletions, new SOA and additions, and
+        finally the current SOA again.
+        """
+        yield soa
+
+        if versions is None:
+            raise StopIteration
+
+        for previous_serial, serial, deleted, added in versions:
+            yield self._soa_with_serial(soa, previous_serial)
+
+            for entry in deleted:
+                yield self._journal_rrset(domain, entry)
+
+            yield self._soa_with_serial(soa, serial)
+
+            for entry in added:
+                yield self._journal_rrset(domain, entry)
+
+        yield soa
+
+    def _soa_with_serial(self, soa, serial):
+        rdata = copy.copy(soa[0])
+        rdata.serial = serial
+
+        return dns.rrset.from_rdata(soa.name, soa.ttl, rdata)
+
+    def _journal_rrset(self, domain, entry):
+        return dns.rrset.from_text_list(
+            str(entry['name']),
+            int(entry['ttl']) if entry['ttl'] is not None else domain.ttl,
+            dns.rdataclass.IN,
+            str(entry['type']),
+            [str(entry['data'])],
+        )
+
+    def _record_rrsets(self, domain, records):
+        """
+        Group the (name, type, ttl, data) tuples returned by the storage,
+        which arrive ordered by name and type, into DNSPython RRSets. Each
+        owner name and rdata is parsed exactly once.
+        """
+        rdtypes = {}
+        rrset, rrset_key = None, None
+
+        for name, rrtype, ttl, data in records:
+            if (name, rrtype) != rrset_key:
+                if rrset is not None:
+                    yield rrset
+
+                rdtype = rdtypes.get(rrtype)
+                if rdtype is None:
+                    rdtype = rdtypes[rrtype] = dns.rdatatype.from_text(
+                        str(rrtype))
+
+                rrset_key = (name, rrtype)
+                rrset = dns.rrset.RRset(
+                    dns.name.from_text(str(name)), dns.rdataclass.IN, rdtype)
+
+            rdata = dns.rdata.from_text(
+                dns.rdataclass.IN, rrset.rdtype, str(data))
+            rrset.add(rdata, int(ttl) if ttl is not None else domain.ttl)
+
+        if rrset is not None:
+            yield rrset
+
+    def _render_xfr(self, request, response, domain, max_message_size,
+                    rrsets, packets=None):
+        """
+        Render the RRSets of a zone transfer, yielding a renderer for each
+        message. Raises TooBig if a single RR exceeds the max message size.
+        """
+        renderer = None
+
+        for rrset in rrsets:
+            pending = collections.deque([rrset])
+
+            while pending:
+                rrset = pending.popleft()
+
+                # No renderer? Build one
+                if renderer is None:
+                    renderer = dns.renderer.Renderer(
+                        response.id, response.flags, max_message_size)
+                    for q in request.question:
+                        renderer.add_question(q.name, q.rdtype, q.rdclass)
+
+                try:
+                    renderer.add_rrset(dns.renderer.ANSWER, rrset)
+                except dns.exception.TooBig:
+                    if len(rrset) > 1:
+                        # Zone transfers may spread an RRSet over several
+                        # messages, top up this one an RR at a time.
+                        pending.extendleft(
+                            reversed(self._split_rrset(rrset)))
+                        continue
+
+                    if renderer.counts[dns.renderer.ANSWER] == 0:
+                        # We've received a TooBig from the first attempted
+                        # RRSet in this packet. Log a warning and abort the
+                        # transfer.
+                        LOG.warning(_LW('Aborted zone transfer of %(domain)s, '
+                                        'a single RR (%(rrset_type)s '
+                                        '%(rrset_name)s) exceeded the max '
+                                        'message size.'),
+                                    {'domain': domain.name,
+                                     'rrset_type': dns.rdatatype.to_text(
+                                         rrset.rdtype),
+                                     'rrset_name': rrset.name.to_text()})
+                        raise
+
+                    yield self._finalize_packet(renderer, request, packets)
                     renderer = None
+                    pending.appendleft(rrset)
 
         if renderer is not None:
-            yield self._finalize_packet(renderer, request)
+            yield self._finalize_packet(renderer, request, packets)
 
-        raise StopIteration
+    def _split_rrset(self, rrset):
+        """Split an RRSet into one RRSet per RR"""
+        return [dns.rrset.from_rdata(rrset.name, rrset.ttl, rdata)
+                for rdata in rrset]
 
-    def _finalize_packet(self, renderer, request):
+    def _finalize_packet(self, renderer, request, packets=None):
         renderer.write_header()
+        if packets is not None:
+            # Keep a copy of the packet before it is signed
+            packets.append(renderer.get_wire())
         if request.had_tsig:
             # Make the space we reserved for TSIG available for use
             renderer.max_size += TSIG_RRSIZE
@@ -344,8 +620,28 @@ class RequestHandler(xfr.XFRMixin):
                 request.keyalgorithm)
         return renderer
 
+    def _renderer_from_wire(self, wire, response, max_message_size):
+        """
+        Wrap a cached, unsigned packet in a renderer carrying the header of
+        the current response, ready to be finalized.
+        """
+        renderer = dns.renderer.Renderer(
+            response.id, response.flags, max_message_size)
+
+        renderer.output = six.BytesIO(wire)
+        renderer.output.seek(0, 2)
+        renderer.counts = list(struct.unpack('!HHHH', wire[4:12]))
+        renderer.section = dns.renderer.ANSWER
+
+        return renderer
+
     def _handle_record_query(self, request):
         """Handle a DNS QUERY request for a record"""
+        if self.zone_tree.enabled:
+            for response in self._handle_zone_tree_query(request):
+                yield response
+            raise StopIteration
+
         context = request.environ['context']
         response = dns.message.make_response(request)
 
@@ -408,3 +704,297 @@ class RequestHandler(xfr.XFRMixin):
             response.set_rcode(dns.rcode.REFUSED)
 
         yield response
+
+    def _handle_zone_tree_query(self, request):
+        """
+        Handle a DNS QUERY request for a record from the in-memory zone tree,
+        answering NXDOMAIN and NODATA authoritatively for hosted zones, and
+        referring names delegated from them.
+        """
+        context = request.environ['context']
+        q_rrset = request.question[0]
+
+        try:
+            criterion = self._domain_criterion_from_request(request)
+
+            # SOA queries are how secondaries check for a new serial, so they
+            # are always answered from a zone revalidated against storage.
+            zone = self._find_tree_zone(
+                context, q_rrset.name,
+                revalidate=q_rrset.rdtype == dns.rdatatype.SOA)
+
+        except exceptions.Forbidden:
+            LOG.warning(_LW("Forbidden while handling query request. "
+                            "Question was %(qr)s") % {'qr': q_rrset})
+
+            yield self._handle_query_error(request, dns.rcode.REFUSED)
+            raise StopIteration
+
+        # We are not authoritative for names outside of the zones we host,
+        # nor for zones the requester may not see.
+        if zone is None or not zone.permits(criterion):
+            yield self._handle_query_error(request, dns.rcode.REFUSED)
+            raise StopIteration
+
+        response = dns.message.make_response(request)
+        zone.respond(response, q_rrset.name, q_rrset.rdtype)
+
+        yield response
+
+    def _find_tree_zone(self, context, qname, revalidate=False):
+        """
+        Find the zone enclosing a name in the zone tree, loading it from
+        storage if it isn't present or its serial has changed.
+        """
+        zone = self.zone_tree.find(qname)
+
+        if zone is not None and (revalidate or self.zone_tree.stale(zone)):
+            try:
+                domain = self.storage.find_domain(context, {'id': zone.id})
+            except exceptions.DomainNotFound:
+                domain = None
+
+            if domain is not None and domain.serial == zone.serial:
+                zone.checked = time.time()
+                return zone
+
+            LOG.debug('Zone %(zone)s serial %(serial)s is out of date in the '
+                      'zone tree', {'zone': zone.name, 'serial': zone.serial})
+
+            self.zone_tree.invalidate(zone)
+
+            if domain is not None:
+                return self._load_tree_zone(context, domain)
+
+        if zone is None:
+            domain = self._find_enclosing_domain(context, qname)
+
+            if domain is not None:
+                zone = self._load_tree_zone(context, domain)
+
+        return zone
+
+    def _find_enclosing_domain(self, context, qname):
+        """Find the closest hosted domain enclosing a name"""
+        names = []
+        name = qname
+
+        while name != dns.name.root:
+            names.append(name.to_text())
+            name = name.parent()
+
+        if not names:
+            return None
+
+        # Every enclosing name in one query, the deepest match is closest
+        domains = self.storage.find_domains(context, {'name': names})
+
+        if not domains:
+            return None
+
+        return max(domains, key=lambda domain: len(domain.name))
+
+    def _load_tree_zone(self, context, domain):
+        """Load all of a domain's RRSets into the zone tree"""
+        criterion = {'domain_id': domain.id, 'type': 'SOA'}
+        soa_records = self.storage.find_recordsets_axfr(context, criterion)
+
+        criterion = {'domain_id': domain.id, 'type': '!SOA'}
+        records = self.storage.find_recordsets_axfr(context, criterion)
+
+        # Hosted zones beneath this one are answered from their own data
+        children = self.storage.find_domains(
+            context, {'name': '%%.%s' % domain.name})
+
+        zone = zonetree.Zone(
+            domain,
+            itertools.chain(self._record_rrsets(domain, soa_records),
+                            self._record_rrsets(domain, records)),
+            [dns.name.from_text(str(child.name)) for child in children])
+
+        if zone.soa is None:
+            LOG.warning(_LW('Zone %(zone)s has no SOA, not answering queries '
+                            'for it'), {'zone': domain.name})
+            return None
+
+        self.zone_tree.store(zone)
+
+        LOG.debug('Loaded zone %(zone)s serial %(serial)s into the zone tree, '
+                  'stats: %(stats)s', {'zone': domain.name,
+                                       'serial': domain.serial,
+                                       'stats': self.zone_tree.stats()})
+
+        return zone
+
+
+class FastPathMiddleware(dnsutils.DNSMiddleware):
+    """
+    Answers plain queries for names in the zone tree straight from the wire,
+    without parsing them into a dns.message.Message or building a context
+    for them.
+
+    Only unsigned queries of a single question, carrying at most an EDNS0
+    OPT without options, are answered. The response to each question is
+    rendered once for each version of a zone, and sent with the ID, RD flag
+    and question of the query patched in. Everything else goes through the
+    full dnspython path, as do questions for zones which aren't loaded or
+    are due a revalidation, and responses too big for the requester.
+    """
+    def __init__(self, application, request_handler, edns_udp_size=1232):
+        super(FastPathMiddleware, self).__init__(application)
+
+        self.handler = request_handler
+        self.edns_udp_size = edns_udp_size
+
+        self.hits = 0
+        self.misses = 0
+
+    def process_request(self, request):
+        try:
+            query = self._parse(request['payload'])
+        except (IndexError, struct.error):
+            query = None
+
+        response = None
+        if query is not None:
+            response = self._answer(request.get('protocol'), *query)
+
+        if response is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return [response]
+
+    def _parse(self, payload):
+        """
+        Parse the header and question of a plain query, returning None for
+        any other message.
+        """
+        qid, flags, qdcount, ancount, nscount, arcount = HEADER.unpack_from(
+            payload)
+
+        if (flags & dns.flags.QR or
+                dns.opcode.from_flags(flags) != dns.opcode.QUERY or
+                qdcount != 1 or ancount or nscount or arcount > 1):
+            return None
+
+        labels = []
+        offset = HEADER.size
+
+        while True:
+            length = six.indexbytes(payload, offset)
+            offset += 1
+
+            if length == 0:
+                break
+
+            # Queries have no need of compression pointers
+            if length > 63:
+                return None
+
+            labels.append(payload[offset:offset + length])
+            offset += length
+
+        if offset - HEADER.size > 255:
+            return None
+
+        rdtype, rdclass = struct.unpack_from('!HH', payload, offset)
+        offset += 4
+        question = payload[HEADER.size:offset]
+
+        if (rdclass != dns.rdataclass.IN or
+                dns.rdatatype.is_metatype(rdtype)):
+            return None
+
+        payload_size = None
+
+        if arcount:
+            # A root owned OPT, of EDNS version 0, without options
+            if six.indexbytes(payload, offset) != 0:
+                return None
+
+            rrtype, payload_size, ttl, rdlen = struct.unpack_from(
+                '!HHIH', payload, offset + 1)
+            offset += 11
+
+            if rrtype != dns.rdatatype.OPT or ttl >> 16 or rdlen:
+                return None
+
+        if offset != len(payload):
+            return None
+
+        qname = dns.name.Name(labels + [b''])
+
+        return qid, flags, qname, rdtype, question, payload_size
+
+    def _answer(self, protocol, qid, flags, qname, rdtype, question,
+                payload_size):
+        if rdtype == dns.rdatatype.SOA:
+            # SOA queries are always answered from a zone revalidated
+            # against storage, as in the full path.
+            ctxt = context.DesignateContext.get_admin_context(
+                all_tenants=True)
+            zone = self.handler._find_tree_zone(ctxt, qname, revalidate=True)
+
+        else:
+            zone = self.handler.zone_tree.find(qname)
+
+            if zone is not None and self.handler.zone_tree.stale(zone):
+                zone = None
+
+        # Unsigned queries may only see the zones of the default pool
+        if (zone is None or
+                zone.pool_id != CONF['service:central'].default_pool_id):
+            return None
+
+        edns = payload_size is not None
+        # Names compare without case, but the qtype and qclass must not be
+        # folded with them
+        key = (question[:-4].lower() + question[-4:], edns)
+
+        template = zone.templates.get(key)
+        if template is None:
+            try:
+                template = self._render(zone, qname, rdtype, edns)
+            except dns.exception.TooBig:
+                return None
+
+            if len(zone.templates) < MAX_ZONE_TEMPLATES:
+                zone.templates[key] = template
+
+        max_size = dnsutils.max_response_size(
+            protocol, payload_size, self.edns_udp_size)
+        if len(template) > max_size:
+            return None
+
+        (template_flags, ) = struct.unpack_from('!H', template, 2)
+
+        return b''.join([
+            struct.pack('!HH', qid, template_flags | (flags & dns.flags.RD)),
+            template[4:HEADER.size],
+            question,
+            template[HEADER.size + len(question):],
+        ])
+
+    def _render(self, zone, qname, rdtype, edns):
+        """
+        Render the response to a question, with an ID of 0 and no RD flag,
+        just as the full path would answer it from the zone tree.
+        """
+        response = dns.message.Message(id=0)
+        response.flags = dns.flags.QR
+        response.question = [
+            dns.rrset.RRset(qname, dns.rdataclass.IN, rdtype)]
+        zone.respond(response, qname, rdtype)
+
+        if edns:
+            response.use_edns(0, 0, self.edns_udp_size)
+
+        return response.to_wire(max_size=65535)
+
+    def stats(self):
+        return {
+            'fast_path_hits': self.hits,
+            'fast_path_misses': self.misses,
+        }
@@ -26,7 +26,9 @@ import dns.opcode
 from oslo_config import cfg
 from oslo_log import log as logging
 
+from designate import dnsutils
 from designate.mdns import base
+from designate.mdns import poller
 from designate.i18n import _LI
 from designate.i18n import _LW
 
@@ -37,9 +39,50 @@ CONF = cfg.CONF
 
 
 class NotifyEndpoint(base.BaseEndpoint):
-    RPC_API_VERSION = '2.0'
+    RPC_API_VERSION = '2.1'
     RPC_API_NAMESPACE = 'notify'
 
+    def __init__(self, tg):
+        super(NotifyEndpoint, self).__init__(tg)
+
+        # Connections kept open to the nameservers when all_tcp is set
+        self.tcp_pool = dnsutils.TCPConnectionPool(
+            CONF['service:mdns'].tcp_pool_idle_timeout)
+
+        self.poller = poller.SerialPoller(
+            self._report_serial_numbers, self.rtt,
+            tcp=self.tcp_pool if CONF['service:mdns'].all_tcp else None,
+            sockets=CONF['service:mdns'].poll_sockets,
+            batch_size=CONF['service:mdns'].poll_batch_size,
+            batch_interval=CONF['service:mdns'].poll_batch_interval)
+
+        # (zone name, host, port) -> the latest domain a NOTIFY is waiting
+        # to be sent for
+        self._pending_notifies = {}
+        self.notifies_coalesced = 0
+        self.notifies_sent = 0
+
+    @property
+    def rtt(self):
+        return dnsutils.RTTEstimator.get_instance('service:mdns')
+
+    def stats(self):
+        stats = {
+            'notify_coalesced': self.notifies_coalesced,
+            'notify_sent': self.notifies_sent,
+            'notify_pending': len(self._pending_notifies),
+        }
+        stats.update(self.tcp_pool.stats())
+
+        return stats
+
+    def start(self):
+        self.poller.start()
+
+    def stop(self):
+        self.poller.stop()
+        self.tcp_pool.close()
+
     def notify_zone_changed(self, context, domain, host, port, timeout,
                             retry_interval, max_retries, delay):
         """
@@ -57,9 +100,34 @@ class NotifyEndpoint(base.BaseEndpoint):
         :return: a tuple of (response, current_retry) where
             response is the response on success or None on failure.
             current_retry is the current retry number.
+            If a NOTIFY for the same zone and target is already waiting to be
+            sent, it is sent for this domain instead and (None, 0) is
+            returned.
             The return value is just used for testing and not by pool manager.
         """
-        time.sleep(delay)
+        key = (domain.name, host, port)
+
+        if key in self._pending_notifies:
+            # Let the NOTIFY already waiting carry this change's serial
+            # rather than send another.
+            self._pending_notifies[key] = domain
+            self.notifies_coalesced += 1
+            LOG.debug("Coalesced NOTIFY for '%(zone)s' serial %(serial)s to "
+                      "'%(host)s:%(port)d'" %
+                      {'zone': domain.name, 'serial': domain.serial,
+                       'host': host, 'port': port})
+            return (None, 0)
+
+        self._pending_notifies[key] = domain
+        try:
+            time.sleep(
+                max(delay, CONF['service:mdns'].notify_coalesce_window))
+        finally:
+            # Changes made from now on may not be in the transfer this
+            # NOTIFY triggers, so they get a NOTIFY of their own.
+            domain = self._pending_notifies.pop(key)
+
+        self.notifies_sent += 1
         return self._make_and_send_dns_message(
             domain, host, port, timeout, retry_interval, max_retries,
             notify=True)
@@ -86,6 +154,36 @@ class NotifyEndpoint(base.BaseEndpoint):
         self.pool_manager_api.update_status(
             context, domain, nameserver, status, actual_serial)
 
+    def poll_for_serial_numbers(self, context, polls, timeout,
+                                retry_interval, max_retries, delay):
+        """
+        :param context: The user context.
+        :param polls: A list of (domain, nameserver) pairs, domain.serial
+            being the serial expected on the nameserver.
+        :param timeout: The time (in seconds) to wait for a SOA response from
+            nameserver.
+        :param retry_interval: The time (in seconds) between retries.
+        :param max_retries: The maximum number of retries mindns would do for
+            an expected serial number. After this many retries, mindns returns
+            an ERROR.
+        :param delay: The time to wait before sending the first request.
+        :return: The pool manager is informed of the statuses in batches with
+            update_status_many.
+        """
+        for domain, nameserver in polls:
+            self.poller.poll(context, domain, nameserver, timeout,
+                             retry_interval, max_retries, delay)
+
+    def _report_serial_numbers(self, results):
+        # Each pool's manager only hears about its own domains
+        pools = {}
+        for context, domain, nameserver, status, actual_serial in results:
+            pools.setdefault(domain.pool_id, (context, []))[1].append(
+                (domain, nameserver, status, actual_serial))
+
+        for context, statuses in pools.values():
+            self.pool_manager_api.update_status_many(context, statuses)
+
     def get_serial_number(self, context, domain, host, port, timeout,
                           retry_interval, max_retries, delay):
         """
@@ -138,7 +236,8 @@ class NotifyEndpoint(base.BaseEndpoint):
                           'as': actual_serial, 'retries': retries})
                 if retries > 0:
                     # retry again
-                    time.sleep(retry_interval)
+                    time.sleep(self.rtt.backoff(
+                        retry_interval, max_retries - retries))
                     continue
                 else:
                     break
@@ -173,27 +272,41 @@ class NotifyEndpoint(base.BaseEndpoint):
         retry = 0
         response = None
 
+        destination = (host, port)
+
         while retry < max_retries:
             retry = retry + 1
+
+            if self.rtt.is_down(destination):
+                LOG.warn(_LW("Not sending '%(msg)s' for '%(zone)s' to "
+                             "'%(server)s:%(port)d', it is down.") %
+                         {'msg': 'NOTIFY' if notify else 'SOA',
+                          'zone': domain.name, 'server': host,
+                          'port': port})
+                break
+
             LOG.info(_LI("Sending '%(msg)s' for '%(zone)s' to '%(server)s:"
                          "%(port)d'.") %
                      {'msg': 'NOTIFY' if notify else 'SOA',
                       'zone': domain.name, 'server': host,
                       'port': port})
+            message_timeout = self.rtt.timeout(destination, timeout)
+            start = time.time()
             response = self._send_dns_message(
-                dns_message, host, port, timeout)
+                dns_message, host, port, message_timeout)
 
             if isinstance(response, dns.exception.Timeout):
                 LOG.warn(_LW("Got Timeout while trying to send '%(msg)s' for "
                              "'%(zone)s' to '%(server)s:%(port)d'. Timeout="
-                             "'%(timeout)d' seconds. Retry='%(retry)d'") %
+                             "'%(timeout).2f' seconds. Retry='%(retry)d'") %
                          {'msg': 'NOTIFY' if notify else 'SOA',
                           'zone': domain.name, 'server': host,
-                          'port': port, 'timeout': timeout,
+                          'port': port, 'timeout': message_timeout,
                           'retry': retry})
+                self.rtt.failure(destination)
                 response = None
                 # retry sending the message if we get a Timeout.
-                time.sleep(retry_interval)
+                time.sleep(self.rtt.backoff(retry_interval, retry))
                 continue
             elif isinstance(response, dns_query.BadResponse):
                 LOG.warn(_LW("Got BadResponse while trying to send '%(msg)s' "
@@ -205,9 +318,12 @@ class NotifyEndpoint(base.BaseEndpoint):
                           'retry': retry})
                 response = None
                 break
+
+            self.rtt.sample(destination, time.time() - start)
+
             # Check that we actually got a NOERROR in the rcode and and an
             # authoritative answer
-            elif response.rcode() in (dns.rcode.NXDOMAIN, dns.rcode.REFUSED,
+            if response.rcode() in (dns.rcode.NXDOMAIN, dns.rcode.REFUSED,
                                       dns.rcode.SERVFAIL):
                 LOG.info(_LI("%(zone)s not found on %(server)s:%(port)d") %
                          {'zone': domain.name, 'server': host,
@@ -262,8 +378,8 @@ class NotifyEndpoint(base.BaseEndpoint):
                 response = dns_query.udp(
                     dns_message, host, port=port, timeout=timeout)
             else:
-                response = dns_query.tcp(
-                    dns_message, host, port=port, timeout=timeout)
+                response = self.tcp_pool.query(
+                    dns_message, host, port, timeout)
             return response
         except dns.exception.Timeout as timeout:
             return timeout
@@ -0,0 +1,422 @@
+# Copyright 2015 Hewlett-Packard Development Company, L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import heapq
+import itertools
+import random
+import socket
+import time
+
+import dns.exception
+import dns.flags
+import dns.message
+import dns.name
+import dns.opcode
+import dns.rcode
+import dns.rdataclass
+import dns.rdatatype
+import eventlet
+import eventlet.event
+from oslo_log import log as logging
+
+from designate import dnsutils
+from designate.i18n import _LE
+from designate.i18n import _LW
+
+
+LOG = logging.getLogger(__name__)
+
+
+class SerialPoll(object):
+    """The state of polling a single nameserver for a domain's serial"""
+    def __init__(self, context, domain, nameserver, timeout, retry_interval,
+                 max_retries):
+        self.context = context
+        self.domain = domain
+        self.nameserver = nameserver
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.retries = max_retries
+
+        self.name = dns.name.from_text(domain.name)
+        self.status = 'ERROR'
+        self.actual_serial = None
+        self.attempt = 0
+        self.sent_at = None
+        self.finished = False
+
+    @property
+    def destination(self):
+        return (self.nameserver.host, self.nameserver.port)
+
+
+class SerialPoller(object):
+    """
+    Polls nameservers for the serial of the domains they serve.
+
+    Rather than a greenthread and a socket per poll, SOA queries for every
+    outstanding poll are multiplexed over a small number of UDP sockets, and
+    responses are matched back to their poll by socket and message ID. The
+    initial delay, retries and timeouts of all polls are scheduled on a
+    single timer heap.
+
+    Finished polls are handed to ``report`` in batches, once ``batch_size``
+    results have accumulated or ``batch_interval`` seconds after the first
+    of them finished, as a list of (poll context, domain, nameserver,
+    status, actual serial) tuples.
+
+    The timeout of each query and the interval between retries are adapted
+    to the nameserver by ``rtt``, a :class:`designate.dnsutils.RTTEstimator`,
+    and nameservers it considers down aren't queried at all.
+
+    Given ``tcp``, a :class:`designate.dnsutils.TCPConnectionPool`, queries
+    are sent over its connections instead of UDP.
+    """
+    def __init__(self, report, rtt=None, tcp=None, sockets=4,
+                 batch_size=100, batch_interval=1.0):
+        self.report = report
+        self.rtt = rtt or dnsutils.RTTEstimator()
+        self.tcp = tcp
+        self.sockets = sockets
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+
+        self._socks = {}
+        self._next_sock = itertools.count()
+        self._readers = []
+        self._outstanding = {}
+
+        self._heap = []
+        self._sequence = itertools.count()
+        self._wakeup = eventlet.event.Event()
+        self._scheduler = None
+
+        self._results = []
+        self._flusher = None
+
+        self.sent = 0
+        self.received = 0
+        self.timeouts = 0
+
+    def start(self):
+        self._scheduler = eventlet.spawn(self._run)
+
+    def stop(self):
+        if self._scheduler is not None:
+            self._scheduler.kill()
+            self._scheduler = None
+
+        for reader in self._readers:
+            reader.kill()
+        self._readers = []
+
+        for socks in self._socks.values():
+            for sock in socks:
+                sock.close()
+        self._socks = {}
+
+        # Don't lose the results we already have
+        self._flush()
+
+    def poll(self, context, domain, nameserver, timeout, retry_interval,
+             max_retries, delay):
+        """
+        Start polling a nameserver until it serves domain.serial or later
+
+        :param context: The context to report the result with.
+        :param domain: The designate domain object, domain.serial being the
+                       expected serial.
+        :param nameserver: The nameserver to poll.
+        :param timeout: Seconds to wait for each SOA response.
+        :param retry_interval: Seconds between attempts.
+        :param max_retries: The number of attempts before giving up.
+        :param delay: Seconds to wait before the first attempt.
+        """
+        poll = SerialPoll(context, domain, nameserver, timeout,
+                          retry_interval, max_retries)
+        self._schedule(time.time() + delay, self._send, poll)
+
+        return poll
+
+    def stats(self):
+        return {
+            'outstanding': len(self._outstanding),
+            'scheduled': len(self._heap),
+            'sent': self.sent,
+            'received': self.received,
+            'timeouts': self.timeouts,
+        }
+
+    # Scheduling
+    def _schedule(self, due, action, poll, *args):
+        heapq.heappush(self._heap,
+                       (due, next(self._sequence), action, poll, args))
+
+        if not self._wakeup.ready():
+            self._wakeup.send()
+
+    def _run(self):
+        while True:
+            if self._heap:
+                wait = self._heap[0][0] - time.time()
+            else:
+                wait = None
+
+            if wait is None or wait > 0:
+                # Sleep until the next event is due, or an earlier event is
+                # scheduled.
+                with eventlet.Timeout(wait, False):
+                    self._wakeup.wait()
+
+                if self._wakeup.ready():
+                    self._wakeup = eventlet.event.Event()
+
+                continue
+
+            due, sequence, action, poll, args = heapq.heappop(self._heap)
+
+            try:
+                action(poll, *args)
+            except Exception:
+                LOG.exception(_LE("Failed polling '%(host)s:%(port)s' for "
+                                  "'%(zone)s'") %
+                              {'host': poll.nameserver.host,
+                               'port': poll.nameserver.port,
+                               'zone': poll.domain.name})
+                self._finish(poll)
+
+    # Sending and receiving
+    def _socket(self, host):
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+
+        socks = self._socks.setdefault(family, [])
+        if len(socks) < self.sockets:
+            sock = socket.socket(family, socket.SOCK_DGRAM)
+            sock.bind(('::' if family == socket.AF_INET6 else '0.0.0.0', 0))
+            socks.append(sock)
+
+            self._readers.append(eventlet.spawn(self._recv, sock))
+
+            return sock
+
+        return socks[next(self._next_sock) % len(socks)]
+
+    def _message_id(self, sock):
+        while True:
+            message_id = random.randint(0, 65535)
+            if (sock, message_id) not in self._outstanding:
+                return message_id
+
+    def _send(self, poll):
+        if poll.finished:
+            return
+
+        poll.attempt += 1
+
+        if self.rtt.is_down(poll.destination):
+            LOG.warning(_LW("Not sending SOA query for '%(zone)s' to "
+                            "'%(host)s:%(port)s', it is down") %
+                        {'zone': poll.domain.name,
+                         'host': poll.nameserver.host,
+                         'port': poll.nameserver.port})
+            self._retry(poll)
+            return
+
+        query = dns.message.make_query(poll.name, dns.rdatatype.SOA)
+        # Setting the flags to RD causes BIND9 to respond with a NXDOMAIN.
+        query.flags = dns.flags.RD
+        query.set_opcode(dns.opcode.QUERY)
+
+        timeout = self.rtt.timeout(poll.destination, poll.timeout)
+
+        if self.tcp is not None:
+            eventlet.spawn_n(self._send_tcp, poll, query, timeout)
+            return
+
+        sock = self._socket(poll.nameserver.host)
+        message_id = self._message_id(sock)
+        query.id = message_id
+
+        self._outstanding[(sock, message_id)] = poll
+
+        try:
+            poll.sent_at = time.time()
+            sock.sendto(query.to_wire(), poll.destination)
+            self.sent += 1
+        except socket.error as e:
+            LOG.warning(_LW("Failed sending SOA query for '%(zone)s' to "
+                            "'%(host)s:%(port)s': %(err)s") %
+                        {'zone': poll.domain.name,
+                         'host': poll.nameserver.host,
+                         'port': poll.nameserver.port, 'err': e})
+
+        self._schedule(time.time() + timeout, self._expire, poll,
+                       sock, message_id, poll.attempt, timeout)
+
+    def _send_tcp(self, poll, query, timeout):
+        attempt = poll.attempt
+        poll.sent_at = time.time()
+        self.sent += 1
+
+        try:
+            response = self.tcp.query(query, poll.nameserver.host,
+                                      poll.nameserver.port, timeout)
+        except (dns.exception.Timeout, socket.error) as e:
+            LOG.warning(_LW("Failed sending SOA query for '%(zone)s' to "
+                            "'%(host)s:%(port)s' over TCP: %(err)r") %
+                        {'zone': poll.domain.name,
+                         'host': poll.nameserver.host,
+                         'port': poll.nameserver.port, 'err': e})
+
+            if not poll.finished and poll.attempt == attempt:
+                self.timeouts += 1
+                self.rtt.failure(poll.destination)
+                self._retry(poll)
+            return
+        except Exception:
+            LOG.exception(_LE("Failed polling '%(host)s:%(port)s' for "
+                              "'%(zone)s'") %
+                          {'host': poll.nameserver.host,
+                           'port': poll.nameserver.port,
+                           'zone': poll.domain.name})
+            self._finish(poll)
+            return
+
+        self.received += 1
+        self.rtt.sample(poll.destination, time.time() - poll.sent_at)
+
+        if not poll.finished and poll.attempt == attempt:
+            self._response(poll, response)
+
+    def _recv(self, sock):
+        while True:
+            try:
+                payload, addr = sock.recvfrom(65535)
+            except socket.error:
+                # The socket was closed when stopping
+                return
+
+            try:
+                response = dns.message.from_wire(payload)
+            except dns.exception.DNSException:
+                LOG.debug('Discarding malformed SOA response from %s', addr)
+                continue
+
+            poll = self._outstanding.get((sock, response.id))
+
+            # Ignore anything which isn't a response to the question we asked
+            # of the nameserver we asked.
+            if (poll is None or addr[0] != poll.nameserver.host or
+                    addr[1] != poll.nameserver.port or
+                    len(response.question) != 1 or
+                    response.question[0].name != poll.name):
+                continue
+
+            del self._outstanding[(sock, response.id)]
+            self.received += 1
+            self.rtt.sample(poll.destination, time.time() - poll.sent_at)
+
+            self._response(poll, response)
+
+    def _expire(self, poll, sock, message_id, attempt, timeout):
+        if poll.finished or poll.attempt != attempt:
+            return
+
+        if self._outstanding.pop((sock, message_id), None) is None:
+            # Answered already
+            return
+
+        self.timeouts += 1
+        self.rtt.failure(poll.destination)
+
+        LOG.warning(_LW("Got Timeout while trying to send 'SOA' for "
+                        "'%(zone)s' to '%(host)s:%(port)s'. Timeout="
+                        "'%(timeout)s' seconds. Attempt='%(attempt)d'") %
+                    {'zone': poll.domain.name, 'host': poll.nameserver.host,
+                     'port': poll.nameserver.port, 'timeout': timeout,
+                     'attempt': attempt})
+
+        self._retry(poll)
+
+    def _response(self, poll, response):
+        if response.rcode() in (dns.rcode.NXDOMAIN, dns.rcode.REFUSED,
+                                dns.rcode.SERVFAIL):
+            poll.status = 'NO_DOMAIN'
+
+        elif (response.rcode() == dns.rcode.NOERROR and
+                response.flags & dns.flags.AA and
+                len(response.answer) == 1 and
+                response.answer[0].name == poll.name and
+                response.answer[0].rdclass == dns.rdataclass.IN and
+                response.answer[0].rdtype == dns.rdatatype.SOA):
+            poll.actual_serial = response.answer[0][0].serial
+
+            # TODO(vinod): Account for serial number wrap around.
+            if poll.actual_serial >= poll.domain.serial:
+                poll.status = 'SUCCESS'
+                self._finish(poll)
+                return
+
+        LOG.warning(_LW("Got lower serial for '%(zone)s' to '%(host)s:"
+                        "%(port)s'. Expected:'%(es)d'. Got:'%(as)s'. "
+                        "Rcode='%(rcode)s'") %
+                    {'zone': poll.domain.name, 'host': poll.nameserver.host,
+                     'port': poll.nameserver.port, 'es': poll.domain.serial,
+                     'as': poll.actual_serial,
+                     'rcode': dns.rcode.to_text(response.rcode())})
+
+        self._retry(poll)
+
+    def _retry(self, poll):
+        poll.retries -= 1
+
+        if poll.retries > 0:
+            self._schedule(
+                time.time() + self.rtt.backoff(poll.retry_interval,
+                                               poll.attempt),
+                self._send, poll)
+        else:
+            self._finish(poll)
+
+    # Reporting
+    def _finish(self, poll):
+        if poll.finished:
+            return
+
+        poll.finished = True
+
+        self._results.append((poll.context, poll.domain, poll.nameserver,
+                              poll.status, poll.actual_serial))
+
+        if len(self._results) >= self.batch_size:
+            self._flush()
+
+        elif self._flusher is None:
+            self._flusher = eventlet.spawn_after(
+                self.batch_interval, self._flush)
+
+    def _flush(self):
+        if self._flusher is not None:
+            # Don't let a pending flush cancel itself
+            if self._flusher is not eventlet.getcurrent():
+                self._flusher.cancel()
+            self._flusher = None
+
+        results, self._results = self._results, []
+
+        if results:
+            try:
+                self.report(results)
+            except Exception:
+                LOG.exception(_LE("Failed reporting %d serial poll results"),
+                              len(results))
@@ -35,11 +35,12 @@ class MdnsAPI(object):
         1.0 - Added notify_zone_changed and poll_for_serial_number.
         1.1 - Added get_serial_number.
         2.0 - Changed method signatures
+        2.1 - Added poll_for_serial_numbers
 
     XFR API version history:
         1.0 - Added perform_zone_xfr.
     """
-    RPC_NOTIFY_API_VERSION = '2.0'
+    RPC_NOTIFY_API_VERSION = '2.1'
     RPC_XFR_API_VERSION = '1.0'
 
     def __init__(self, topic=None):
@@ -48,7 +49,7 @@ class MdnsAPI(object):
         notify_target = messaging.Target(topic=topic,
                                          namespace='notify',
                                          version=self.RPC_NOTIFY_API_VERSION)
-        self.notify_client = rpc.get_client(notify_target, version_cap='2.0')
+        self.notify_client = rpc.get_client(notify_target, version_cap='2.1')
 
         xfr_target = messaging.Target(topic=topic,
                                       namespace='xfr',
@@ -99,6 +100,19 @@ class MdnsAPI(object):
             retry_interval=retry_interval, max_retries=max_retries,
             delay=delay)
 
+    def poll_for_serial_numbers(self, context, polls, timeout,
+                                retry_interval, max_retries, delay):
+        LOG.info(
+            _LI("poll_for_serial_numbers: Calling mdns for %(count)d "
+                "zone and nameserver pairs") % {'count': len(polls)})
+        # Like poll_for_serial_number this is a cast, mdns informs pool
+        # manager of the results in batches using update_status_many.
+        cctxt = self.notify_client.prepare(version='2.1')
+        return cctxt.cast(
+            context, 'poll_for_serial_numbers', polls=polls,
+            timeout=timeout, retry_interval=retry_interval,
+            max_retries=max_retries, delay=delay)
+
     def get_serial_number(self, context, domain, host, port, timeout,
                           retry_interval, max_retries, delay):
         LOG.info(
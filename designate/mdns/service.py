@@ -13,9 +13,13 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import os
+
 from oslo_config import cfg
 from oslo_log import log as logging
+import oslo_messaging as messaging
 
+from designate import rpc
 from designate import utils
 from designate import service
 from designate import storage
@@ -23,6 +27,8 @@ from designate import dnsutils
 from designate.mdns import handler
 from designate.mdns import notify
 from designate.mdns import xfr
+from designate.mdns import zonefilter
+from designate.mdns import zonetree
 
 LOG = logging.getLogger(__name__)
 CONF = cfg.CONF
@@ -35,6 +41,25 @@ class Service(service.DNSService, service.RPCService, service.Service):
         # Get a storage connection
         self.storage = storage.get_storage(CONF['service:mdns'].storage_driver)
 
+        # TsigKeys, shared between the keyring verifying signatures and the
+        # middleware which scopes requests to the key's pool or zone.
+        self.tsigkey_cache = dnsutils.TsigKeyCache(
+            self.storage, CONF['service:mdns'].tsigkey_cache_ttl)
+
+        # The names of the zones we host, to refuse queries for others
+        self.zone_filter = None
+        if CONF['service:mdns'].zone_filter_interval > 0:
+            self.zone_filter = zonefilter.ZoneFilter(
+                self.storage, CONF['service:mdns'].zone_filter_error_rate)
+
+        # The hosted zones held in memory to answer queries from
+        self.zone_tree = zonetree.ZoneTree(
+            CONF['service:mdns'].zone_tree_size,
+            CONF['service:mdns'].zone_tree_ttl)
+
+        self._notification_listener = None
+        self.fast_path = None
+
     @property
     def service_name(self):
         return 'mdns'
@@ -44,14 +69,87 @@ class Service(service.DNSService, service.RPCService, service.Service):
     def _rpc_endpoints(self):
         return [notify.NotifyEndpoint(self.tg), xfr.XfrEndpoint(self.tg)]
 
+    def dns_stats(self):
+        stats = super(Service, self).dns_stats()
+
+        for endpoint in self._rpc_endpoints:
+            if hasattr(endpoint, 'stats'):
+                stats.update(endpoint.stats())
+
+        if self.zone_filter is not None:
+            stats.update(self.zone_filter.stats())
+
+        if self.fast_path is not None:
+            stats.update(self.fast_path.stats())
+
+        return stats
+
     @property
     @utils.cache_result
     def _dns_application(self):
         # Create an instance of the RequestHandler class and wrap with
         # necessary middleware.
-        application = handler.RequestHandler(self.storage, self.tg)
-        application = dnsutils.TsigInfoMiddleware(application, self.storage)
+        request_handler = handler.RequestHandler(
+            self.storage, self.tg, self.zone_filter, self.zone_tree)
+        application = dnsutils.TsigInfoMiddleware(
+            request_handler, self.storage, self.tsigkey_cache)
         application = dnsutils.SerializationMiddleware(
-            application, dnsutils.TsigKeyring(self.storage))
+            application,
+            dnsutils.TsigKeyring(self.storage, self.tsigkey_cache),
+            CONF['service:mdns'].edns_udp_size)
+
+        # Unsigned queries answered from the zone tree may skip all of the
+        # above, unless every query must be signed.
+        if (CONF['service:mdns'].wire_fast_path and
+                request_handler.zone_tree.enabled and
+                not CONF['service:mdns'].query_enforce_tsig):
+            application = handler.FastPathMiddleware(
+                application, request_handler,
+                CONF['service:mdns'].edns_udp_size)
+            self.fast_path = application
 
         return application
+
+    def start(self):
+        super(Service, self).start()
+
+        endpoints = []
+
+        if self.tsigkey_cache.ttl > 0:
+            endpoints.append(self.tsigkey_cache)
+
+        if self.zone_filter is not None:
+            endpoints.append(self.zone_filter)
+
+            # The first run builds the filter, until then nothing is refused
+            interval = CONF['service:mdns'].zone_filter_interval
+            self.tg.add_timer(interval, self.zone_filter.rebuild)
+
+        if self.zone_tree.enabled:
+            endpoints.append(self.zone_tree)
+
+        if endpoints:
+            # Listen in a pool of our own, so central's notifications are
+            # not taken away from any other consumer of them. Each worker
+            # process keeps its own zone filter, zone tree and TSIG key
+            # cache, so each needs every notification and listens in a pool
+            # of its own.
+            targets = [messaging.Target(topic=topic)
+                       for topic in CONF.notification_topics]
+            pool = '%s-notifications.%s.%d' % (
+                self.service_name, self._host, os.getpid())
+
+            self._notification_listener = rpc.get_listener(
+                targets, endpoints, pool=pool)
+            self._notification_listener.start()
+
+    def stop(self):
+        if self._notification_listener is not None:
+            # Try to shut the connection down, but if we get any sort of
+            # errors, go ahead and ignore them.. as we're shutting down anyway
+            try:
+                self._notification_listener.stop()
+            except Exception:
+                pass
+
+        super(Service, self).stop()
@@ -13,45 +13,202 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import hashlib
+import itertools
+
+import dns.rdatatype
 from oslo_config import cfg
-from oslo_utils import timeutils
 from oslo_log import log as logging
 
 from designate import dnsutils
 from designate import exceptions
+from designate import storage
+from designate.i18n import _LI
 from designate.mdns import base
 
 
 LOG = logging.getLogger(__name__)
 
 
+def _rrset_hash(ttl, data):
+    """A digest of an RRSet's TTL and records, independent of their order"""
+    digest = hashlib.md5(str(ttl).encode('utf-8'))
+    for item in sorted(data):
+        digest.update(b'\n' + item.encode('utf-8'))
+    return digest.hexdigest()
+
+
 class XFRMixin(object):
     """
     Utility mixin that holds common methods for XFR functionality.
+
+    Classes using it must provide a storage attribute.
     """
     def domain_sync(self, context, domain, servers=None):
+        """
+        Transfers a secondary domain from its masters, and has central apply
+        the RecordSets that differ from the stored ones.
+
+        Domains which have been transferred before are brought up to date
+        with an IXFR, falling back to an AXFR when the masters don't support
+        it, or can't express the changes since our serial.
+        """
         servers = servers or domain.masters
         servers = servers.to_list()
 
         timeout = cfg.CONF["service:mdns"].xfr_timeout
-        try:
-            dnspython_zone = dnsutils.do_axfr(domain.name, servers,
-                                              timeout=timeout)
-        except exceptions.XFRFailure as e:
-            LOG.warning(e.message)
-            return
 
-        zone = dnsutils.from_dnspython_zone(dnspython_zone)
-        domain.update(zone)
+        changes = None
+
+        if (domain.obj_attr_is_set('transferred_at') and
+                domain.transferred_at is not None):
+            try:
+                changes = self._ixfr_changes(context, domain, servers,
+                                             timeout)
+            except exceptions.XFRFailure as e:
+                LOG.info(_LI("Falling back to AXFR: %s") % e.message)
+
+        if changes is None:
+            try:
+                dnspython_zone = dnsutils.do_axfr(domain.name, servers,
+                                                  timeout=timeout)
+            except exceptions.XFRFailure as e:
+                LOG.warning(e.message)
+                return
+
+            changes = self._axfr_changes(context, domain, dnspython_zone)
+
+        values, recordsets, deletions = changes
+
+        LOG.info(_LI("Syncing %(zone)s to serial %(serial)s, %(changed)d "
+                     "RecordSets changed and %(deleted)d deleted") %
+                 {'zone': domain.name, 'serial': values['serial'],
+                  'changed': len(recordsets), 'deleted': len(deletions)})
+
+        self.central_api.apply_domain_changes(
+            context, domain.id, values, recordsets, deletions)
+
+    def _soa_values(self, ttl, soa):
+        email = soa.rname.to_text().rstrip('.')
+        email = email.replace('.', '@', 1)
+
+        return {
+            'email': email,
+            'ttl': ttl,
+            'serial': soa.serial,
+            'retry': soa.retry,
+            'expire': soa.expire,
+        }
+
+    def _stored_rrsets(self, context, domain, criterion=None):
+        """Yields the (name, type, ttl, data) of stored RecordSets"""
+        criterion = dict(criterion or {}, domain_id=domain.id)
+
+        rows = self.storage.find_recordsets_axfr(context, criterion)
+
+        # The rows are ordered by name and type
+        for (name, type_), group in itertools.groupby(
+                rows, lambda row: (row[0], row[1])):
+            group = list(group)
+            yield name, type_, group[0][2], [row[3] for row in group]
+
+    def _changes(self, stored, transferred):
+        """
+        Compares RecordSets by hash, returning the transferred RecordSets
+        which differ from the stored ones, and the (name, type) of those
+        which are no longer in the zone.
+        """
+        recordsets = []
+        deletions = []
+
+        for key in sorted(transferred):
+            ttl, data = transferred[key]
+
+            if not data:
+                if key in stored:
+                    deletions.append(list(key))
+            elif stored.get(key) != _rrset_hash(ttl, data):
+                recordsets.append({'name': key[0], 'type': key[1],
+                                   'ttl': ttl, 'records': sorted(data)})
 
-        domain.transferred_at = timeutils.utcnow()
+        return recordsets, deletions
 
-        self.central_api.update_domain(context, domain, increment_serial=False)
+    def _axfr_changes(self, context, domain, dnspython_zone):
+        soa = dnspython_zone.get_rdataset(dnspython_zone.origin, 'SOA')
+        if soa is None:
+            raise exceptions.BadRequest('An SOA record is required')
+
+        transferred = {}
+        for name, node in dnspython_zone.nodes.items():
+            for rdataset in node:
+                key = (name.to_text(),
+                       dns.rdatatype.to_text(rdataset.rdtype))
+                transferred[key] = (rdataset.ttl or None,
+                                    [rdata.to_text() for rdata in rdataset])
+
+        stored = {}
+        for name, type_, ttl, data in self._stored_rrsets(context, domain):
+            stored[(name, type_)] = _rrset_hash(ttl, data)
+
+            # RecordSets no longer in the zone are deleted
+            transferred.setdefault((name, type_), (None, []))
+
+        recordsets, deletions = self._changes(stored, transferred)
+
+        return self._soa_values(soa.ttl, soa[0]), recordsets, deletions
+
+    def _ixfr_changes(self, context, domain, servers, timeout):
+        result = dnsutils.do_ixfr(domain.name, servers, domain.serial,
+                                  timeout=timeout)
+        if result is None:
+            return None
+
+        (soa_ttl, soa), changes = result
+
+        # Replay the changes over the stored RecordSets they touch
+        stored = {}
+        transferred = {}
+
+        def _rrset(key):
+            if key not in transferred:
+                transferred[key] = (None, [])
+
+                for name, type_, ttl, data in self._stored_rrsets(
+                        context, domain, {'name': key[0], 'type': key[1]}):
+                    stored[key] = _rrset_hash(ttl, data)
+                    transferred[key] = (ttl, data)
+
+            return transferred[key]
+
+        for operation, name, ttl, rdata in changes:
+            key = (name.to_text(), dns.rdatatype.to_text(rdata.rdtype))
+            rrset_ttl, data = _rrset(key)
+            text = rdata.to_text()
+
+            if operation == 'DELETE':
+                if text in data:
+                    data.remove(text)
+            elif text not in data:
+                data.append(text)
+                transferred[key] = (ttl, data)
+
+        _rrset((domain.name, 'SOA'))
+        transferred[(domain.name, 'SOA')] = (soa_ttl, [soa.to_text()])
+
+        recordsets, deletions = self._changes(stored, transferred)
+
+        return self._soa_values(soa_ttl, soa), recordsets, deletions
 
 
 class XfrEndpoint(base.BaseEndpoint, XFRMixin):
     RPC_API_VERSION = '1.0'
     RPC_API_NAMESPACE = 'xfr'
 
+    def __init__(self, tg):
+        super(XfrEndpoint, self).__init__(tg)
+
+        self.storage = storage.get_storage(
+            cfg.CONF['service:mdns'].storage_driver)
+
     def perform_zone_xfr(self, context, domain):
         self.domain_sync(context, domain)
@@ -0,0 +1,136 @@
+# Copyright 2015 Hewlett-Packard Development Company, L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import collections
+
+from oslo_log import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+
+class AXFRCache(object):
+    """
+    A size bounded LRU cache of rendered AXFR responses.
+
+    Entries are keyed by (zone id, serial), and hold the wire format of each
+    message making up the transfer *before* the header ID and TSIG are
+    applied. As the rendering depends on the requested question and the
+    maximum message size, each entry may hold a small number of variants.
+
+    Storing a new serial for a zone evicts any entries held for older serials
+    of that zone.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+
+        self._entries = collections.OrderedDict()
+        self._serials = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    @staticmethod
+    def _size(packets):
+        return sum(len(packet) for packet in packets)
+
+    def get(self, zone_id, serial, variant):
+        """
+        Fetch the cached packets for a zone at a serial
+
+        :param zone_id: The ID of the zone
+        :param serial: The serial of the zone
+        :param variant: Hashable description of the rendering, e.g. the
+                        question and maximum message size.
+        :return: A list of wire format packets, or None on a cache miss
+        """
+        key = (zone_id, serial, variant)
+
+        try:
+            packets = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+
+        # Re-insert the entry, marking it as the most recently used.
+        self._entries[key] = packets
+        self.hits += 1
+
+        return packets
+
+    def store(self, zone_id, serial, variant, packets):
+        """
+        Store the rendered packets for a zone at a serial
+
+        :param zone_id: The ID of the zone
+        :param serial: The serial of the zone
+        :param variant: Hashable description of the rendering
+        :param packets: A list of wire format packets
+        :return: True if the packets were cached, False otherwise
+        """
+        size = self._size(packets)
+
+        if not self.enabled or size > self.max_size:
+            return False
+
+        # A newer serial invalidates everything we know about the zone
+        current = self._serials.get(zone_id)
+        if current is not None and current != serial:
+            self.invalidate(zone_id)
+
+        key = (zone_id, serial, variant)
+        if key in self._entries:
+            self.bytes -= self._size(self._entries.pop(key))
+
+        while self._entries and self.bytes + size > self.max_size:
+            self._evict()
+
+        self._entries[key] = packets
+        self._serials[zone_id] = serial
+        self.bytes += size
+
+        return True
+
+    def invalidate(self, zone_id):
+        """Drop any cached packets for a zone"""
+        for key in [k for k in self._entries if k[0] == zone_id]:
+            self.bytes -= self._size(self._entries.pop(key))
+            self.evictions += 1
+
+        self._serials.pop(zone_id, None)
+
+    def _evict(self):
+        key, packets = self._entries.popitem(last=False)
+        self.bytes -= self._size(packets)
+        self.evictions += 1
+
+        if not any(k[0] == key[0] for k in self._entries):
+            self._serials.pop(key[0], None)
+
+        LOG.debug('Evicted AXFR cache entry for zone %(zone)s serial '
+                  '%(serial)s', {'zone': key[0], 'serial': key[1]})
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'bytes': self.bytes,
+            'entries': len(self._entries),
+        }
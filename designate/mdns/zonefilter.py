@@ -0,0 +1,176 @@
+# Copyright 2015 Hewlett-Packard Development Company, L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import hashlib
+import math
+import struct
+
+import dns.name
+import six
+from oslo_log import log as logging
+
+from designate import context
+from designate.i18n import _LE
+
+
+LOG = logging.getLogger(__name__)
+
+# The fewest zones a filter is sized for, so zones created between rebuilds
+# of a near empty filter don't fill it.
+MIN_CAPACITY = 1024
+
+
+class BloomFilter(object):
+    """
+    A Bloom filter of byte strings, sized to hold ``capacity`` keys with a
+    false positive rate of ``error_rate``.
+    """
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, 1)
+
+        self.size = max(int(math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2)), 8)
+        self.hashes = max(int(round(
+            float(self.size) / capacity * math.log(2))), 1)
+
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing, the k positions are derived from two halves of a
+        # single digest.
+        h1, h2 = struct.unpack('!QQ', hashlib.md5(key).digest())
+
+        for i in six.moves.range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(key))
+
+
+class ZoneFilter(object):
+    """
+    The names of the zones we host, held in a Bloom filter, letting queries
+    for names outside of all of them be refused without reading storage.
+
+    The filter is rebuilt from storage by calling :meth:`rebuild`
+    periodically, and zones central notifies us of creating are added as
+    they are created. A Bloom filter can't forget a name, so deleted zones
+    remain in the filter until the next rebuild; queries for them, like any
+    false positive, are answered from storage as before. Until the filter
+    has first been built no query is refused.
+    """
+    EVENT_TYPES = ('dns.domain.create',)
+
+    def __init__(self, storage, error_rate=0.01):
+        self.storage = storage
+        self.error_rate = error_rate
+
+        self._filter = None
+        # Names created while a rebuild is reading from storage
+        self._created = None
+
+        self.rejects = 0
+        self.rebuilds = 0
+
+    @property
+    def ready(self):
+        return self._filter is not None
+
+    @staticmethod
+    def _key(name):
+        if not isinstance(name, dns.name.Name):
+            name = dns.name.from_text(str(name))
+
+        # The canonical, lowercased, wire format of the name
+        return name.to_digestable()
+
+    def rebuild(self):
+        """Rebuild the filter from the zones in storage"""
+        ctxt = context.DesignateContext.get_admin_context(all_tenants=True)
+        self._created = []
+
+        try:
+            names = [domain['name'] for domain in
+                     self.storage.find_domains(ctxt)]
+            names.extend(self._created)
+
+        except Exception:
+            LOG.exception(_LE('Failed to rebuild the hosted zone filter'))
+            return
+
+        finally:
+            self._created = None
+
+        bloom = BloomFilter(max(len(names) * 2, MIN_CAPACITY),
+                            self.error_rate)
+        for name in names:
+            bloom.add(self._key(name))
+
+        self._filter = bloom
+        self.rebuilds += 1
+
+        LOG.debug('Rebuilt the hosted zone filter, stats: %s', self.stats())
+
+    def add(self, name):
+        if self._created is not None:
+            self._created.append(name)
+
+        if self._filter is not None:
+            self._filter.add(self._key(name))
+
+    def excludes(self, qname):
+        """
+        Check whether a name is certainly outside of all the zones we host,
+        counting it as a fast reject if so.
+
+        :param qname: A dns.name.Name
+        """
+        bloom = self._filter
+
+        if bloom is None:
+            return False
+
+        name = qname
+        while True:
+            if self._key(name) in bloom:
+                return False
+
+            if name == dns.name.root:
+                break
+
+            name = name.parent()
+
+        self.rejects += 1
+        return True
+
+    def info(self, ctxt, publisher_id, event_type, payload, metadata):
+        """Notification endpoint, adding zones to the filter as created"""
+        if event_type in self.EVENT_TYPES:
+            LOG.debug('Adding %s to the hosted zone filter', payload['name'])
+            self.add(payload['name'])
+
+    def stats(self):
+        return {
+            'zone_filter_rejects': self.rejects,
+            'zone_filter_rebuilds': self.rebuilds,
+            'zone_filter_zones':
+                self._filter.count if self._filter is not None else 0,
+        }
@@ -0,0 +1,322 @@
+# Copyright 2015 Hewlett-Packard Development Company, L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import collections
+import time
+
+import dns.flags
+import dns.name
+import dns.rcode
+import dns.rdatatype
+import dns.rrset
+from oslo_log import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+WILDCARD = dns.name.Name([b'*'])
+
+
+class Zone(object):
+    """
+    The RRSets of a single hosted zone, at a single serial, indexed by owner
+    name and type.
+    """
+    def __init__(self, domain, rrsets, cuts=()):
+        self.id = domain.id
+        self.pool_id = domain.pool_id
+        self.serial = domain.serial
+        self.name = dns.name.from_text(str(domain.name))
+
+        # Names of other hosted zones beneath this one, queries at or below
+        # these must be answered from those zones instead.
+        self.cuts = frozenset(cuts)
+
+        self.nodes = {}
+        for rrset in rrsets:
+            self.nodes.setdefault(rrset.name, {})[rrset.rdtype] = rrset
+
+        # Empty non-terminals exist, they just don't own any RRSets.
+        for name in list(self.nodes):
+            while name != self.name and name.is_subdomain(self.name):
+                name = name.parent()
+                self.nodes.setdefault(name, {})
+
+        # Names delegated away by NS RRSets beneath the apex, this zone is
+        # not authoritative at or below them.
+        self.delegations = frozenset(
+            name for name, node in self.nodes.items()
+            if name != self.name and dns.rdatatype.NS in node)
+
+        self.checked = time.time()
+
+        # Wire format responses to plain queries, rendered from this version
+        # of the zone, by question.
+        self.templates = {}
+
+    @property
+    def soa(self):
+        return self.nodes.get(self.name, {}).get(dns.rdatatype.SOA)
+
+    def negative_soa(self):
+        """
+        The SOA to place in the authority section of a negative answer, its
+        TTL being the lesser of the SOA TTL and minimum (RFC 2308).
+        """
+        soa = self.soa
+        rrset = dns.rrset.RRset(soa.name, soa.rdclass, soa.rdtype)
+        rrset.update(soa)
+        rrset.ttl = min(soa.ttl, soa[0].minimum)
+
+        return rrset
+
+    def permits(self, criterion):
+        """Check a zone matches a domain criterion built for a request"""
+        return all(getattr(self, key) == value
+                   for key, value in criterion.items())
+
+    def below_cut(self, qname):
+        return any(qname.is_subdomain(cut) for cut in self.cuts)
+
+    def respond(self, response, qname, rdtype):
+        """
+        Answer a question from the zone into a response, authoritatively or
+        with a referral.
+
+        :param response: The dns.message.Message to answer into
+        :param qname: The dns.name.Name queried for, within the zone
+        :param rdtype: The queried type
+        """
+        referral = self.referral(qname, rdtype)
+
+        if referral is not None:
+            response.set_rcode(dns.rcode.NOERROR)
+            response.authority, response.additional = referral
+            return
+
+        rcode, answer = self.lookup(qname, rdtype)
+
+        response.set_rcode(rcode)
+        response.answer = answer
+        # For all the data stored in designate mdns is Authoritative
+        response.flags |= dns.flags.AA
+
+        if not answer:
+            response.authority = [self.negative_soa()]
+
+    def referral(self, qname, rdtype):
+        """
+        Refer a question at or below a delegation to the delegated servers.
+
+        :param qname: The dns.name.Name queried for, within the zone
+        :param rdtype: The queried type
+        :return: A tuple of (authority RRSets, additional RRSets), or None if
+                 the name is not delegated
+        """
+        if not self.delegations:
+            return None
+
+        # The delegation closest to the apex is the one that applies
+        cut = None
+        name = qname
+        while name != self.name and name.is_subdomain(self.name):
+            if name in self.delegations:
+                cut = name
+            name = name.parent()
+
+        # DS RRSets belong to the parent side of a delegation (RFC 4035)
+        if cut is None or (cut == qname and rdtype == dns.rdatatype.DS):
+            return None
+
+        ns = self.nodes[cut][dns.rdatatype.NS]
+
+        # Glue for the nameservers named within this zone
+        glue = []
+        for rdata in ns:
+            if not rdata.target.is_subdomain(self.name):
+                continue
+
+            node = self.nodes.get(rdata.target, {})
+            for glue_type in (dns.rdatatype.A, dns.rdatatype.AAAA):
+                if glue_type in node:
+                    glue.append(node[glue_type])
+
+        return [ns], glue
+
+    def lookup(self, qname, rdtype):
+        """
+        Answer a question from the zone.
+
+        :param qname: The dns.name.Name queried for, within the zone
+        :param rdtype: The queried type
+        :return: A tuple of (rcode, answer RRSets)
+        """
+        node = self.nodes.get(qname)
+        owner = qname
+
+        if node is None:
+            node = self._wildcard(qname)
+
+            if node is None:
+                return dns.rcode.NXDOMAIN, []
+
+        if rdtype == dns.rdatatype.ANY:
+            rrsets = list(node.values())
+        elif rdtype in node:
+            rrsets = [node[rdtype]]
+        elif dns.rdatatype.CNAME in node:
+            rrsets = [node[dns.rdatatype.CNAME]]
+        else:
+            rrsets = []
+
+        return dns.rcode.NOERROR, [self._owned_by(rrset, owner)
+                                   for rrset in rrsets]
+
+    def _wildcard(self, qname):
+        # Find the closest encloser of the name, and its wildcard if any
+        # (RFC 4592)
+        name = qname.parent()
+
+        while name not in self.nodes:
+            if name == self.name:
+                return None
+            name = name.parent()
+
+        return self.nodes.get(WILDCARD.concatenate(name))
+
+    @staticmethod
+    def _owned_by(rrset, owner):
+        if rrset.name == owner:
+            return rrset
+
+        # Synthesize an answer from a wildcard RRSet
+        synthesized = dns.rrset.RRset(owner, rrset.rdclass, rrset.rdtype)
+        synthesized.update(rrset)
+
+        return synthesized
+
+
+class ZoneTree(object):
+    """
+    A size bounded LRU collection of hosted zones, used to answer record
+    queries without reading from storage.
+
+    Zones are loaded lazily as they are queried, and are revalidated against
+    the serial in storage once they are older than ``ttl`` seconds. A zone
+    which has changed serial is discarded and loaded again. As hosted zones
+    are created and deleted, the zones enclosing them are discarded too.
+    """
+    EVENT_TYPES = ('dns.domain.create', 'dns.domain.delete')
+
+    def __init__(self, max_zones, ttl):
+        self.max_zones = max_zones
+        self.ttl = ttl
+
+        self._zones = collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_zones > 0
+
+    def find(self, qname):
+        """
+        Find the loaded zone authoritative for a name.
+
+        :param qname: A dns.name.Name
+        :return: The deepest loaded Zone enclosing the name, or None if the
+                 name is not within a loaded zone, or is beneath a hosted
+                 zone which isn't loaded.
+        """
+        name = qname
+
+        while True:
+            zone = self._zones.get(name)
+
+            if zone is not None:
+                break
+
+            if name == dns.name.root:
+                self.misses += 1
+                return None
+
+            name = name.parent()
+
+        if zone.below_cut(qname):
+            self.misses += 1
+            return None
+
+        # Re-insert the zone, marking it as the most recently used.
+        self._zones[name] = self._zones.pop(name)
+        self.hits += 1
+
+        return zone
+
+    def stale(self, zone, now=None):
+        now = time.time() if now is None else now
+        return now - zone.checked >= self.ttl
+
+    def store(self, zone):
+        """Add a loaded zone to the tree, replacing any earlier version"""
+        if not self.enabled:
+            return False
+
+        self._zones.pop(zone.name, None)
+
+        while len(self._zones) >= self.max_zones:
+            name, evicted = self._zones.popitem(last=False)
+            self.evictions += 1
+
+            LOG.debug('Evicted zone %(zone)s serial %(serial)s from the zone '
+                      'tree', {'zone': name, 'serial': evicted.serial})
+
+        self._zones[zone.name] = zone
+
+        return True
+
+    def invalidate(self, zone):
+        """Drop a zone from the tree"""
+        if self._zones.get(zone.name) is zone:
+            del self._zones[zone.name]
+
+    def invalidate_name(self, name):
+        """
+        Drop a zone, and the loaded zone enclosing it, from the tree. The
+        enclosing zone's cuts for the zones hosted beneath it are only read
+        as it is loaded.
+        """
+        self._zones.pop(name, None)
+
+        while name != dns.name.root:
+            name = name.parent()
+
+            if self._zones.pop(name, None) is not None:
+                break
+
+    def info(self, ctxt, publisher_id, event_type, payload, metadata):
+        """Notification endpoint, dropping zones as hosted zones change"""
+        if event_type in self.EVENT_TYPES:
+            LOG.debug('Dropping %s and its parent from the zone tree',
+                      payload['name'])
+            self.invalidate_name(dns.name.from_text(payload['name']))
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'zones': len(self._zones),
+        }
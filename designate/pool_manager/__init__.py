@@ -54,8 +54,24 @@ OPTS = [
     cfg.IntOpt('periodic-sync-seconds', default=21600,
                help='Zones Updated within last N seconds will be syncd. Use '
                     'None to sync all zones.'),
+    cfg.IntOpt('periodic-sync-concurrency', default=10,
+               help='Maximum number of domains synchronized at once'),
+    cfg.IntOpt('periodic-sync-sample', default=10,
+               help='Number of randomly chosen domains, which have not '
+                    'changed since the last synchronization, synchronized '
+                    'each run to catch any drift. 0 disables the sample'),
     cfg.StrOpt('cache-driver', default='memcache',
                help='The cache driver to use'),
+    cfg.IntOpt('target-concurrency', default=10,
+               help='Maximum number of operations run at once on each pool '
+                    'target, across all domains'),
+    cfg.IntOpt('consensus-tracker-size', default=10000,
+               help='Maximum number of domain changes whose statuses on the '
+                    'nameservers are tracked in memory, the cache is read '
+                    'for any others. 0 disables tracking, reading the '
+                    'cache on every status update, as is needed when more '
+                    'than one Pool Manager receives the status updates of a '
+                    'pool'),
 ]
 
 CONF.register_opts(OPTS, group='service:pool_manager')
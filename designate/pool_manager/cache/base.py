@@ -17,6 +17,8 @@ import abc
 
 import six
 
+from designate import exceptions
+from designate import objects
 from designate.plugin import DriverPlugin
 
 
@@ -61,3 +63,58 @@ class PoolManagerCache(DriverPlugin):
         :param action: the action of the pool manager status object
         :return: the pool manager status object
         """
+
+    def clear_many(self, context, pool_manager_statuses):
+        """
+
+        Clear many pool manager status objects from the cache, ignoring any
+        which are not in it. Drivers able to should override this to clear
+        them all in a single round trip.
+
+        :param context: Security context information
+        :param pool_manager_statuses: Pool manager status objects to clear
+        """
+        for pool_manager_status in pool_manager_statuses:
+            try:
+                self.clear(context, pool_manager_status)
+            except exceptions.PoolManagerStatusNotFound:
+                pass
+
+    def store_many(self, context, pool_manager_statuses):
+        """
+
+        Store many pool manager status objects in the cache. Drivers able to
+        should override this to store them all in a single round trip.
+
+        :param context: Security context information
+        :param pool_manager_statuses: Pool manager status objects to store
+        :return:
+        """
+        for pool_manager_status in pool_manager_statuses:
+            self.store(context, pool_manager_status)
+
+    def retrieve_many(self, context, nameserver_ids, domain_id, action):
+        """
+
+        Retrieve the pool manager status objects of a domain and action on
+        many nameservers. Drivers able to should override this to retrieve
+        them all in a single round trip.
+
+        :param context: Security context information
+        :param nameserver_ids: the nameserver IDs of the pool manager status
+                               objects
+        :param domain_id: the domain ID of the pool manger status objects
+        :param action: the action of the pool manager status objects
+        :return: a PoolManagerStatusList of the pool manager status objects
+                 found, those of nameservers not in the cache are omitted
+        """
+        pool_manager_statuses = objects.PoolManagerStatusList()
+
+        for nameserver_id in nameserver_ids:
+            try:
+                pool_manager_statuses.append(self.retrieve(
+                    context, nameserver_id, domain_id, action))
+            except exceptions.PoolManagerStatusNotFound:
+                pass
+
+        return pool_manager_statuses
@@ -36,8 +36,6 @@ OPTS.extend(memorycache.memcache_opts)
 cfg.CONF.register_opts(OPTS,
                        group='pool_manager_cache:memcache')
 
-DEFAULT_STATUS = 'NONE'
-
 
 class MemcachePoolManagerCache(cache_base.PoolManagerCache):
     __plugin_name__ = 'memcache'
@@ -53,69 +51,90 @@ class MemcachePoolManagerCache(cache_base.PoolManagerCache):
         return self.name
 
     def clear(self, context, pool_manager_status):
-        status_key = self._build_status_key(pool_manager_status)
-        self.cache.delete(status_key)
-
-        serial_number_key = self._build_serial_number_key(pool_manager_status)
-        self.cache.delete(serial_number_key)
+        self.clear_many(context, [pool_manager_status])
 
     def store(self, context, pool_manager_status):
-        status_key = self._build_status_key(pool_manager_status)
-
-        # TODO(vinod): memcache does not seem to store None as the values
-        # Investigate if we can do a different default value for status
-        if pool_manager_status.status:
-            self.cache.set(
-                status_key, pool_manager_status.status, self.expiration)
-        else:
-            self.cache.set(status_key, DEFAULT_STATUS, self.expiration)
-
-        serial_number_key = self._build_serial_number_key(pool_manager_status)
-        self.cache.set(
-            serial_number_key, pool_manager_status.serial_number,
-            self.expiration)
+        self.store_many(context, [pool_manager_status])
 
     def retrieve(self, context, nameserver_id, domain_id, action):
-        values = {
-            'nameserver_id': nameserver_id,
-            'domain_id': domain_id,
-            'action': action,
-        }
-        pool_manager_status = objects.PoolManagerStatus(**values)
-
-        status_key = self._build_status_key(pool_manager_status)
-        status = self.cache.get(status_key)
-        if status is None:
-            raise exceptions.PoolManagerStatusNotFound
+        pool_manager_statuses = self.retrieve_many(
+            context, [nameserver_id], domain_id, action)
 
-        serial_number_key = self._build_serial_number_key(pool_manager_status)
-        serial_number = self.cache.get(serial_number_key)
-        if serial_number is None:
+        if len(pool_manager_statuses) == 0:
             raise exceptions.PoolManagerStatusNotFound
 
-        pool_manager_status.serial_number = serial_number
-        if status == DEFAULT_STATUS:
-            pool_manager_status.status = None
-        else:
+        return pool_manager_statuses[0]
+
+    def clear_many(self, context, pool_manager_statuses):
+        self._delete_multi(
+            [self._build_key(pool_manager_status)
+             for pool_manager_status in pool_manager_statuses])
+
+    def store_many(self, context, pool_manager_statuses):
+        # The status and serial number of each are stored together under a
+        # single key, so a status is read and written with one round trip
+        mapping = {}
+        for pool_manager_status in pool_manager_statuses:
+            mapping[self._build_key(pool_manager_status)] = (
+                pool_manager_status.status,
+                pool_manager_status.serial_number)
+
+        self._set_multi(mapping)
+
+    def retrieve_many(self, context, nameserver_ids, domain_id, action):
+        keys = {}
+        for nameserver_id in nameserver_ids:
+            pool_manager_status = objects.PoolManagerStatus(
+                nameserver_id=nameserver_id, domain_id=domain_id,
+                action=action)
+            keys[self._build_key(pool_manager_status)] = pool_manager_status
+
+        values = self._get_multi(list(keys))
+
+        pool_manager_statuses = objects.PoolManagerStatusList()
+        for key, pool_manager_status in six.iteritems(keys):
+            if values.get(key) is None:
+                continue
+
+            status, serial_number = values[key]
             pool_manager_status.status = status
+            pool_manager_status.serial_number = serial_number
+            pool_manager_statuses.append(pool_manager_status)
+
+        return pool_manager_statuses
+
+    # python-memcached's client reads and writes many keys in one round trip,
+    # the in-memory client used without memcached servers has no such calls
+    def _get_multi(self, keys):
+        if hasattr(self.cache, 'get_multi'):
+            return self.cache.get_multi(keys)
+
+        return dict((key, self.cache.get(key)) for key in keys)
 
-        return pool_manager_status
+    def _set_multi(self, mapping):
+        if hasattr(self.cache, 'set_multi'):
+            self.cache.set_multi(mapping, self.expiration)
+            return
+
+        for key, value in six.iteritems(mapping):
+            self.cache.set(key, value, self.expiration)
+
+    def _delete_multi(self, keys):
+        if hasattr(self.cache, 'delete_multi'):
+            self.cache.delete_multi(keys)
+            return
+
+        for key in keys:
+            self.cache.delete(key)
 
     @staticmethod
-    def _status_key(pool_manager_status, tail):
-        key = '{nameserver}-{domain}-{action}-{tail}'.format(
+    def _build_key(pool_manager_status):
+        key = '{nameserver}-{domain}-{action}'.format(
             nameserver=pool_manager_status.nameserver_id,
             domain=pool_manager_status.domain_id,
-            action=pool_manager_status.action,
-            tail=tail
+            action=pool_manager_status.action
         )
         if six.PY2:
             return key.encode('utf-8')
         else:
             return key
-
-    def _build_serial_number_key(self, pool_manager_status):
-        return self._status_key(pool_manager_status, 'serial_number')
-
-    def _build_status_key(self, pool_manager_status):
-        return self._status_key(pool_manager_status, 'status')
@@ -14,6 +14,7 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 from designate import exceptions
+from designate import objects
 from designate.pool_manager.cache import base as cache_base
 
 
@@ -34,3 +35,12 @@ class NoopPoolManagerCache(cache_base.PoolManagerCache):
 
     def retrieve(self, context, nameserver_id, domain_id, action):
         raise exceptions.PoolManagerStatusNotFound
+
+    def clear_many(self, context, pool_manager_statuses):
+        pass
+
+    def store_many(self, context, pool_manager_statuses):
+        pass
+
+    def retrieve_many(self, context, nameserver_ids, domain_id, action):
+        return objects.PoolManagerStatusList()
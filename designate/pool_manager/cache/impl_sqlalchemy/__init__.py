@@ -14,11 +14,15 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 from oslo_config import cfg
+from oslo_db import exception as oslo_db_exception
 from oslo_db import options
 from oslo_log import log as logging
+from oslo_utils import timeutils
+from sqlalchemy import and_, bindparam, or_
 
 from designate import exceptions
 from designate import objects
+from designate import utils
 from designate.pool_manager.cache import base as cache_base
 from designate.sqlalchemy import base as sqlalchemy_base
 from designate.pool_manager.cache.impl_sqlalchemy import tables
@@ -76,3 +80,98 @@ class SQLAlchemyPoolManagerCache(sqlalchemy_base.SQLAlchemy,
             context, tables.pool_manager_statuses, objects.PoolManagerStatus,
             objects.PoolManagerStatusList,
             exceptions.PoolManagerStatusNotFound, criterion, one=True)
+
+    def clear_many(self, context, pool_manager_statuses):
+        table = tables.pool_manager_statuses
+
+        conditions = [and_(table.c.nameserver_id ==
+                           pool_manager_status.nameserver_id,
+                           table.c.domain_id == pool_manager_status.domain_id,
+                           table.c.action == pool_manager_status.action)
+                      for pool_manager_status in pool_manager_statuses]
+
+        if conditions:
+            self.session.execute(table.delete().where(or_(*conditions)))
+
+    def store_many(self, context, pool_manager_statuses):
+        table = tables.pool_manager_statuses
+
+        created = [pool_manager_status
+                   for pool_manager_status in pool_manager_statuses
+                   if not pool_manager_status.id]
+        updated = [pool_manager_status
+                   for pool_manager_status in pool_manager_statuses
+                   if pool_manager_status.id]
+
+        # Every row is written with a single executemany statement per kind
+        # of write, so the ids and creation times of new statuses are
+        # generated here rather than refetched afterwards.
+        rows = []
+        for pool_manager_status in created:
+            rows.append({
+                'id': utils.generate_uuid(),
+                'version': 1,
+                'created_at': timeutils.utcnow(),
+                'nameserver_id': pool_manager_status.nameserver_id,
+                'domain_id': pool_manager_status.domain_id,
+                'action': pool_manager_status.action,
+                'status': pool_manager_status.status,
+                'serial_number': pool_manager_status.serial_number,
+            })
+
+        self.begin()
+
+        try:
+            if rows:
+                self.session.execute(table.insert(), rows)
+
+            if updated:
+                query = table.update()\
+                    .where(table.c.id == bindparam('b_id'))\
+                    .values(status=bindparam('b_status'),
+                            serial_number=bindparam('b_serial_number'),
+                            version=table.c.version + 1)
+
+                resultproxy = self.session.execute(query, [{
+                    'b_id': updated_status.id,
+                    'b_status': updated_status.status,
+                    'b_serial_number': updated_status.serial_number,
+                } for updated_status in updated])
+
+                if (resultproxy.supports_sane_multi_rowcount() and
+                        resultproxy.rowcount != len(updated)):
+                    raise exceptions.PoolManagerStatusNotFound(
+                        "Could not find PoolManagerStatus")
+
+            self.commit()
+
+        except oslo_db_exception.DBDuplicateEntry:
+            self.rollback()
+            raise exceptions.DuplicatePoolManagerStatus(
+                "Duplicate PoolManagerStatus")
+
+        except Exception:
+            self.rollback()
+            raise
+
+        for pool_manager_status, row in zip(created, rows):
+            pool_manager_status.id = row['id']
+            pool_manager_status.version = row['version']
+            pool_manager_status.created_at = row['created_at']
+
+        for pool_manager_status in pool_manager_statuses:
+            pool_manager_status.obj_reset_changes()
+
+    def retrieve_many(self, context, nameserver_ids, domain_id, action):
+        if not nameserver_ids:
+            return objects.PoolManagerStatusList()
+
+        criterion = {
+            'nameserver_id': list(nameserver_ids),
+            'domain_id': domain_id,
+            'action': action
+        }
+        return self._find(
+            context, tables.pool_manager_statuses, objects.PoolManagerStatus,
+            objects.PoolManagerStatusList,
+            exceptions.PoolManagerStatusNotFound, criterion)
@@ -0,0 +1,176 @@
+# Copyright 2015 Hewlett-Packard Development Company, L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import bisect
+import collections
+from decimal import Decimal
+
+import six
+
+
+class DomainConsensus(object):
+    """
+    The statuses of a domain and action on the nameservers of a pool, indexed
+    so the consensus is kept up to date as each nameserver reports rather
+    than being worked out again from every status.
+
+    The serial numbers are held in a sorted list, making the consensus serial
+    a lookup and the error serial a bisection.
+    """
+    def __init__(self, tracker, pool_manager_statuses=()):
+        self.tracker = tracker
+
+        self._statuses = {}
+        self._serials = []
+        self._counts = collections.Counter()
+
+        for pool_manager_status in pool_manager_statuses:
+            self.add(pool_manager_status)
+
+    def __len__(self):
+        return len(self._statuses)
+
+    def __contains__(self, nameserver_id):
+        return nameserver_id in self._statuses
+
+    def get(self, nameserver_id):
+        return self._statuses.get(nameserver_id)
+
+    def _index(self, pool_manager_status):
+        bisect.insort(self._serials, pool_manager_status.serial_number)
+        self._counts[pool_manager_status.status] += 1
+
+    def _unindex(self, pool_manager_status):
+        del self._serials[bisect.bisect_left(
+            self._serials, pool_manager_status.serial_number)]
+        self._counts[pool_manager_status.status] -= 1
+
+    def add(self, pool_manager_status):
+        """Track the status of a nameserver, replacing any tracked already"""
+        existing = self._statuses.get(pool_manager_status.nameserver_id)
+        if existing is not None:
+            self._unindex(existing)
+
+        self._statuses[pool_manager_status.nameserver_id] = \
+            pool_manager_status
+        self._index(pool_manager_status)
+
+    def update(self, pool_manager_status, status, serial_number):
+        """Update the status and serial number of a tracked status"""
+        self._unindex(pool_manager_status)
+
+        pool_manager_status.status = status
+        pool_manager_status.serial_number = serial_number
+
+        self._index(pool_manager_status)
+
+    def is_consensus(self, status, threshold):
+        return self._counts[status] >= self.tracker.required(threshold)
+
+    def consensus_serial(self, threshold):
+        """
+        The highest serial number at least the threshold of nameservers have
+        reached, or 0 if there is none.
+        """
+        required = max(self.tracker.required(threshold), 1)
+
+        if len(self._serials) < required:
+            return 0
+
+        return self._serials[-required]
+
+    def error_serial(self, consensus_serial, threshold):
+        """
+        The lowest serial number above the consensus serial if the threshold
+        of nameservers are in error, or 0 if there is none.
+        """
+        if not self.is_consensus('ERROR', threshold):
+            return 0
+
+        index = bisect.bisect_right(self._serials, consensus_serial)
+        if index < len(self._serials):
+            return self._serials[index]
+
+        return 0
+
+
+class ConsensusTracker(object):
+    """
+    The statuses of the domains being changed on the nameservers of a pool,
+    held in memory.
+
+    At most ``size`` domain and action pairs are tracked, those least
+    recently used being forgotten first. The statuses are also written to the
+    pool manager cache as they change, so a forgotten pair, or one from
+    before a restart, can be tracked again from the cache.
+    """
+    def __init__(self, total, size):
+        # The count of targets the threshold percentages are taken of
+        self.total = total
+        self.size = size
+
+        self._domains = collections.OrderedDict()
+        self._required = {}
+
+    def __len__(self):
+        return len(self._domains)
+
+    def required(self, threshold):
+        """The count of statuses meeting a threshold percentage"""
+        try:
+            return self._required[threshold]
+        except KeyError:
+            pass
+
+        # Matches the percentages the pool manager compares targets by
+        for count in six.moves.range(self.total + 1):
+            percentage = (Decimal(count) / Decimal(self.total)) * Decimal(100)
+            if percentage >= Decimal(threshold):
+                break
+        else:
+            count = self.total + 1
+
+        self._required[threshold] = count
+        return count
+
+    def reset(self, size):
+        """Forget every domain, and track at most ``size`` from now on"""
+        self.size = size
+        self._domains.clear()
+
+    def get(self, domain_id, action):
+        key = (domain_id, action)
+
+        domain_consensus = self._domains.pop(key, None)
+        if domain_consensus is not None:
+            self._domains[key] = domain_consensus
+
+        return domain_consensus
+
+    def track(self, domain_id, action, pool_manager_statuses):
+        """Start tracking a domain and action afresh from its statuses"""
+        key = (domain_id, action)
+
+        self._domains.pop(key, None)
+        self._domains[key] = domain_consensus = DomainConsensus(
+            self, pool_manager_statuses)
+
+        while len(self._domains) > self.size:
+            self._domains.popitem(last=False)
+
+        return domain_consensus
+
+    def forget(self, domain_id, actions):
+        """Stop tracking a domain for the actions given"""
+        for action in actions:
+            self._domains.pop((domain_id, action), None)
@@ -35,15 +35,16 @@ class PoolManagerAPI(object):
         API version history:
 
         1.0 - Initial version
+        1.1 - Added update_status_many
     """
-    RPC_API_VERSION = '1.0'
+    RPC_API_VERSION = '1.1'
 
     def __init__(self, topic=None):
         self.topic = topic if topic else cfg.CONF.pool_manager_topic
 
         target = messaging.Target(topic=self.topic,
                                   version=self.RPC_API_VERSION)
-        self.client = rpc.get_client(target, version_cap='1.0')
+        self.client = rpc.get_client(target, version_cap='1.1')
 
     @classmethod
     def get_instance(cls):
@@ -107,3 +108,13 @@ class PoolManagerAPI(object):
         return cctxt.cast(
             context, 'update_status', domain=domain, nameserver=nameserver,
             status=status, actual_serial=actual_serial)
+
+    def update_status_many(self, context, statuses):
+        LOG.info(_LI("update_status_many: Calling pool manager for "
+                     "%(count)d statuses") % {'count': len(statuses)})
+
+        # Modifying the topic so it is pool manager instance specific.
+        topic = '%s.%s' % (self.topic, statuses[0][0].pool_id)
+        cctxt = self.client.prepare(topic=topic, version='1.1')
+        return cctxt.cast(
+            context, 'update_status_many', statuses=statuses)
@@ -15,8 +15,12 @@
 # under the License.
 from contextlib import contextmanager
 from decimal import Decimal
+import random
 import time
 
+import eventlet
+import eventlet.queue
+import eventlet.semaphore
 from oslo_config import cfg
 import oslo_messaging as messaging
 from oslo_log import log as logging
@@ -35,6 +39,7 @@ from designate.i18n import _LE
 from designate.i18n import _LI
 from designate.i18n import _LW
 from designate.pool_manager import cache
+from designate.pool_manager import consensus
 
 
 LOG = logging.getLogger(__name__)
@@ -47,6 +52,10 @@ CREATE_ACTION = 'CREATE'
 DELETE_ACTION = 'DELETE'
 UPDATE_ACTION = 'UPDATE'
 MAXIMUM_THRESHOLD = 100
+# The number of domains asked of central at a time by periodic sync
+SYNC_PAGE_SIZE = 1000
+# The shards the domains are spread over
+MAXIMUM_SHARD = 4095
 
 
 @contextmanager
@@ -71,7 +80,7 @@ class Service(service.RPCService, coordination.CoordinationMixin,
 
         1.0 - Initial version
     """
-    RPC_API_VERSION = '1.0'
+    RPC_API_VERSION = '1.1'
 
     target = messaging.Target(version=RPC_API_VERSION)
 
@@ -93,6 +102,29 @@ class Service(service.RPCService, coordination.CoordinationMixin,
         self.max_retries = CONF['service:pool_manager'].poll_max_retries
         self.delay = CONF['service:pool_manager'].poll_delay
 
+        # The statuses of the domains being changed, the cache is only read
+        # for those not tracked
+        self.consensus_tracker = consensus.ConsensusTracker(
+            len(self.pool.targets),
+            CONF['service:pool_manager'].consensus_tracker_size)
+
+        # Operations on the targets run concurrently, bounded for each target
+        # so a target which stops answering only holds up its own operations
+        self._target_semaphores = dict(
+            (target.id, eventlet.semaphore.Semaphore(
+                CONF['service:pool_manager'].target_concurrency))
+            for target in self.pool.targets)
+
+        # The range of domain shards this instance recovers and syncs,
+        # shared out between the Pool Managers of the pool
+        self._shards = None
+
+        # Periodic sync only resyncs the domains with a serial above this,
+        # an interval before the start of the last successful sync
+        self._sync_watermark = None
+        self._sync_pool = eventlet.GreenPool(
+            CONF['service:pool_manager'].periodic_sync_concurrency)
+
         # Create the necessary Backend instances for each target
         self._setup_target_backends()
 
@@ -131,11 +163,17 @@ class Service(service.RPCService, coordination.CoordinationMixin,
 
         super(Service, self).start()
 
-        # Setup a Leader Election, use for ensuring certain tasks are executed
-        # on exactly one pool-manager instance at a time]
-        self._pool_election = coordination.LeaderElection(
-            self._coordinator, '%s:%s' % (self.service_name, self.pool.id))
-        self._pool_election.start()
+        # Share the domain shards out between the Pool Managers of the pool,
+        # each recovering and syncing the domains of its own shards
+        if self._coordinator is not None:
+            self._coordinator.create_group(self._pool_group)
+            self._coordinator.join_group(self._pool_group)
+
+        self._partitioner = coordination.Partitioner(
+            self._coordinator, self._pool_group, self._coordination_id,
+            list(range(0, MAXIMUM_SHARD + 1)))
+        self._partitioner.start()
+        self._partitioner.watch_partition_change(self._rebalance)
 
         if CONF['service:pool_manager'].enable_recovery_timer:
             LOG.info(_LI('Starting periodic recovery timer'))
@@ -152,13 +190,44 @@ class Service(service.RPCService, coordination.CoordinationMixin,
                 CONF['service:pool_manager'].periodic_sync_interval)
 
     def stop(self):
-        self._pool_election.stop()
+        self._partitioner.unwatch_partition_change(self._rebalance)
+
+        if self._coordinator is not None:
+            self._coordinator.leave_group(self._pool_group)
 
         super(Service, self).stop()
 
         for target in self.pool.targets:
             self.target_backends[target.id].stop()
 
+    @property
+    def _pool_group(self):
+        return '%s:%s' % (self.service_name, self.pool.id)
+
+    def _rebalance(self, my_partitions, members, event):
+        if my_partitions:
+            self._shards = (my_partitions[0], my_partitions[-1])
+        else:
+            self._shards = None
+
+        LOG.info(_LI('Recovering and synchronizing the domains of shards '
+                     '%(shards)s'), {'shards': self._shards})
+
+        # The watermark only covers the shards synced until now
+        self._sync_watermark = None
+
+        # The status updates of a pool may go to any of its Pool Managers,
+        # so statuses are only tracked in memory while there is just this one
+        if len(my_partitions or []) == MAXIMUM_SHARD + 1:
+            self.consensus_tracker.reset(
+                CONF['service:pool_manager'].consensus_tracker_size)
+        else:
+            self.consensus_tracker.reset(0)
+
+    def _shard_criterion(self, start=None):
+        start = self._shards[0] if start is None else start
+        return 'BETWEEN %d,%d' % (start, self._shards[1])
+
     @property
     def central_api(self):
         return central_api.CentralAPI.get_instance()
@@ -172,8 +241,8 @@ class Service(service.RPCService, coordination.CoordinationMixin,
         """
         :return: None
         """
-        # NOTE(kiall): Only run this periodic task on the pool leader
-        if self._pool_election.is_leader:
+        # Only run this periodic task for the shards of this instance
+        if self._shards is not None:
             context = DesignateContext.get_admin_context(all_tenants=True)
 
             LOG.debug("Starting Periodic Recovery")
@@ -203,39 +272,114 @@ class Service(service.RPCService, coordination.CoordinationMixin,
 
     def periodic_sync(self):
         """
+        Synchronize the domains changed since the last successful sync, and
+        a small random sample of the others to catch any drift.
+
         :return: None
         """
-        # NOTE(kiall): Only run this periodic task on the pool leader
-        if self._pool_election.is_leader:
+        # Only run this periodic task for the shards of this instance
+        if self._shards is not None:
             context = DesignateContext.get_admin_context(all_tenants=True)
 
             LOG.debug("Starting Periodic Synchronization")
 
+            # Domains changed from here on should have a serial of at least
+            # this, as long as central's clock is in step with ours
+            sync_started = utils.increment_serial()
+
             criterion = {
                 'pool_id': CONF['service:pool_manager'].pool_id,
-                'status': '!%s' % ERROR_STATUS
+                'status': '!%s' % ERROR_STATUS,
+                'shard': self._shard_criterion()
             }
 
             periodic_sync_seconds = \
                 CONF['service:pool_manager'].periodic_sync_seconds
 
-            if periodic_sync_seconds is not None:
-                # Generate the current serial, will provide a UTC Unix TS.
-                current = utils.increment_serial()
-                criterion['serial'] = ">%s" % (current - periodic_sync_seconds)
+            if self._sync_watermark is not None:
+                criterion['serial'] = ">%s" % self._sync_watermark
+            elif periodic_sync_seconds is not None:
+                criterion['serial'] = ">%s" % (
+                    sync_started - periodic_sync_seconds)
 
-            domains = self.central_api.find_domains(context, criterion)
+            synced = set()
+            failed = []
 
             try:
-                for domain in domains:
-                    # TODO(kiall): If the domain was created within the last
-                    #              periodic_sync_seconds, attempt to recreate
-                    #              to fill in targets which may have failed.
-                    self.update_domain(context, domain)
+                for domain in self._find_sync_domains(context, criterion):
+                    # The sample may include domains which were changed too
+                    if domain.id not in synced:
+                        synced.add(domain.id)
+                        self._sync_pool.spawn_n(
+                            self._sync_domain, context, domain, failed)
 
             except Exception:
                 LOG.exception(_LE('An unhandled exception in periodic '
                                   'synchronization occurred.'))
+                return
+
+            finally:
+                self._sync_pool.waitall()
+
+            if failed:
+                LOG.warn(_LW('Periodic synchronization failed for %(count)d '
+                             'domains, they will be synchronized again on '
+                             'the next run') % {'count': len(failed)})
+            else:
+                # Domains committed late, or with a serial from a clock
+                # behind ours, may have a serial a little below the start of
+                # this sync. The next sync goes back a full interval further
+                # to catch them.
+                self._sync_watermark = sync_started - \
+                    CONF['service:pool_manager'].periodic_sync_interval
+
+            LOG.info(_LI('Periodic synchronization synchronized %(count)d '
+                         'domains') % {'count': len(synced)})
+
+    def _find_sync_domains(self, context, criterion):
+        """
+        Iterate over the domains to synchronize, asking central for a page
+        at a time, followed by the random sample.
+        """
+        marker = None
+
+        while True:
+            domains = self.central_api.find_domains(
+                context, criterion, marker=marker, limit=SYNC_PAGE_SIZE)
+
+            for domain in domains:
+                yield domain
+
+            if len(domains) < SYNC_PAGE_SIZE:
+                break
+
+            marker = domains[-1].id
+
+        sample_size = CONF['service:pool_manager'].periodic_sync_sample
+
+        if sample_size and 'serial' in criterion:
+            # The shard of a domain is taken from its ID, so the domains
+            # following a random shard are a random sample
+            sample_criterion = dict(criterion)
+            del sample_criterion['serial']
+            sample_criterion['shard'] = self._shard_criterion(
+                random.randint(*self._shards))
+
+            for domain in self.central_api.find_domains(
+                    context, sample_criterion, limit=sample_size,
+                    sort_key='shard'):
+                yield domain
+
+    def _sync_domain(self, context, domain, failed):
+        try:
+            # TODO(kiall): If the domain was created within the last
+            #              periodic_sync_seconds, attempt to recreate
+            #              to fill in targets which may have failed.
+            self.update_domain(context, domain)
+
+        except Exception:
+            LOG.exception(_LE('Failed to synchronize domain %s'), domain.name)
+            failed.append(domain.id)
 
     # Standard Create/Update/Delete Methods
 
@@ -247,15 +391,9 @@ class Service(service.RPCService, coordination.CoordinationMixin,
         """
         LOG.info(_LI("Creating new domain %s"), domain.name)
 
-        results = []
-
         # Create the domain on each of the Pool Targets
-        for target in self.pool.targets:
-            results.append(
-                self._create_domain_on_target(context, target, domain)
-            )
-
-        if self._exceed_or_meet_threshold(results.count(True)):
+        if self._run_on_targets(
+                self._create_domain_on_target, context, domain):
             LOG.debug('Consensus reached for creating domain %(domain)s '
                       'on pool targets' % {'domain': domain.name})
 
@@ -274,14 +412,13 @@ class Service(service.RPCService, coordination.CoordinationMixin,
             self._update_domain_on_also_notify(context, also_notify, domain)
 
         # Send a NOTIFY to each nameserver
-        for nameserver in self.pool.nameservers:
-            create_status = self._build_status_object(
-                nameserver, domain, CREATE_ACTION)
-            self.cache.store(context, create_status)
+        create_statuses = [
+            self._build_status_object(nameserver, domain, CREATE_ACTION)
+            for nameserver in self.pool.nameservers]
+        self.cache.store_many(context, create_statuses)
+        self.consensus_tracker.track(domain.id, CREATE_ACTION, create_statuses)
 
-            self.mdns_api.poll_for_serial_number(
-                context, domain, nameserver, self.timeout,
-                self.retry_interval, self.max_retries, self.delay)
+        self._poll_for_serial_numbers(context, domain)
 
     def _create_domain_on_target(self, context, target, domain):
         """
@@ -321,14 +458,9 @@ class Service(service.RPCService, coordination.CoordinationMixin,
         """
         LOG.info(_LI("Updating domain %s"), domain.name)
 
-        results = []
-
         # Update the domain on each of the Pool Targets
-        for target in self.pool.targets:
-            results.append(
-                self._update_domain_on_target(context, target, domain))
-
-        if self._exceed_or_meet_threshold(results.count(True)):
+        if self._run_on_targets(
+                self._update_domain_on_target, context, domain):
             LOG.debug('Consensus reached for updating domain %(domain)s '
                       'on pool targets' % {'domain': domain.name})
 
@@ -345,20 +477,40 @@ class Service(service.RPCService, coordination.CoordinationMixin,
         for also_notify in self.pool.also_notifies:
             self._update_domain_on_also_notify(context, also_notify, domain)
 
-        # Ensure the change has propogated to each nameserver
-        for nameserver in self.pool.nameservers:
-            # See if there is already another update in progress
-            try:
-                update_status = self.cache.retrieve(
-                    context, nameserver.id, domain.id, UPDATE_ACTION)
-            except exceptions.PoolManagerStatusNotFound:
-                update_status = self._build_status_object(
-                    nameserver, domain, UPDATE_ACTION)
-                self.cache.store(context, update_status)
-
-            self.mdns_api.poll_for_serial_number(
-                context, domain, nameserver, self.timeout,
-                self.retry_interval, self.max_retries, self.delay)
+        # Ensure the change has propogated to each nameserver, skipping
+        # those which already have another update in progress
+        domain_consensus = self.consensus_tracker.get(
+            domain.id, UPDATE_ACTION)
+        if domain_consensus is not None:
+            in_progress = set(
+                nameserver.id for nameserver in self.pool.nameservers
+                if nameserver.id in domain_consensus)
+        else:
+            in_progress = set(
+                update_status.nameserver_id for update_status in
+                self.cache.retrieve_many(
+                    context, [n.id for n in self.pool.nameservers],
+                    domain.id, UPDATE_ACTION))
+        update_statuses = [
+            self._build_status_object(nameserver, domain, UPDATE_ACTION)
+            for nameserver in self.pool.nameservers
+            if nameserver.id not in in_progress]
+        if update_statuses:
+            self.cache.store_many(context, update_statuses)
+            if domain_consensus is not None:
+                for update_status in update_statuses:
+                    domain_consensus.add(update_status)
+
+        self._poll_for_serial_numbers(context, domain)
+
+    def _poll_for_serial_numbers(self, context, domain):
+        """Have mdns poll every nameserver in the pool for the domain serial"""
+        polls = [(domain, nameserver) for nameserver in self.pool.nameservers]
+
+        if polls:
+            self.mdns_api.poll_for_serial_numbers(
+                context, polls, self.timeout, self.retry_interval,
+                self.max_retries, self.delay)
 
     def _update_domain_on_target(self, context, target, domain):
         """
@@ -398,25 +550,22 @@ class Service(service.RPCService, coordination.CoordinationMixin,
         """
         LOG.info(_LI("Deleting domain %s"), domain.name)
 
-        results = []
-
         # Delete the domain on each of the Pool Targets
-        for target in self.pool.targets:
-            results.append(
-                self._delete_domain_on_target(context, target, domain))
-
         # TODO(kiall): We should monitor that the Domain is actually deleted
         #              correctly on each of the nameservers, rather than
         #              assuming a successful delete-on-target is OK as we have
         #              in the past.
-        if self._exceed_or_meet_threshold(
-                results.count(True), MAXIMUM_THRESHOLD):
+        if self._run_on_targets(self._delete_domain_on_target, context,
+                                domain, MAXIMUM_THRESHOLD):
             LOG.debug('Consensus reached for deleting domain %(domain)s '
                       'on pool targets' % {'domain': domain.name})
 
             self.central_api.update_status(
                     context, domain.id, SUCCESS_STATUS, domain.serial)
 
+            self.consensus_tracker.forget(
+                domain.id, [CREATE_ACTION, UPDATE_ACTION, DELETE_ACTION])
+
         else:
             LOG.warn(_LW('Consensus not reached for deleting domain %(domain)s'
                          ' on pool targets') % {'domain': domain.name})
@@ -454,6 +603,19 @@ class Service(service.RPCService, coordination.CoordinationMixin,
 
         return False
 
+    def update_status_many(self, context, statuses):
+        """
+        update_status_many is called by mdns with the results of many serial
+        polls at once.
+        :param context: Security context information.
+        :param statuses: A list of (domain, nameserver, status, actual_serial)
+                         tuples, each as passed to update_status.
+        :return: None
+        """
+        for domain, nameserver, status, actual_serial in statuses:
+            self.update_status(
+                context, domain, nameserver, status, actual_serial)
+
     def update_status(self, context, domain, nameserver, status,
                       actual_serial):
         """
@@ -474,12 +636,14 @@ class Service(service.RPCService, coordination.CoordinationMixin,
         action = UPDATE_ACTION if domain.action == 'NONE' else domain.action
 
         with lockutils.lock('update-status-%s' % domain.id):
-            try:
-                current_status = self.cache.retrieve(
-                    context, nameserver.id, domain.id, action)
-            except exceptions.PoolManagerStatusNotFound:
+            domain_consensus = self._get_domain_consensus(
+                context, domain, action)
+
+            current_status = domain_consensus.get(nameserver.id)
+            if current_status is None:
                 current_status = self._build_status_object(
                     nameserver, domain, action)
+                domain_consensus.add(current_status)
                 self.cache.store(context, current_status)
             cache_serial = current_status.serial_number
 
@@ -489,11 +653,18 @@ class Service(service.RPCService, coordination.CoordinationMixin,
                        self._get_destination(nameserver),
                        cache_serial, actual_serial))
             if actual_serial and cache_serial <= actual_serial:
-                current_status.status = status
-                current_status.serial_number = actual_serial
+                domain_consensus.update(current_status, status, actual_serial)
                 self.cache.store(context, current_status)
 
-            consensus_serial = self._get_consensus_serial(context, domain)
+            if not self.consensus_tracker.size:
+                # Nothing is tracked, so the consensus is of the statuses as
+                # they are in the cache
+                domain_consensus = consensus.DomainConsensus(
+                    self.consensus_tracker,
+                    self._retrieve_statuses(context, domain, action))
+
+            consensus_serial = domain_consensus.consensus_serial(
+                self.threshold)
 
             # If there is a valid consensus serial we can still send a success
             # for that serial.
@@ -509,8 +680,8 @@ class Service(service.RPCService, coordination.CoordinationMixin,
                     context, domain.id, SUCCESS_STATUS, consensus_serial)
 
             if status == ERROR_STATUS:
-                error_serial = self._get_error_serial(
-                    context, domain, consensus_serial)
+                error_serial = domain_consensus.error_serial(
+                    consensus_serial, self.threshold)
                 if error_serial > consensus_serial or error_serial == 0:
                     LOG.warn(_LW('For domain %(domain)s '
                                  'the error serial is %(error_serial)s.') %
@@ -519,17 +690,66 @@ class Service(service.RPCService, coordination.CoordinationMixin,
                     self.central_api.update_status(
                         context, domain.id, ERROR_STATUS, error_serial)
 
-            if consensus_serial == domain.serial and self._is_consensus(
-                    context, domain, action, SUCCESS_STATUS,
-                    MAXIMUM_THRESHOLD):
+            if consensus_serial == domain.serial and \
+                    domain_consensus.is_consensus(
+                        SUCCESS_STATUS, MAXIMUM_THRESHOLD):
                 self._clear_cache(context, domain, action)
 
     # Utility Methods
+    def _run_on_targets(self, func, context, domain, threshold=None):
+        """
+        Run func(context, target, domain) for each of the Pool Targets
+        concurrently, counting the results towards the threshold as they
+        arrive.
+
+        :return: True as soon as the threshold of targets have succeeded,
+                 False as soon as too many have failed for it to be met. Any
+                 operations still running carry on in the background.
+        """
+        targets = self.pool.targets
+        results = eventlet.queue.LightQueue()
+
+        def _run(target):
+            try:
+                # Wait for a turn on this target alone, never on the others
+                with self._target_semaphores[target.id]:
+                    result = func(context, target, domain)
+            except Exception:
+                LOG.exception(_LE('Unhandled exception running %(func)s for '
+                                  'domain %(domain)s on target %(target)s'),
+                              {'func': func.__name__, 'domain': domain.name,
+                               'target': target.id})
+                result = False
+
+            results.put(result)
+
+        for target in targets:
+            eventlet.spawn_n(_run, target)
+
+        succeeded = 0
+        failed = 0
+
+        while succeeded + failed < len(targets):
+            if results.get():
+                succeeded += 1
+            else:
+                failed += 1
+
+            if self._exceed_or_meet_threshold(succeeded, threshold):
+                return True
+
+            if not self._exceed_or_meet_threshold(
+                    len(targets) - failed, threshold):
+                return False
+
+        return self._exceed_or_meet_threshold(succeeded, threshold)
+
     def _get_failed_domains(self, context, action):
         criterion = {
             'pool_id': CONF['service:pool_manager'].pool_id,
             'action': action,
-            'status': 'ERROR'
+            'status': 'ERROR',
+            'shard': self._shard_criterion()
         }
         return self.central_api.find_domains(context, criterion)
 
@@ -547,57 +767,25 @@ class Service(service.RPCService, coordination.CoordinationMixin,
         return self._percentage(
             count, len(self.pool.targets)) >= Decimal(threshold)
 
-    @staticmethod
-    def _get_sorted_serials(pool_manager_statuses, descending=False):
-        serials = []
-        for pool_manager_status in pool_manager_statuses:
-            serials.append(pool_manager_status.serial_number)
-        serials.sort(reverse=descending)
-        return serials
-
-    def _get_serials_ascending(self, pool_manager_statuses):
-        return self._get_sorted_serials(pool_manager_statuses)
-
-    def _get_serials_descending(self, pool_manager_statuses):
-        return self._get_sorted_serials(pool_manager_statuses, descending=True)
-
-    def _is_consensus(self, context, domain, action, status, threshold=None):
-        status_count = 0
-        pool_manager_statuses = self._retrieve_statuses(
-            context, domain, action)
-        for pool_manager_status in pool_manager_statuses:
-            if pool_manager_status.status == status:
-                status_count += 1
-        if threshold is None:
-            threshold = self.threshold
-        return self._exceed_or_meet_threshold(status_count, threshold)
-
-    def _get_consensus_serial(self, context, domain):
-        consensus_serial = 0
-        action = UPDATE_ACTION if domain.action == 'NONE' else domain.action
+    def _get_domain_consensus(self, context, domain, action):
+        """
+        Get the tracked statuses of a domain and action, tracking them from
+        the cache, or mdns, if they aren't already.
+        """
+        domain_consensus = self.consensus_tracker.get(domain.id, action)
 
-        pm_statuses = self._retrieve_statuses(context, domain, action)
-        for serial in self._get_serials_descending(pm_statuses):
-            serial_count = 0
-            for pm_status in pm_statuses:
-                if pm_status.serial_number >= serial:
-                    serial_count += 1
-            if self._exceed_or_meet_threshold(serial_count, self.threshold):
-                consensus_serial = serial
-                break
-        return consensus_serial
+        if domain_consensus is not None:
+            return domain_consensus
 
-    def _get_error_serial(self, context, domain, consensus_serial):
-        error_serial = 0
-        action = UPDATE_ACTION if domain.action == 'NONE' else domain.action
+        if not self.consensus_tracker.size:
+            return consensus.DomainConsensus(
+                self.consensus_tracker, self.cache.retrieve_many(
+                    context, [n.id for n in self.pool.nameservers],
+                    domain.id, action))
 
-        if self._is_consensus(context, domain, action, ERROR_STATUS):
-            pm_statuses = self._retrieve_statuses(context, domain, action)
-            for serial in self._get_serials_ascending(pm_statuses):
-                if serial > consensus_serial:
-                    error_serial = serial
-                    break
-        return error_serial
+        return self.consensus_tracker.track(
+            domain.id, action,
+            self._retrieve_statuses(context, domain, action))
 
     # When we hear back from the nameserver, the serial_number is set to the
     # value the nameserver
@@ -629,12 +817,8 @@ class Service(service.RPCService, coordination.CoordinationMixin,
                     nameserver, domain, action)
                 pool_manager_statuses.append(pool_manager_status)
 
-        for pool_manager_status in pool_manager_statuses:
-            # Ignore any not found errors while clearing the cache
-            try:
-                self.cache.clear(context, pool_manager_status)
-            except exceptions.PoolManagerStatusNotFound:
-                pass
+        self.consensus_tracker.forget(domain.id, actions)
+        self.cache.clear_many(context, pool_manager_statuses)
 
     def _retrieve_from_mdns(self, context, nameserver, domain, action):
         try:
@@ -670,16 +854,26 @@ class Service(service.RPCService, coordination.CoordinationMixin,
                   (pool_manager_status.status,
                    pool_manager_status.serial_number,
                    domain.name, self._get_destination(nameserver), action))
-        self.cache.store(context, pool_manager_status)
 
         return pool_manager_status
 
     def _retrieve_statuses(self, context, domain, action):
+        """
+        Retrieve the status of the domain on every nameserver in a single
+        read of the cache, getting those missing from the cache from mdns.
+        """
+        cached = {}
+        for pool_manager_status in self.cache.retrieve_many(
+                context, [n.id for n in self.pool.nameservers], domain.id,
+                action):
+            cached[pool_manager_status.nameserver_id] = pool_manager_status
+
         pool_manager_statuses = []
+        retrieved = []
         for nameserver in self.pool.nameservers:
-            try:
-                pool_manager_status = self.cache.retrieve(
-                    context, nameserver.id, domain.id, action)
+            pool_manager_status = cached.get(nameserver.id)
+
+            if pool_manager_status is not None:
                 LOG.debug('Cache hit! Retrieved status %s and serial %s '
                           'for domain %s on nameserver %s with action %s from '
                           'the cache.' %
@@ -687,7 +881,7 @@ class Service(service.RPCService, coordination.CoordinationMixin,
                            pool_manager_status.serial_number,
                            domain.name,
                            self._get_destination(nameserver), action))
-            except exceptions.PoolManagerStatusNotFound:
+            else:
                 LOG.debug('Cache miss! Did not retrieve status and serial '
                           'for domain %s on nameserver %s with action %s from '
                           'the cache. Getting it from the server.' %
@@ -696,8 +890,13 @@ class Service(service.RPCService, coordination.CoordinationMixin,
                            action))
                 pool_manager_status = self._retrieve_from_mdns(
                     context, nameserver, domain, action)
+                if pool_manager_status is not None:
+                    retrieved.append(pool_manager_status)
 
             if pool_manager_status is not None:
                 pool_manager_statuses.append(pool_manager_status)
 
+        if retrieved:
+            self.cache.store_many(context, retrieved)
+
         return pool_manager_statuses
@@ -208,7 +208,7 @@ def get_server(target, endpoints, serializer=None):
     return msg_server.MessageHandlingServer(TRANSPORT, dispatcher, 'eventlet')
 
 
-def get_listener(targets, endpoints, serializer=None):
+def get_listener(targets, endpoints, serializer=None, pool=None):
     assert TRANSPORT is not None
     if serializer is None:
         serializer = JsonPayloadSerializer()
@@ -216,7 +216,8 @@ def get_listener(targets, endpoints, serializer=None):
                                                targets,
                                                endpoints,
                                                executor='eventlet',
-                                               serializer=serializer)
+                                               serializer=serializer,
+                                               pool=pool)
 
 
 def get_notifier(service=None, host=None, publisher_id=None):
@@ -18,13 +18,21 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 import abc
+import collections
+import os
 import socket
 import struct
 import errno
+import time
 
 import six
+import dns.message
+import dns.rcode
+import eventlet
 import eventlet.wsgi
 import eventlet.debug
+import eventlet.queue
+import eventlet.semaphore
 import oslo_messaging as messaging
 from oslo_config import cfg
 from oslo_log import log as logging
@@ -192,6 +200,43 @@ class WSGIService(object):
                              log=loggers.WritableLogger(logger))
 
 
+class DNSTCPConnection(object):
+    """
+    A client TCP connection, shared by the handlers of all the queries
+    pipelined on it. The socket is closed once the reader and every handler
+    have released it.
+    """
+    def __init__(self, sock, addr):
+        self.sock = sock
+        self.addr = addr
+
+        # The reader holds the first reference
+        self._references = 1
+        self._write_lock = eventlet.semaphore.Semaphore()
+
+    def acquire(self):
+        self._references += 1
+
+    def release(self):
+        self._references -= 1
+
+        if self._references <= 0:
+            self.sock.close()
+
+    def send_message(self, message):
+        """Send a length prefixed DNS message"""
+        # Responses to pipelined queries may be sent by several handlers at
+        # once, don't let their messages interleave.
+        with self._write_lock:
+            self.sock.sendall(struct.pack("!H", len(message)) + message)
+
+    def shutdown_reads(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RD)
+        except socket.error:
+            pass
+
+
 @six.add_metaclass(abc.ABCMeta)
 class DNSService(object):
     """
@@ -204,6 +249,16 @@ class DNSService(object):
         # reading/writing to the UDP socket at once. Disable this warning.
         eventlet.debug.hub_prevent_multiple_readers(False)
 
+        # Counters for this worker process, kept across restarts
+        self._dns_stats = collections.Counter()
+        self._dns_in_flight = 0
+        self._dns_listeners = []
+        self._dns_queue = None
+
+        # Open TCP connections, and their count for each client address
+        self._dns_tcp_conns = set()
+        self._dns_tcp_clients = collections.Counter()
+
     @abc.abstractproperty
     def _dns_application(self):
         pass
@@ -211,6 +266,9 @@ class DNSService(object):
     def start(self):
         super(DNSService, self).start()
 
+        # NOTE: Each worker process binds its own sockets. The sockets are
+        #       opened with SO_REUSEPORT, allowing the kernel to spread
+        #       queries across all the workers listening on the port.
         self._dns_sock_tcp = utils.bind_tcp(
             self._service_config.host,
             self._service_config.port,
@@ -220,23 +278,86 @@ class DNSService(object):
             self._service_config.host,
             self._service_config.port)
 
-        self.tg.add_thread(self._dns_handle_tcp)
-        self.tg.add_thread(self._dns_handle_udp)
+        # Requests are handed to a fixed size pool of handlers through a
+        # bounded queue, rather than a new thread per request, so that a
+        # flood of requests is shed instead of piling onto the storage.
+        self._dns_queue = eventlet.queue.LightQueue(
+            self._service_config.handler_queue_depth)
+
+        for i in range(self._service_config.handler_pool_size):
+            self.tg.add_thread(self._dns_handle_queue)
+
+        self._dns_listeners = [
+            self.tg.add_thread(self._dns_handle_tcp),
+            self.tg.add_thread(self._dns_handle_udp),
+        ]
+
+        stats_interval = self._service_config.stats_interval
+        if stats_interval:
+            self.tg.add_timer(stats_interval, self._dns_log_stats,
+                              stats_interval)
 
     def wait(self):
         super(DNSService, self).wait()
 
     def stop(self):
-        # When the service is stopped, the threads for _handle_tcp and
-        # _handle_udp are stopped too.
-        super(DNSService, self).stop()
+        # Stop taking on new requests first, then give the requests already
+        # being handled a chance to complete. Other workers bound to the
+        # same port carry on serving in the meantime.
+        for listener in self._dns_listeners:
+            listener.stop()
+        self._dns_listeners = []
 
         if hasattr(self, '_dns_sock_tcp'):
             self._dns_sock_tcp.close()
 
+        # Stop reading further queries from open TCP connections, they are
+        # closed once their outstanding responses have been sent.
+        for conn in list(self._dns_tcp_conns):
+            conn.shutdown_reads()
+
+        self._dns_drain(self._service_config.graceful_shutdown_timeout)
+
+        # When the service is stopped, any remaining threads are stopped too.
+        super(DNSService, self).stop()
+
         if hasattr(self, '_dns_sock_udp'):
             self._dns_sock_udp.close()
 
+        self._dns_log_stats()
+
+    def _dns_drain(self, timeout):
+        """Wait up to timeout seconds for in-flight requests to complete"""
+        deadline = time.time() + (timeout or 0)
+
+        while self._dns_pending() > 0 and time.time() < deadline:
+            eventlet.sleep(0.1)
+
+        if self._dns_pending() > 0:
+            LOG.warn(_LW("Stopping with %(count)d requests in flight") %
+                     {'count': self._dns_pending()})
+
+    def _dns_pending(self):
+        queued = self._dns_queue.qsize() if self._dns_queue else 0
+        return self._dns_in_flight + queued
+
+    def dns_stats(self):
+        """Returns the request counters of this worker process"""
+        stats = dict(self._dns_stats)
+        stats['pid'] = os.getpid()
+        stats['in_flight'] = self._dns_in_flight
+        stats['queued'] = self._dns_queue.qsize() if self._dns_queue else 0
+
+        dequeued = stats.pop('dequeued', 0)
+        wait_total = stats.pop('queue_wait_total', 0.0)
+        stats['queue_wait_avg'] = wait_total / dequeued if dequeued else 0.0
+
+        return stats
+
+    def _dns_log_stats(self, *args):
+        LOG.info(_LI("%(name)s worker stats: %(stats)s") %
+                 {'name': self.service_name, 'stats': self.dns_stats()})
+
     def _dns_handle_tcp(self):
         LOG.info(_LI("_handle_tcp thread started"))
 
@@ -244,67 +365,118 @@ class DNSService(object):
             try:
                 client, addr = self._dns_sock_tcp.accept()
 
-                if self._service_config.tcp_recv_timeout:
-                    client.settimeout(self._service_config.tcp_recv_timeout)
+            except Exception:
+                LOG.exception(_LE("Unknown exception accepting TCP "
+                                  "connection"))
+                continue
+
+            # Cap the number of connections a single client may hold open
+            max_connections = self._service_config.tcp_max_connections
+            if (max_connections and
+                    self._dns_tcp_clients[addr[0]] >= max_connections):
+                self._dns_stats['tcp_rejected'] += 1
+                LOG.warn(_LW("Too many TCP connections from: %(host)s") %
+                         {'host': addr[0]})
+                client.close()
+                continue
 
-                LOG.debug("Handling TCP Request from: %(host)s:%(port)d" %
-                          {'host': addr[0], 'port': addr[1]})
+            LOG.debug("Handling TCP Connection from: %(host)s:%(port)d" %
+                      {'host': addr[0], 'port': addr[1]})
 
-                # Prepare a variable for the payload to be buffered
-                payload = ""
+            self._dns_tcp_clients[addr[0]] += 1
+            self.tg.add_thread(self._dns_handle_tcp_conn, client, addr)
 
-                # Receive the first 2 bytes containing the payload length
-                expected_length_raw = client.recv(2)
-                (expected_length, ) = struct.unpack('!H', expected_length_raw)
+    def _dns_handle_tcp_conn(self, client, addr):
+        """
+        Read any number of pipelined queries from a TCP connection (RFC
+        7766), queueing each for the handler pool as soon as it has been
+        read. Responses are written back in whatever order they complete.
+        """
+        conn = DNSTCPConnection(client, addr)
+        self._dns_tcp_conns.add(conn)
 
-                # Keep receiving data until we've got all the data we expect
-                while len(payload) < expected_length:
-                    data = client.recv(65535)
-                    if not data:
-                        break
-                    payload += data
+        # Each query is read into the same buffer, large enough for the
+        # biggest possible message.
+        view = memoryview(bytearray(65535))
 
-            except socket.error as e:
-                client.close()
-                errname = errno.errorcode[e.args[0]]
-                LOG.warn(_LW("Socket error %(err)s from: %(host)s:%(port)d") %
-                         {'host': addr[0], 'port': addr[1], 'err': errname})
+        idle_timeout = self._service_config.tcp_idle_timeout or None
+        recv_timeout = self._service_config.tcp_recv_timeout or None
 
-            except socket.timeout:
-                client.close()
-                LOG.warn(_LW("TCP Timeout from: %(host)s:%(port)d") %
-                         {'host': addr[0], 'port': addr[1]})
+        try:
+            while True:
+                # Wait for the 2 bytes containing the payload length
+                client.settimeout(idle_timeout)
+                if not self._dns_recv_into(client, view, 2):
+                    break
 
-            except struct.error:
-                client.close()
-                LOG.warn(_LW("Invalid packet from: %(host)s:%(port)d") %
-                         {'host': addr[0], 'port': addr[1]})
+                (expected_length, ) = struct.unpack('!H', view[:2].tobytes())
 
-            except Exception:
-                client.close()
-                LOG.exception(_LE("Unknown exception handling TCP request "
-                                  "from: %(host)s:%(port)d") %
-                              {'host': addr[0], 'port': addr[1]})
+                client.settimeout(recv_timeout)
+                if not self._dns_recv_into(client, view, expected_length):
+                    break
 
-            else:
-                # Dispatch a thread to handle the query
-                self.tg.add_thread(self._dns_handle, addr, payload,
-                                   client=client)
+                self._dns_stats['tcp_requests'] += 1
+
+                # Queue the query for the handler pool
+                conn.acquire()
+                self._dns_dispatch(
+                    addr, view[:expected_length].tobytes(), client=conn)
+
+        except socket.timeout:
+            LOG.debug("TCP Timeout from: %(host)s:%(port)d" %
+                      {'host': addr[0], 'port': addr[1]})
+
+        except socket.error as e:
+            errname = errno.errorcode.get(e.args[0], e.args[0])
+            LOG.warn(_LW("Socket error %(err)s from: %(host)s:%(port)d") %
+                     {'host': addr[0], 'port': addr[1], 'err': errname})
+
+        except Exception:
+            LOG.exception(_LE("Unknown exception handling TCP request "
+                              "from: %(host)s:%(port)d") %
+                          {'host': addr[0], 'port': addr[1]})
+
+        finally:
+            self._dns_tcp_conns.discard(conn)
+
+            self._dns_tcp_clients[addr[0]] -= 1
+            if self._dns_tcp_clients[addr[0]] <= 0:
+                del self._dns_tcp_clients[addr[0]]
+
+            # The connection is closed once the last response has been sent
+            conn.release()
+
+    @staticmethod
+    def _dns_recv_into(client, view, length):
+        """
+        Receive exactly length bytes into the start of view, returns False
+        if the connection was closed first.
+        """
+        received = 0
+
+        while received < length:
+            count = client.recv_into(view[received:length], length - received)
+            if not count:
+                return False
+            received += count
+
+        return True
 
     def _dns_handle_udp(self):
         LOG.info(_LI("_handle_udp thread started"))
 
         while True:
             try:
-                # TODO(kiall): Determine the appropriate default value for
-                #              UDP recvfrom.
-                payload, addr = self._dns_sock_udp.recvfrom(8192)
+                payload, addr = self._dns_sock_udp.recvfrom(
+                    self._service_config.udp_recv_size)
 
                 LOG.debug("Handling UDP Request from: %(host)s:%(port)d" %
                          {'host': addr[0], 'port': addr[1]})
 
-                # Dispatch a thread to handle the query
-                self.tg.add_thread(self._dns_handle, addr, payload)
+                self._dns_stats['udp_requests'] += 1
+
+                # Queue the query for the handler pool
+                self._dns_dispatch(addr, payload)
 
             except socket.error as e:
                 errname = errno.errorcode[e.args[0]]
@@ -316,38 +488,96 @@ class DNSService(object):
                                   "from: %(host)s:%(port)d") %
                               {'host': addr[0], 'port': addr[1]})
 
+    def _dns_dispatch(self, addr, payload, client=None):
+        """
+        Queue a DNS Query for the handler pool, shedding it according to
+        the overload policy when the queue is full.
+        """
+        try:
+            self._dns_queue.put_nowait((time.time(), addr, payload, client))
+        except eventlet.queue.Full:
+            self._dns_stats['dropped'] += 1
+
+            LOG.debug("Handler queue full, shedding request from "
+                      "%(host)s:%(port)d" % {'host': addr[0], 'port': addr[1]})
+
+            if self._service_config.overload_policy == 'refuse':
+                self._dns_refuse(addr, payload, client)
+
+            if client:
+                client.release()
+
+    def _dns_refuse(self, addr, payload, client=None):
+        """Answer a DNS Query with REFUSED, without handling it"""
+        try:
+            request = dns.message.from_wire(payload)
+            response = dns.message.make_response(request)
+            response.set_rcode(dns.rcode.REFUSED)
+            response = response.to_wire()
+
+            if client:
+                client.send_message(response)
+            else:
+                self._dns_sock_udp.sendto(response, addr)
+
+            self._dns_stats['refused'] += 1
+
+        except Exception:
+            # A request we can't even parse is simply dropped
+            LOG.debug("Unable to refuse request from %(host)s:%(port)d" %
+                      {'host': addr[0], 'port': addr[1]})
+
+    def _dns_handle_queue(self):
+        while True:
+            enqueued_at, addr, payload, client = self._dns_queue.get()
+
+            wait = time.time() - enqueued_at
+            self._dns_stats['dequeued'] += 1
+            self._dns_stats['queue_wait_total'] += wait
+            self._dns_stats['queue_wait_max'] = max(
+                self._dns_stats['queue_wait_max'], wait)
+
+            self._dns_handle(addr, payload, client=client)
+
     def _dns_handle(self, addr, payload, client=None):
         """
         Handle a DNS Query
 
         :param addr: Tuple of the client's (IP, Port)
         :param payload: Raw DNS query payload
-        :param client: Client socket (for TCP only)
+        :param client: Client DNSTCPConnection (for TCP only)
         """
+        self._dns_in_flight += 1
+
         try:
             # Call into the DNS Application itself with the payload and addr
             for response in self._dns_application(
-                    {'payload': payload, 'addr': addr}):
+                    {'payload': payload, 'addr': addr,
+                     'protocol': 'tcp' if client else 'udp'}):
 
                 # Send back a response only if present
                 if response is not None:
                     if client:
                         # Handle TCP Responses
-                        msg_length = len(response)
-                        tcp_response = struct.pack("!H", msg_length) + response
-                        client.send(tcp_response)
+                        client.send_message(response)
                     else:
                         # Handle UDP Responses
                         self._dns_sock_udp.sendto(response, addr)
 
+                    self._dns_stats['responses'] += 1
+
         except Exception:
+            self._dns_stats['errors'] += 1
             LOG.exception(_LE("Unhandled exception while processing request "
                               "from %(host)s:%(port)d") %
                           {'host': addr[0], 'port': addr[1]})
 
-        # Close the TCP connection if we have one.
-        if client:
-            client.close()
+        finally:
+            self._dns_in_flight -= 1
+
+            # Release our hold on the TCP connection if we have one.
+            if client:
+                client.release()
 
 
 _launcher = None
@@ -826,6 +826,74 @@ class StorageAPI(object):
         """
         return self.storage.count_records(context, criterion)
 
+    @contextlib.contextmanager
+    def create_journal_entries(self, context, domain_id, entries):
+        """
+        Record changes made to a Domain in the zone journal.
+
+        :param context: RPC Context.
+        :param domain_id: Domain ID the changes were made to.
+        :param entries: List of dicts describing each change.
+        """
+        self.storage.begin()
+
+        try:
+            yield self.storage.create_journal_entries(
+                context, domain_id, entries)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                self.storage.rollback()
+        else:
+            self.storage.commit()
+
+    def find_journal_entries(self, context, domain_id, serial):
+        """
+        Find the zone journal entries of a Domain newer than a serial.
+
+        :param context: RPC Context.
+        :param domain_id: Domain ID to find journal entries for.
+        :param serial: Only entries with a greater serial are returned.
+        """
+        return self.storage.find_journal_entries(context, domain_id, serial)
+
+    @contextlib.contextmanager
+    def delete_journal_entries(self, context, domain_id):
+        """
+        Delete all zone journal entries of a Domain.
+
+        :param context: RPC Context.
+        :param domain_id: Domain ID to delete the journal entries of.
+        """
+        self.storage.begin()
+
+        try:
+            yield self.storage.delete_journal_entries(context, domain_id)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                self.storage.rollback()
+        else:
+            self.storage.commit()
+
+    @contextlib.contextmanager
+    def purge_journal(self, context, created_before=None, max_versions=None):
+        """
+        Purge old entries from the zone journal.
+
+        :param context: RPC Context.
+        :param created_before: Purge entries created before this datetime.
+        :param max_versions: Number of serials to retain for each Domain.
+        """
+        self.storage.begin()
+
+        try:
+            yield self.storage.purge_journal(
+                context, created_before, max_versions)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                self.storage.rollback()
+        else:
+            self.storage.commit()
+
     @contextlib.contextmanager
     def create_blacklist(self, context, values):
         """
@@ -446,6 +446,17 @@ class Storage(DriverPlugin):
         :param criterion: Criteria to filter by.
         """
 
+    @abc.abstractmethod
+    def find_recordsets_axfr(self, context, criterion=None):
+        """
+        Stream the records of a zone transfer as (name, type, ttl, data)
+        tuples, ordered by name and type, without building any objects.
+
+        :param context: RPC Context.
+        :param criterion: RecordSet criteria to filter by, a value prefixed
+                          with "!" excludes matching RecordSets.
+        """
+
     @abc.abstractmethod
     def create_record(self, context, domain_id, recordset_id, values):
         """
@@ -535,6 +546,48 @@ class Storage(DriverPlugin):
         :param criterion: Criteria to filter by.
         """
 
+    @abc.abstractmethod
+    def create_journal_entries(self, context, domain_id, entries):
+        """
+        Record changes made to a Domain in the zone journal.
+
+        :param context: RPC Context.
+        :param domain_id: Domain ID the changes were made to.
+        :param entries: List of dicts holding the serial, previous_serial,
+                        operation, name, type, ttl and data of each change.
+        """
+
+    @abc.abstractmethod
+    def find_journal_entries(self, context, domain_id, serial):
+        """
+        Find the zone journal entries of a Domain newer than a serial, ordered
+        by serial.
+
+        :param context: RPC Context.
+        :param domain_id: Domain ID to find journal entries for.
+        :param serial: Only entries with a greater serial are returned.
+        """
+
+    @abc.abstractmethod
+    def delete_journal_entries(self, context, domain_id):
+        """
+        Delete all zone journal entries of a Domain.
+
+        :param context: RPC Context.
+        :param domain_id: Domain ID to delete the journal entries of.
+        """
+
+    @abc.abstractmethod
+    def purge_journal(self, context, created_before=None, max_versions=None):
+        """
+        Purge old entries from the zone journal.
+
+        :param context: RPC Context.
+        :param created_before: Purge entries created before this datetime.
+        :param max_versions: Number of serials to retain for each Domain.
+        :return: The number of purged entries.
+        """
+
     @abc.abstractmethod
     def create_blacklist(self, context, values):
         """
@@ -16,9 +16,10 @@
 import time
 import threading
 import re
+import six
 from sqlalchemy.orm import exc
 from sqlalchemy import exc as sqlalchemy_exc
-from sqlalchemy import distinct, func
+from sqlalchemy import distinct, func, select
 from oslo.config import cfg
 from designate.openstack.common import log as logging
 from designate.openstack.common.db.sqlalchemy.utils import paginate_query
@@ -26,6 +27,7 @@ from designate.openstack.common.db.sqlalchemy.utils import InvalidSortKey
 from designate import exceptions
 from designate.storage import base
 from designate.storage.impl_sqlalchemy import models
+from designate.storage.impl_sqlalchemy import tables
 from designate.sqlalchemy.models import SoftDeleteMixin
 from designate.sqlalchemy.session import get_session
 from designate.sqlalchemy.session import get_engine
@@ -34,6 +36,9 @@ from designate.sqlalchemy.session import SQLOPTS
 
 LOG = logging.getLogger(__name__)
 
+# Number of rows fetched from the cursor at a time when streaming a zone
+AXFR_FETCH_SIZE = 1000
+
 cfg.CONF.register_group(cfg.OptGroup(
     name='storage:sqlalchemy', title="Configuration for SQLAlchemy Storage"
 ))
@@ -88,6 +93,8 @@ class SQLAlchemyStorage(base.Storage):
 
                 if isinstance(value, basestring) and '%' in value:
                     query = query.filter(column.like(value))
+                elif isinstance(value, list):
+                    query = query.filter(column.in_(value))
                 else:
                     query = query.filter(column == value)
 
@@ -875,6 +882,41 @@ class SQLAlchemyStorage(base.Storage):
 
         return query.count()
 
+    def find_recordsets_axfr(self, context, criterion=None):
+        recordsets = tables.recordsets
+        records = tables.records
+
+        query = select([recordsets.c.name, recordsets.c.type,
+                        recordsets.c.ttl, records.c.data])\
+            .select_from(recordsets.join(
+                records, records.c.recordset_id == recordsets.c.id))\
+            .where(records.c.action != 'DELETE')\
+            .order_by(recordsets.c.name, recordsets.c.type, records.c.id)
+
+        for name, value in (criterion or {}).items():
+            column = getattr(recordsets.c, name)
+
+            if isinstance(value, six.string_types) and value.startswith('!'):
+                query = query.where(column != value[1:])
+            else:
+                query = query.where(column == value)
+
+        # Stream the rows from a server side cursor, so a zone transfer never
+        # holds more than a batch of the zone in memory.
+        query = query.execution_options(stream_results=True)
+        resultproxy = self.session.execute(query)
+
+        try:
+            while True:
+                rows = resultproxy.fetchmany(AXFR_FETCH_SIZE)
+                if not rows:
+                    break
+
+                for row in rows:
+                    yield tuple(row)
+        finally:
+            resultproxy.close()
+
     # Record Methods
     def _find_records(self, context, criterion, one=False,
                       marker=None, limit=None, sort_key=None, sort_dir=None):
@@ -990,6 +1032,68 @@ class SQLAlchemyStorage(base.Storage):
         query = self._apply_criterion(models.Record, query, criterion)
         return query.count()
 
+    #
+    # Zone Journal Methods
+    #
+    def create_journal_entries(self, context, domain_id, entries):
+        if not entries:
+            return
+
+        values = []
+        for entry in entries:
+            value = dict(entry)
+            value['domain_id'] = domain_id
+            values.append(value)
+
+        self.session.execute(tables.zone_journal.insert(), values)
+
+    def find_journal_entries(self, context, domain_id, serial):
+        table = tables.zone_journal
+
+        query = select([table])\
+            .where(table.c.domain_id == domain_id)\
+            .where(table.c.serial > serial)\
+            .order_by(table.c.serial)
+
+        return [dict(r) for r in self.session.execute(query).fetchall()]
+
+    def delete_journal_entries(self, context, domain_id):
+        table = tables.zone_journal
+
+        query = table.delete().where(table.c.domain_id == domain_id)
+        self.session.execute(query)
+
+    def purge_journal(self, context, created_before=None, max_versions=None):
+        table = tables.zone_journal
+        count = 0
+
+        if created_before is not None:
+            query = table.delete().where(table.c.created_at < created_before)
+            count += self.session.execute(query).rowcount
+
+        if max_versions:
+            # Find the domains holding more versions than we want to retain
+            query = select([table.c.domain_id])\
+                .group_by(table.c.domain_id)\
+                .having(func.count(distinct(table.c.serial)) > max_versions)
+
+            for (domain_id,) in self.session.execute(query).fetchall():
+                # The oldest serial we keep for this domain
+                query = select([table.c.serial])\
+                    .where(table.c.domain_id == domain_id)\
+                    .distinct()\
+                    .order_by(table.c.serial.desc())\
+                    .offset(max_versions - 1)\
+                    .limit(1)
+                oldest = self.session.execute(query).scalar()
+
+                query = table.delete()\
+                    .where(table.c.domain_id == domain_id)\
+                    .where(table.c.serial < oldest)
+                count += self.session.execute(query).rowcount
+
+        return count
+
     #
     # Blacklist Methods
     #
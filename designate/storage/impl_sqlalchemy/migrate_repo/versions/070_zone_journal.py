@@ -0,0 +1,60 @@
+# Copyright 2015 Hewlett-Packard Development Company, L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+from sqlalchemy import Integer, String, Text, DateTime, Enum, Index
+from sqlalchemy.schema import Table, Column, MetaData, ForeignKeyConstraint
+
+from oslo_utils import timeutils
+
+from designate import utils
+from designate.sqlalchemy.types import UUID
+
+meta = MetaData()
+
+JOURNAL_OPERATIONS = ['ADD', 'DELETE']
+
+zone_journal_table = Table('zone_journal', meta,
+    Column('id', UUID(), default=utils.generate_uuid, primary_key=True),
+    Column('created_at', DateTime, default=lambda: timeutils.utcnow()),
+
+    Column('domain_id', UUID(), nullable=False),
+    Column('serial', Integer, nullable=False),
+    Column('previous_serial', Integer, nullable=False),
+    Column('operation', Enum(name='journal_operations', *JOURNAL_OPERATIONS),
+           nullable=False),
+    Column('name', String(255), nullable=False),
+    Column('type', String(16), nullable=False),
+    Column('ttl', Integer, nullable=False),
+    Column('data', Text, nullable=False),
+
+    Index('zone_journal_domain_serial', 'domain_id', 'serial'),
+    ForeignKeyConstraint(['domain_id'], ['domains.id'], ondelete='CASCADE'),
+
+    mysql_engine='INNODB',
+    mysql_charset='utf8')
+
+
+def upgrade(migrate_engine):
+    meta.bind = migrate_engine
+
+    # The domains table must be known to the metadata for the foreign key
+    Table('domains', meta, autoload=True)
+
+    zone_journal_table.create()
+
+
+def downgrade(migrate_engine):
+    meta.bind = migrate_engine
+
+    zone_journal_table = Table('zone_journal', meta, autoload=True)
+    zone_journal_table.drop()
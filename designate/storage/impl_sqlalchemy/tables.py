@@ -15,7 +15,7 @@
 # under the License.
 from sqlalchemy import (Table, MetaData, Column, String, Text, Integer,
                         SmallInteger, CHAR, DateTime, Enum, Boolean, Unicode,
-                        UniqueConstraint, ForeignKeyConstraint)
+                        UniqueConstraint, ForeignKeyConstraint, Index)
 
 from oslo_config import cfg
 from oslo_utils import timeutils
@@ -40,6 +40,7 @@ ZONE_ATTRIBUTE_KEYS = ('master',)
 
 ZONE_TYPES = ('PRIMARY', 'SECONDARY',)
 ZONE_TASK_TYPES = ['IMPORT', 'EXPORT']
+JOURNAL_OPERATIONS = ['ADD', 'DELETE']
 
 
 metadata = MetaData()
@@ -338,3 +339,24 @@ zone_tasks = Table('zone_tasks', metadata,
 
     mysql_engine='INNODB',
     mysql_charset='utf8')
+
+zone_journal = Table('zone_journal', metadata,
+    Column('id', UUID, default=utils.generate_uuid, primary_key=True),
+    Column('created_at', DateTime, default=lambda: timeutils.utcnow()),
+
+    Column('domain_id', UUID, nullable=False),
+    Column('serial', Integer, nullable=False),
+    Column('previous_serial', Integer, nullable=False),
+    Column('operation', Enum(name='journal_operations', *JOURNAL_OPERATIONS),
+           nullable=False),
+    Column('name', String(255), nullable=False),
+    Column('type', String(16), nullable=False),
+    Column('ttl', Integer, nullable=False),
+    Column('data', Text, nullable=False),
+
+    Index('zone_journal_domain_serial', 'domain_id', 'serial'),
+    ForeignKeyConstraint(['domain_id'], ['domains.id'], ondelete='CASCADE'),
+
+    mysql_engine='InnoDB',
+    mysql_charset='utf8',
+)
@@ -26,6 +26,7 @@ from oslo_config import cfg
 from oslo_config import fixture as cfg_fixture
 from oslo_messaging import conffixture as messaging_fixture
 
+from designate import dnsutils
 from designate import policy
 from designate import utils
 from designate import exceptions
@@ -315,6 +316,9 @@ class TestCase(base.BaseTestCase):
         self.CONF([], project='designate')
         utils.register_plugin_opts()
 
+        # Round trip times measured in one test mustn't leak into the next
+        self.addCleanup(dnsutils.RTT_ESTIMATORS.clear)
+
         self.useFixture(fixtures.PolicyFixture())
         self.network_api = fixtures.NetworkAPIFixture()
         self.useFixture(self.network_api)
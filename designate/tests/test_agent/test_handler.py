@@ -209,3 +209,23 @@ class AgentRequestHandlerTest(AgentTestCase):
             response = next(self.handler(request)).to_wire()
             doaxfr.assert_called_with('example.com.', [], source="1.2.3.4")
             self.assertEqual(expected_response, binascii.b2a_hex(response))
+
+    def test_check_notify(self):
+        """
+        Check a NOTIFY is only acted on when the master is allowed to notify
+        and the zone exists
+        """
+        request = dns.message.make_query('example.com.', 'SOA')
+        request.set_opcode(dns.opcode.NOTIFY)
+        request.environ = {'addr': ["0.0.0.0", 1234]}
+
+        self.assertIsNone(self.handler.check_notify(request))
+
+        with mock.patch.object(self.handler.backend, 'find_domain_serial',
+                               return_value=None):
+            response = self.handler.check_notify(request)
+            self.assertEqual(dns.rcode.REFUSED, response.rcode())
+
+        request.environ = {'addr': ["6.6.6.6", 1234]}
+        response = self.handler.check_notify(request)
+        self.assertEqual(dns.rcode.REFUSED, response.rcode())
@@ -1944,6 +1944,30 @@ class CentralServiceTest(CentralTestCase):
         self.assertEqual(values['data'], record['data'])
         self.assertIn('status', record)
 
+    def test_create_record_journal_failure(self):
+        domain = self.create_domain()
+        recordset = self.create_recordset(domain, type='A')
+
+        # The journal is written in the record's transaction, so failing to
+        # write it leaves neither the record nor the serial increment
+        with mock.patch.object(
+                self.central_service.storage_api.storage,
+                'create_journal_entries',
+                side_effect=exceptions.DesignateException):
+            self.assertRaises(
+                exceptions.DesignateException,
+                self.central_service.create_record, self.admin_context,
+                domain['id'], recordset['id'],
+                objects.Record.from_dict({'data': '127.0.0.1'}))
+
+        records = self.central_service.find_records(
+            self.admin_context, {'recordset_id': recordset['id']})
+        self.assertEqual(0, len(records))
+
+        updated_domain = self.central_service.get_domain(
+            self.admin_context, domain['id'])
+        self.assertEqual(domain['serial'], updated_domain['serial'])
+
     def test_create_record_over_domain_quota(self):
         # SOA and NS Records exist
         self.config(quota_domain_records=3)
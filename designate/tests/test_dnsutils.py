@@ -13,13 +13,26 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import base64
+import socket
+import struct
+import time
+
+import eventlet
 import mock
 from dns import zone as dnszone
+import dns.exception
+import dns.flags
 import dns.message
+import dns.name
+import dns.query
 import dns.rdatatype
+import dns.rrset
 import dns.rcode
 
 from designate import dnsutils
+from designate import exceptions
+from designate import objects
 from designate.tests import TestCase
 
 SAMPLES = {
@@ -100,59 +113,34 @@ class TestUtils(TestCase):
         self.assertEqual(len(SAMPLES), len(zone.recordsets))
         self.assertEqual('example.com.', zone.name)
 
-    def test_zone_lock(self):
-        # Initialize a ZoneLock
-        lock = dnsutils.ZoneLock(0.1)
-
-        # Ensure there's no lock for different zones
-        for zone_name in ['foo.com.', 'bar.com.', 'example.com.']:
-            self.assertEqual(True, lock.acquire(zone_name))
-
-        # Ensure a lock for successive calls for the same zone
-        self.assertEqual(True, lock.acquire('example2.com.'))
-        self.assertEqual(False, lock.acquire('example2.com.'))
-
-        # Acquire, release, and reacquire
-        self.assertEqual(True, lock.acquire('example3.com.'))
-        lock.release('example3.com.')
-        self.assertEqual(True, lock.acquire('example3.com.'))
-
-    def test_limit_notify_middleware(self):
-        # Set the delay
-        self.config(notify_delay=.1,
-                    group='service:agent')
-
-        # Initialize the middlware
-        placeholder_app = None
-        middleware = dnsutils.LimitNotifyMiddleware(placeholder_app)
-
-        # Prepare a NOTIFY
-        zone_name = 'example.com.'
+    def _notify(self, zone_name, serial=None):
         notify = dns.message.make_query(zone_name, dns.rdatatype.SOA)
         notify.flags = 0
         notify.set_opcode(dns.opcode.NOTIFY)
         notify.flags |= dns.flags.AA
+        if serial is not None:
+            notify.answer.append(dns.rrset.from_text(
+                zone_name, 3600, 'IN', 'SOA',
+                'ns1.%s admin.%s %d 3600 600 86400 3600' % (
+                    zone_name, zone_name, serial)))
+        return notify
 
-        # Send the NOTIFY through the middleware
-        # No problem, middleware should return None to pass it on
-        self.assertEqual(middleware.process_request(notify), None)
+    def _notify_application(self):
+        application = mock.Mock(side_effect=lambda request: iter([]))
+        application.check_notify.return_value = None
+        return application
 
-    @mock.patch('designate.dnsutils.ZoneLock.acquire', return_value=False)
-    def test_limit_notify_middleware_no_acquire(self, acquire):
+    def test_limit_notify_middleware(self):
         # Set the delay
         self.config(notify_delay=.1,
                     group='service:agent')
 
         # Initialize the middlware
-        placeholder_app = None
-        middleware = dnsutils.LimitNotifyMiddleware(placeholder_app)
+        application = self._notify_application()
+        middleware = dnsutils.LimitNotifyMiddleware(application)
 
         # Prepare a NOTIFY
-        zone_name = 'example.com.'
-        notify = dns.message.make_query(zone_name, dns.rdatatype.SOA)
-        notify.flags = 0
-        notify.set_opcode(dns.opcode.NOTIFY)
-        notify.flags |= dns.flags.AA
+        notify = self._notify('example.com.')
 
         # Make a response object to match the middleware's return
         response = dns.message.make_response(notify)
@@ -160,7 +148,597 @@ class TestUtils(TestCase):
         response.flags |= dns.flags.AA
 
         # Send the NOTIFY through the middleware
-        # Lock can't be acquired, a NOTIFY is already being worked on
-        # so just return what would have come back for a successful NOTIFY
+        # It is answered straight away, and handled once the delay passes
         # This needs to be a one item tuple for the serialization middleware
         self.assertEqual(middleware.process_request(notify), (response,))
+        self.assertFalse(application.called)
+
+        eventlet.sleep(.2)
+
+        application.assert_called_once_with(notify)
+        self.assertEqual(1, middleware.executed)
+
+    def test_limit_notify_middleware_coalesced(self):
+        # Set the delay
+        self.config(notify_delay=.1,
+                    group='service:agent')
+
+        # Initialize the middlware
+        application = self._notify_application()
+        middleware = dnsutils.LimitNotifyMiddleware(application)
+
+        # A burst of NOTIFYs for one zone, and a single one for another
+        notifies = [self._notify('example.com.') for i in range(5)]
+        other = self._notify('example.net.')
+
+        for notify in notifies + [other]:
+            response = middleware.process_request(notify)
+            self.assertEqual(1, len(response))
+
+        eventlet.sleep(.2)
+
+        # Each zone is handled once, for its first NOTIFY
+        self.assertEqual(2, application.call_count)
+        application.assert_any_call(notifies[0])
+        application.assert_any_call(other)
+
+        self.assertEqual({'notify_coalesced': 4, 'notify_executed': 2,
+                          'notify_pending': 0}, middleware.stats())
+
+    def test_limit_notify_middleware_highest_serial(self):
+        self.config(notify_delay=.1,
+                    group='service:agent')
+
+        application = self._notify_application()
+        middleware = dnsutils.LimitNotifyMiddleware(application)
+
+        notifies = [self._notify('example.com.', serial)
+                    for serial in (5, 7, 6)]
+        notifies.append(self._notify('example.com.'))
+
+        for notify in notifies:
+            middleware.process_request(notify)
+
+        eventlet.sleep(.2)
+
+        application.assert_called_once_with(notifies[1])
+
+    def test_limit_notify_middleware_refused(self):
+        self.config(notify_delay=.1,
+                    group='service:agent')
+
+        application = self._notify_application()
+        middleware = dnsutils.LimitNotifyMiddleware(application)
+
+        notify = self._notify('example.com.', 5)
+        middleware.process_request(notify)
+
+        # A NOTIFY the application refuses is answered with its refusal,
+        # and doesn't replace the pending NOTIFY
+        refused = dns.message.make_response(notify)
+        refused.set_rcode(dns.rcode.REFUSED)
+        application.check_notify.return_value = refused
+
+        self.assertEqual((refused,), middleware.process_request(
+            self._notify('example.com.', 9)))
+        self.assertEqual(0, middleware.coalesced)
+
+        eventlet.sleep(.2)
+
+        application.assert_called_once_with(notify)
+
+    def test_limit_notify_middleware_not_notify(self):
+        self.config(notify_delay=.1,
+                    group='service:agent')
+
+        middleware = dnsutils.LimitNotifyMiddleware(None)
+        query = dns.message.make_query('example.com.', dns.rdatatype.SOA)
+
+        self.assertEqual(middleware.process_request(query), None)
+
+    def _tsigkey_storage(self):
+        storage = mock.Mock()
+        storage.find_tsigkey.return_value = objects.TsigKey.from_dict({
+            'id': '2b6b0b67-9d19-4d5b-a1e4-1f5f0f4c5e8a',
+            'name': 'test-key',
+            'algorithm': 'hmac-md5',
+            'secret': base64.b64encode(b'SomeOldSecretKey'),
+            'scope': 'POOL',
+            'resource_id': '794ccc2c-d751-44fe-b57f-8894c9f5c842',
+        })
+        return storage
+
+    def test_tsigkey_cache(self):
+        storage = self._tsigkey_storage()
+        cache = dnsutils.TsigKeyCache(storage, 60)
+
+        for i in range(3):
+            tsigkey, secret = cache.get('test-key')
+
+        self.assertEqual(b'SomeOldSecretKey', secret)
+        self.assertEqual('POOL', tsigkey.scope)
+        self.assertEqual(1, storage.find_tsigkey.call_count)
+        self.assertEqual(2, cache.hits)
+
+    def test_tsigkey_cache_disabled(self):
+        storage = self._tsigkey_storage()
+        cache = dnsutils.TsigKeyCache(storage, 0)
+
+        cache.get('test-key')
+        cache.get('test-key')
+
+        self.assertEqual(2, storage.find_tsigkey.call_count)
+
+    @mock.patch('time.time')
+    def test_tsigkey_cache_expiry(self, mock_time):
+        storage = self._tsigkey_storage()
+        cache = dnsutils.TsigKeyCache(storage, 60)
+
+        mock_time.return_value = 1000
+        cache.get('test-key')
+
+        mock_time.return_value = 1059
+        cache.get('test-key')
+        self.assertEqual(1, storage.find_tsigkey.call_count)
+
+        mock_time.return_value = 1060
+        cache.get('test-key')
+        self.assertEqual(2, storage.find_tsigkey.call_count)
+
+    def test_tsigkey_cache_notification(self):
+        storage = self._tsigkey_storage()
+        cache = dnsutils.TsigKeyCache(storage, 60)
+        cache.get('test-key')
+
+        cache.info({}, 'central.host', 'dns.domain.update', {}, {})
+        cache.get('test-key')
+        self.assertEqual(1, storage.find_tsigkey.call_count)
+
+        cache.info({}, 'central.host', 'dns.tsigkey.delete', {}, {})
+        cache.get('test-key')
+        self.assertEqual(2, storage.find_tsigkey.call_count)
+
+    def test_tsigkey_cache_not_found(self):
+        storage = self._tsigkey_storage()
+        storage.find_tsigkey.side_effect = exceptions.TsigKeyNotFound
+        cache = dnsutils.TsigKeyCache(storage, 60)
+
+        keyring = dnsutils.TsigKeyring(storage, cache)
+
+        self.assertIsNone(keyring.get(dns.name.from_text('test-key')))
+
+    def test_tsigkey_cache_shared(self):
+        storage = self._tsigkey_storage()
+        cache = dnsutils.TsigKeyCache(storage, 60)
+
+        keyring = dnsutils.TsigKeyring(storage, cache)
+        middleware = dnsutils.TsigInfoMiddleware(None, storage, cache)
+
+        keyname = dns.name.from_text('test-key')
+        self.assertEqual(b'SomeOldSecretKey', keyring[keyname])
+
+        request = mock.Mock(had_tsig=True, keyname=keyname,
+                            environ={'context': mock.Mock()})
+        self.assertIsNone(middleware.process_request(request))
+        self.assertEqual('POOL', request.environ['tsigkey'].scope)
+
+        # The MAC check and the scope lookup share a single storage read
+        self.assertEqual(1, storage.find_tsigkey.call_count)
+
+    def _serialize(self, query, protocol='udp', edns_udp_size=1232):
+        def _application(request):
+            response = dns.message.make_response(request)
+            response.answer = [dns.rrset.from_text_list(
+                'example.com.', 3600, 'IN', 'TXT',
+                ['"%d %s"' % (i, 'x' * 200) for i in range(10)])]
+            yield response
+
+        middleware = dnsutils.SerializationMiddleware(
+            _application, edns_udp_size=edns_udp_size)
+
+        wire = next(middleware({'payload': query.to_wire(),
+                                'addr': ['192.0.2.1', 53],
+                                'protocol': protocol}))
+        return wire, dns.message.from_wire(wire)
+
+    def test_serialization_middleware_edns(self):
+        query = dns.message.make_query('example.com.', 'TXT', use_edns=0,
+                                       payload=4096)
+
+        wire, response = self._serialize(query, edns_udp_size=4096)
+
+        # The whole answer fits the requester's buffer, and our own payload
+        # size is advertised
+        self.assertFalse(response.flags & dns.flags.TC)
+        self.assertEqual(10, len(response.answer[0]))
+        self.assertEqual(0, response.edns)
+        self.assertEqual(4096, response.payload)
+
+    def test_serialization_middleware_truncated(self):
+        # Without EDNS0 UDP responses are limited to 512 bytes
+        query = dns.message.make_query('example.com.', 'TXT')
+
+        wire, response = self._serialize(query)
+
+        self.assertTrue(response.flags & dns.flags.TC)
+        self.assertEqual([], response.answer)
+        self.assertEqual(-1, response.edns)
+
+        # As they are to the requester's buffer with it, or our own if less
+        query = dns.message.make_query('example.com.', 'TXT', use_edns=0,
+                                       payload=4096)
+
+        wire, response = self._serialize(query, edns_udp_size=1232)
+
+        self.assertTrue(response.flags & dns.flags.TC)
+        self.assertEqual(1232, response.payload)
+
+    def test_serialization_middleware_tcp(self):
+        query = dns.message.make_query('example.com.', 'TXT')
+
+        wire, response = self._serialize(query, protocol='tcp')
+
+        self.assertFalse(response.flags & dns.flags.TC)
+        self.assertTrue(len(wire) > 512)
+
+    def test_serialization_middleware_badvers(self):
+        query = dns.message.make_query('example.com.', 'TXT', use_edns=1)
+
+        wire, response = self._serialize(query)
+
+        self.assertEqual(dns.rcode.BADVERS, response.rcode())
+        self.assertEqual(0, response.edns)
+
+    def test_rtt_estimator_timeout(self):
+        rtt = dnsutils.RTTEstimator(min_timeout=0.5)
+        destination = ('192.0.2.1', 53)
+
+        # The configured timeout is used until a response has been timed
+        self.assertEqual(10, rtt.timeout(destination, 10))
+
+        rtt.sample(destination, 1.0)
+        # srtt + 4 * rttvar = 1.0 + 4 * 0.5
+        self.assertEqual(3.0, rtt.timeout(destination, 10))
+        self.assertEqual(2, rtt.timeout(destination, 2))
+
+        # Fast nameservers get at least min_timeout
+        fast = ('192.0.2.2', 53)
+        rtt.sample(fast, 0.001)
+        self.assertEqual(0.5, rtt.timeout(fast, 10))
+
+    def test_rtt_estimator_timeout_doubles(self):
+        rtt = dnsutils.RTTEstimator(min_timeout=0.5, down_after=0)
+        destination = ('192.0.2.1', 53)
+
+        rtt.sample(destination, 0.001)
+        rtt.failure(destination)
+        self.assertEqual(1.0, rtt.timeout(destination, 10))
+        rtt.failure(destination)
+        self.assertEqual(2.0, rtt.timeout(destination, 10))
+
+        # A response resets the backoff
+        rtt.sample(destination, 0.001)
+        self.assertEqual(0.5, rtt.timeout(destination, 10))
+
+    def test_rtt_estimator_backoff(self):
+        rtt = dnsutils.RTTEstimator(max_retry_interval=8)
+
+        for attempt, interval in ((1, 1), (2, 2), (3, 4), (4, 8), (10, 8)):
+            for i in range(10):
+                backoff = rtt.backoff(1, attempt)
+                self.assertTrue(interval / 2.0 <= backoff <= interval)
+
+        # The configured retry interval is never cut short
+        self.assertTrue(rtt.backoff(15, 1) >= 7.5)
+        self.assertTrue(rtt.backoff(15, 5) <= 15)
+
+    @mock.patch('time.time')
+    def test_rtt_estimator_down(self, mock_time):
+        rtt = dnsutils.RTTEstimator(down_after=2, down_period=30)
+        destination = ('192.0.2.1', 53)
+
+        mock_time.return_value = 1000
+        rtt.failure(destination)
+        self.assertFalse(rtt.is_down(destination))
+        rtt.failure(destination)
+        self.assertTrue(rtt.is_down(destination))
+        self.assertTrue(rtt.stats(destination)['down'])
+
+        # A single probe is let through once the period has passed, and
+        # its failure marks the destination down straight away
+        mock_time.return_value = 1030
+        self.assertFalse(rtt.is_down(destination))
+        rtt.failure(destination)
+        self.assertTrue(rtt.is_down(destination))
+
+        # Whereas a response brings it back up
+        mock_time.return_value = 1060
+        self.assertFalse(rtt.is_down(destination))
+        rtt.sample(destination, 0.1)
+        rtt.failure(destination)
+        self.assertFalse(rtt.is_down(destination))
+
+    def _tcp_nameserver(self, answer_in_reverse=False, close_after=None):
+        """A TCP nameserver answering SOA queries on a random port"""
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(10)
+        self.addCleanup(listener.close)
+
+        accepted = []
+
+        def _recv(sock, count):
+            data = b''
+            while len(data) < count:
+                chunk = sock.recv(count - len(data))
+                if not chunk:
+                    raise EOFError()
+                data += chunk
+            return data
+
+        def _send(sock, query):
+            response = dns.message.make_response(query)
+            response.flags |= dns.flags.AA
+            wire = response.to_wire()
+            sock.sendall(struct.pack('!H', len(wire)) + wire)
+
+        def _serve(sock):
+            queries = []
+            try:
+                while True:
+                    (length,) = struct.unpack('!H', _recv(sock, 2))
+                    queries.append(dns.message.from_wire(_recv(sock, length)))
+
+                    if answer_in_reverse and len(queries) < 2:
+                        continue
+
+                    for query in reversed(queries):
+                        _send(sock, query)
+                    queries = []
+
+                    if close_after and len(accepted) <= close_after:
+                        sock.close()
+                        return
+            except (EOFError, socket.error):
+                sock.close()
+
+        def _accept():
+            while True:
+                sock, addr = listener.accept()
+                accepted.append(sock)
+                eventlet.spawn_n(_serve, sock)
+
+        self.addCleanup(eventlet.spawn(_accept).kill)
+
+        return listener.getsockname()[1], accepted
+
+    def _soa_query(self, zone_name='example.com.'):
+        return dns.message.make_query(zone_name, dns.rdatatype.SOA)
+
+    def test_tcp_connection_pool_reuse(self):
+        port, accepted = self._tcp_nameserver()
+        pool = dnsutils.TCPConnectionPool()
+        self.addCleanup(pool.close)
+
+        for zone_name in ('example.com.', 'example.net.', 'example.org.'):
+            query = self._soa_query(zone_name)
+            response = pool.query(query, '127.0.0.1', port, 1)
+            self.assertTrue(query.is_response(response))
+
+        self.assertEqual(1, len(accepted))
+        self.assertEqual({'tcp_connections': 1, 'tcp_connects': 1,
+                          'tcp_reused': 2}, pool.stats())
+
+    def test_tcp_connection_pool_pipelining(self):
+        # Both queries must be outstanding on one connection before either
+        # is answered, and the answers come back out of order
+        port, accepted = self._tcp_nameserver(answer_in_reverse=True)
+        pool = dnsutils.TCPConnectionPool()
+        self.addCleanup(pool.close)
+
+        queries = [self._soa_query('example.com.'),
+                   self._soa_query('example.net.')]
+
+        green_pool = eventlet.GreenPool()
+        results = [green_pool.spawn(pool.query, query, '127.0.0.1', port, 1)
+                   for query in queries]
+
+        for query, result in zip(queries, results):
+            self.assertTrue(query.is_response(result.wait()))
+
+        self.assertEqual(1, pool.stats()['tcp_connections'])
+
+    def test_tcp_connection_pool_reconnect(self):
+        # The nameserver closes the first connection after answering
+        port, accepted = self._tcp_nameserver(close_after=1)
+        pool = dnsutils.TCPConnectionPool()
+        self.addCleanup(pool.close)
+
+        pool.query(self._soa_query(), '127.0.0.1', port, 1)
+        eventlet.sleep(0.1)
+
+        query = self._soa_query('example.net.')
+        self.assertTrue(query.is_response(
+            pool.query(query, '127.0.0.1', port, 1)))
+        self.assertEqual(2, len(accepted))
+
+    def test_tcp_connection_pool_idle_timeout(self):
+        port, accepted = self._tcp_nameserver()
+        pool = dnsutils.TCPConnectionPool(idle_timeout=0.05)
+        self.addCleanup(pool.close)
+
+        pool.query(self._soa_query(), '127.0.0.1', port, 1)
+        eventlet.sleep(0.1)
+        pool.query(self._soa_query(), '127.0.0.1', port, 1)
+
+        self.assertEqual(2, len(accepted))
+        self.assertEqual(2, pool.connects)
+
+    def test_tcp_connection_pool_timeout(self):
+        # Nothing is answered until two queries are outstanding
+        port, accepted = self._tcp_nameserver(answer_in_reverse=True)
+        pool = dnsutils.TCPConnectionPool()
+        self.addCleanup(pool.close)
+
+        self.assertRaises(dns.exception.Timeout, pool.query,
+                          self._soa_query(), '127.0.0.1', port, 0.1)
+
+    def _ixfr_response(self, rrs):
+        response = dns.message.make_response(
+            dns.message.make_query('example.com.', dns.rdatatype.IXFR))
+        for name, rdtype, data in rrs:
+            response.answer.append(
+                dns.rrset.from_text(name, 3600, 'IN', rdtype, data))
+        return response
+
+    def _soa(self, serial):
+        return ('example.com.', 'SOA',
+                'ns1.example.org. example.example.com. %d 3600 600 86400 '
+                '3600' % serial)
+
+    def test_do_ixfr(self):
+        servers = [{'host': '192.0.2.53', 'port': 53}]
+        # Two versions, split across two messages
+        messages = [
+            self._ixfr_response([
+                self._soa(102),
+                self._soa(100),
+                ('www.example.com.', 'A', '192.0.2.3'),
+                self._soa(101),
+                ('ftp.example.com.', 'A', '192.0.2.4'),
+            ]),
+            self._ixfr_response([
+                self._soa(101),
+                ('ftp.example.com.', 'A', '192.0.2.4'),
+                self._soa(102),
+                self._soa(102),
+            ]),
+        ]
+
+        with mock.patch.object(dns.query, 'xfr',
+                               return_value=iter(messages)) as xfr:
+            (ttl, soa), changes = dnsutils.do_ixfr(
+                'example.com.', servers, 100, timeout=1)
+
+        self.assertEqual(dns.rdatatype.IXFR, xfr.call_args[1]['rdtype'])
+        self.assertEqual(100, xfr.call_args[1]['serial'])
+
+        self.assertEqual(102, soa.serial)
+        self.assertEqual(
+            [('DELETE', 'www.example.com.', '192.0.2.3'),
+             ('ADD', 'ftp.example.com.', '192.0.2.4'),
+             ('DELETE', 'ftp.example.com.', '192.0.2.4')],
+            [(operation, name.to_text(), rdata.to_text())
+             for operation, name, _ttl, rdata in changes])
+
+    def test_do_ixfr_whole_zone(self):
+        servers = [{'host': '192.0.2.53', 'port': 53}]
+        messages = [self._ixfr_response([
+            self._soa(102),
+            ('example.com.', 'NS', 'ns1.example.org.'),
+            self._soa(102),
+        ])]
+
+        with mock.patch.object(dns.query, 'xfr',
+                               return_value=iter(messages)):
+            self.assertIsNone(dnsutils.do_ixfr(
+                'example.com.', servers, 100, timeout=1))
+
+    def test_do_ixfr_refused(self):
+        servers = [{'host': '192.0.2.53', 'port': 53}]
+
+        with mock.patch.object(dns.query, 'xfr',
+                               side_effect=dns.query.TransferError(5)):
+            self.assertRaises(exceptions.XFRFailure, dnsutils.do_ixfr,
+                              'example.com.', servers, 100, timeout=1)
+
+    def test_do_ixfr_connection_closed(self):
+        servers = [{'host': '192.0.2.53', 'port': 53}]
+
+        with mock.patch.object(dns.query, 'xfr', side_effect=EOFError):
+            self.assertRaises(exceptions.XFRFailure, dnsutils.do_ixfr,
+                              'example.com.', servers, 100, timeout=1)
+
+    def test_do_ixfr_empty(self):
+        servers = [{'host': '192.0.2.53', 'port': 53}]
+        messages = [self._ixfr_response([])]
+
+        with mock.patch.object(dns.query, 'xfr',
+                               return_value=iter(messages)):
+            self.assertRaises(exceptions.XFRFailure, dnsutils.do_ixfr,
+                              'example.com.', servers, 100, timeout=1)
+
+    def _soa_nameserver(self, behaviour):
+        """Answers SOA queries as behaviour[host] = (delay, serial) says"""
+        def _udp(query, host, port=53, timeout=None):
+            delay, serial = behaviour[host]
+            eventlet.sleep(delay)
+
+            if serial is None:
+                raise dns.exception.Timeout()
+
+            response = dns.message.make_response(query)
+            response.flags |= dns.flags.AA
+            response.answer.append(dns.rrset.from_text(
+                query.question[0].name, 3600, 'IN', 'SOA',
+                'ns1.example.org. example.example.com. %d 3600 600 86400 '
+                '3600' % serial))
+            return response
+
+        return mock.patch.object(dns.query, 'udp', side_effect=_udp)
+
+    def test_probe_masters(self):
+        servers = [{'host': '192.0.2.%d' % i, 'port': 53} for i in (1, 2, 3)]
+
+        # Prefer the masters in order, as if they had answered before
+        rtt = dnsutils.RTTEstimator()
+        for i, srv in enumerate(servers):
+            rtt.sample((srv['host'], srv['port']), 0.001 * (i + 1))
+
+        behaviour = {
+            # Black holed
+            '192.0.2.1': (1, None),
+            # Slow, but has the latest serial
+            '192.0.2.2': (0.15, 102),
+            '192.0.2.3': (0.01, 101),
+        }
+
+        start = time.time()
+        with self._soa_nameserver(behaviour):
+            ordered = dnsutils.probe_masters(
+                'example.com.', servers, 1, 0.1, rtt)
+
+        # The black holed master only held the others up by the stagger
+        self.assertTrue(time.time() - start < 0.5)
+        self.assertEqual(['192.0.2.2', '192.0.2.3', '192.0.2.1'],
+                         [o_srv['host'] for o_srv in ordered])
+
+    def test_probe_masters_failures(self):
+        servers = [{'host': '192.0.2.%d' % i, 'port': 53} for i in (1, 2)]
+        rtt = dnsutils.RTTEstimator(down_after=1)
+
+        behaviour = {'192.0.2.1': (0, None), '192.0.2.2': (0, None)}
+
+        with self._soa_nameserver(behaviour):
+            ordered = dnsutils.probe_masters(
+                'example.com.', servers, 1, 0.1, rtt)
+
+        self.assertEqual(2, len(ordered))
+        # The timeouts count against the masters next time
+        self.assertTrue(rtt.stats(('192.0.2.1', 53))['down'])
+        self.assertTrue(rtt.stats(('192.0.2.2', 53))['down'])
+
+    @mock.patch.object(dnsutils, 'probe_masters')
+    def test_do_axfr_probe_masters(self, probe_masters):
+        self.config(xfr_probe_masters=True, group='service:mdns')
+        servers = [{'host': '192.0.2.%d' % i, 'port': 53} for i in (1, 2)]
+        probe_masters.return_value = list(reversed(servers))
+
+        with mock.patch.object(dns.query, 'xfr',
+                               side_effect=dns.exception.FormError):
+            self.assertRaises(exceptions.XFRFailure, dnsutils.do_axfr,
+                              'example.com.', servers, timeout=1)
+
+        probe_masters.assert_called_once_with('example.com.', servers, 1,
+                                              0.25)
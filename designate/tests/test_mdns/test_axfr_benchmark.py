@@ -0,0 +1,103 @@
+# Copyright 2015 Hewlett-Packard Development Company, L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""
+Micro-benchmark of AXFR rendering in mdns.
+
+Renders zones of 1k, 10k and 100k records through the AXFR handler, with
+the storage mocked out, and reports records/sec and packets per zone. It is
+skipped unless DESIGNATE_BENCHMARK is set in the environment:
+
+    DESIGNATE_BENCHMARK=1 python -m testtools.run \\
+        designate.tests.test_mdns.test_axfr_benchmark
+"""
+from __future__ import print_function
+
+import os
+import time
+
+import dns.message
+import dns.rdatatype
+import mock
+import testtools
+
+from designate import context
+from designate import objects
+from designate.mdns import handler
+from designate.tests.test_mdns import MdnsTestCase
+
+ZONE_SIZES = (1000, 10000, 100000)
+
+# Records sharing an owner name and type, to exercise RRSet grouping
+RRSET_SIZE = 4
+
+
+@testtools.skipUnless(os.environ.get('DESIGNATE_BENCHMARK'),
+                      'DESIGNATE_BENCHMARK is not set')
+class MdnsAXFRBenchmark(MdnsTestCase):
+    def setUp(self):
+        super(MdnsAXFRBenchmark, self).setUp()
+
+        # Measure the rendering, not the cache
+        self.config(axfr_cache_size=0, group='service:mdns')
+
+        self.handler = handler.RequestHandler(self.storage, mock.Mock())
+        self.context = context.DesignateContext.get_admin_context(
+            all_tenants=True)
+
+        self.domain = objects.Domain.from_dict({
+            'id': '4f6a9a1c-3b56-4de6-8e2f-0ad8e6c3e0a1',
+            'name': 'example.com.',
+            'ttl': 3600,
+            'serial': 1427899961,
+            'email': 'example@example.com',
+        })
+
+    def _records(self, size):
+        for i in range(size):
+            yield ('host%d.example.com.' % (i // RRSET_SIZE), 'A', 3600,
+                   '10.%d.%d.%d' % (i >> 16 & 255, i >> 8 & 255, i & 255))
+
+    def _axfr(self, size):
+        def _find_recordsets_axfr(context, criterion):
+            if criterion['type'] == 'SOA':
+                return [('example.com.', 'SOA', 3600,
+                         'ns1.example.org. example.example.com. 1427899961 '
+                         '3600 600 86400 3600')]
+
+            return self._records(size)
+
+        request = dns.message.make_query('example.com.', dns.rdatatype.AXFR)
+        request = dns.message.from_wire(request.to_wire())
+        request.environ = {'addr': ['0.0.0.0', 5556], 'context': self.context}
+
+        with mock.patch.object(self.storage, 'find_domain',
+                               return_value=self.domain):
+            with mock.patch.object(self.storage, 'find_recordsets_axfr',
+                                   side_effect=_find_recordsets_axfr):
+                start = time.time()
+                packets = [len(r.get_wire()) for r in self.handler(request)]
+                elapsed = time.time() - start
+
+        return packets, elapsed
+
+    def test_axfr_render(self):
+        for size in ZONE_SIZES:
+            packets, elapsed = self._axfr(size)
+
+            print('AXFR of %(size)d records: %(rate)d records/sec, '
+                  '%(packets)d packets, %(bytes)d bytes' %
+                  {'size': size, 'rate': size / max(elapsed, 1e-6),
+                   'packets': len(packets), 'bytes': sum(packets)})
+
+            self.assertTrue(len(packets) > 0)
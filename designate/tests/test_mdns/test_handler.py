@@ -16,6 +16,11 @@
 import binascii
 
 import dns
+import dns.edns
+import dns.flags
+import dns.message
+import dns.opcode
+import dns.rcode
 import dns.rdataclass
 import dns.rdatatype
 import dns.resolver
@@ -25,9 +30,11 @@ import testtools
 from oslo_config import cfg
 
 from designate import context
+from designate import dnsutils
 from designate import objects
 from designate.tests.test_mdns import MdnsTestCase
 from designate.mdns import handler
+from designate.mdns import zonefilter
 
 CONF = cfg.CONF
 default_pool_id = CONF['service:central'].default_pool_id
@@ -488,16 +495,14 @@ class MdnsRequestHandlerTest(MdnsTestCase):
 
         def _find_recordsets_axfr(context, criterion):
             if criterion['type'] == 'SOA':
-                return [['UUID1', 'SOA', '3600', 'example.com.',
+                return [('example.com.', 'SOA', 3600,
                          'ns1.example.org. example.example.com. 1427899961 '
-                         '3600 600 86400 3600', 'ACTION']]
+                         '3600 600 86400 3600')]
 
             elif criterion['type'] == '!SOA':
                 return [
-                    ['UUID2', 'NS', '3600', 'example.com.', 'ns1.example.org.',
-                     'ACTION'],
-                    ['UUID3', 'A', '3600', 'mail.example.com.', '192.0.2.1',
-                     'ACTION'],
+                    ('example.com.', 'NS', 3600, 'ns1.example.org.'),
+                    ('mail.example.com.', 'A', 3600, '192.0.2.1'),
                 ]
 
         with mock.patch.object(self.storage, 'find_domain',
@@ -550,16 +555,14 @@ class MdnsRequestHandlerTest(MdnsTestCase):
 
         def _find_recordsets_axfr(context, criterion):
             if criterion['type'] == 'SOA':
-                return [['UUID1', 'SOA', '3600', 'example.com.',
+                return [('example.com.', 'SOA', 3600,
                          'ns1.example.org. example.example.com. 1427899961 '
-                         '3600 600 86400 3600', 'ACTION']]
+                         '3600 600 86400 3600')]
 
             elif criterion['type'] == '!SOA':
                 return [
-                    ['UUID2', 'NS', '3600', 'example.com.', 'ns1.example.org.',
-                     'ACTION'],
-                    ['UUID3', 'A', '3600', 'mail.example.com.', '192.0.2.1',
-                     'ACTION'],
+                    ('example.com.', 'NS', 3600, 'ns1.example.org.'),
+                    ('mail.example.com.', 'A', 3600, '192.0.2.1'),
                 ]
 
         with mock.patch.object(self.storage, 'find_domain',
@@ -581,6 +584,109 @@ class MdnsRequestHandlerTest(MdnsTestCase):
                 self.assertEqual(
                     expected_response[1], binascii.b2a_hex(response_two))
 
+    def test_dispatch_opcode_query_AXFR_cached(self):
+        # Set the max-message-size to 128
+        self.config(max_message_size=128, group='service:mdns')
+
+        domain = objects.Domain.from_dict({
+            'id': '4f6a9a1c-3b56-4de6-8e2f-0ad8e6c3e0a1',
+            'name': 'example.com.',
+            'ttl': 3600,
+            'serial': 1427899961,
+            'email': 'example@example.com',
+        })
+
+        def _find_recordsets_axfr(context, criterion):
+            if criterion['type'] == 'SOA':
+                return [('example.com.', 'SOA', 3600,
+                         'ns1.example.org. example.example.com. 1427899961 '
+                         '3600 600 86400 3600')]
+
+            elif criterion['type'] == '!SOA':
+                return [
+                    ('example.com.', 'NS', 3600, 'ns1.example.org.'),
+                    ('mail.example.com.', 'A', 3600, '192.0.2.1'),
+                ]
+
+        def _axfr(query_id):
+            request = dns.message.make_query('example.com.',
+                                             dns.rdatatype.AXFR)
+            request.id = query_id
+            request = dns.message.from_wire(request.to_wire())
+            request.environ = {'addr': self.addr, 'context': self.context}
+
+            return [r.get_wire() for r in self.handler(request)]
+
+        with mock.patch.object(self.storage, 'find_domain',
+                               return_value=domain):
+            with mock.patch.object(self.storage, 'find_recordsets_axfr',
+                                   side_effect=_find_recordsets_axfr) as find:
+                first = _axfr(1000)
+                self.assertEqual(2, find.call_count)
+
+                second = _axfr(2000)
+                # The second transfer is served entirely from the cache
+                self.assertEqual(2, find.call_count)
+
+        self.assertEqual(2, len(first))
+        self.assertEqual(len(first), len(second))
+
+        for packet_one, packet_two in zip(first, second):
+            # Only the header ID differs between the two transfers
+            self.assertEqual(1000, dns.message.from_wire(packet_one).id)
+            self.assertEqual(2000, dns.message.from_wire(packet_two).id)
+            self.assertEqual(packet_one[2:], packet_two[2:])
+
+        self.assertEqual(1, self.handler.axfr_cache.hits)
+        self.assertEqual(1, self.handler.axfr_cache.misses)
+
+    def test_dispatch_opcode_query_AXFR_streamed(self):
+        # Set the max-message-size to 128
+        self.config(max_message_size=128, group='service:mdns')
+
+        domain = objects.Domain.from_dict({
+            'name': 'example.com.',
+            'ttl': 3600,
+            'serial': 1427899961,
+            'email': 'example@example.com',
+        })
+
+        rows_read = []
+
+        def _records():
+            for i in range(10):
+                rows_read.append(i)
+                yield ('host%d.example.com.' % i, 'A', 3600, '192.0.2.%d' % i)
+
+        def _find_recordsets_axfr(context, criterion):
+            if criterion['type'] == 'SOA':
+                return iter([('example.com.', 'SOA', 3600,
+                              'ns1.example.org. example.example.com. '
+                              '1427899961 3600 600 86400 3600')])
+
+            elif criterion['type'] == '!SOA':
+                return _records()
+
+        with mock.patch.object(self.storage, 'find_domain',
+                               return_value=domain):
+            with mock.patch.object(self.storage, 'find_recordsets_axfr',
+                                   side_effect=_find_recordsets_axfr):
+                request = dns.message.make_query('example.com.',
+                                                 dns.rdatatype.AXFR)
+                request = dns.message.from_wire(request.to_wire())
+                request.environ = {'addr': self.addr, 'context': self.context}
+
+                response_generator = self.handler(request)
+
+                # The first message is sent before the zone is fully read
+                next(response_generator)
+                self.assertTrue(0 < len(rows_read) < 10)
+
+                responses = list(response_generator)
+
+        self.assertEqual(10, len(rows_read))
+        self.assertTrue(len(responses) > 0)
+
     def test_dispatch_opcode_query_AXFR_rrset_over_max_size(self):
         # Query is for example.com. IN AXFR
         # id 18883
@@ -628,16 +734,14 @@ class MdnsRequestHandlerTest(MdnsTestCase):
 
         def _find_recordsets_axfr(context, criterion):
             if criterion['type'] == 'SOA':
-                return [['UUID1', 'SOA', '3600', 'example.com.',
+                return [('example.com.', 'SOA', 3600,
                          'ns1.example.org. example.example.com. 1427899961 '
-                         '3600 600 86400 3600', 'ACTION']]
+                         '3600 600 86400 3600')]
 
             elif criterion['type'] == '!SOA':
                 return [
-                    ['UUID2', 'NS', '3600', 'example.com.', 'a' * 63 + '.',
-                     'ACTION'],
-                    ['UUID2', 'NS', '3600', 'example.com.', 'b' * 10 + '.',
-                     'ACTION'],
+                    ('example.com.', 'NS', 3600, 'a' * 63 + '.'),
+                    ('example.com.', 'NS', 3600, 'b' * 10 + '.'),
                 ]
 
         with mock.patch.object(self.storage, 'find_domain',
@@ -668,6 +772,75 @@ class MdnsRequestHandlerTest(MdnsTestCase):
                 with testtools.ExpectedException(StopIteration):
                     next(response_generator)
 
+    def test_dispatch_opcode_query_AXFR_rrset_split(self):
+        # Set the max-message-size to 128
+        self.config(max_message_size=128, group='service:mdns')
+
+        domain = objects.Domain.from_dict({
+            'name': 'example.com.',
+            'ttl': 3600,
+            'serial': 1427899961,
+            'email': 'example@example.com',
+        })
+
+        def _find_recordsets_axfr(context, criterion):
+            if criterion['type'] == 'SOA':
+                return [('example.com.', 'SOA', 3600,
+                         'ns1.example.org. example.example.com. 1427899961 '
+                         '3600 600 86400 3600')]
+
+            elif criterion['type'] == '!SOA':
+                return [('www.example.com.', 'A', 3600, '192.0.2.%d' % i)
+                        for i in range(20)]
+
+        with mock.patch.object(self.storage, 'find_domain',
+                               return_value=domain):
+            with mock.patch.object(self.storage, 'find_recordsets_axfr',
+                                   side_effect=_find_recordsets_axfr):
+                request = dns.message.make_query('example.com.',
+                                                 dns.rdatatype.AXFR)
+                request = dns.message.from_wire(request.to_wire())
+                request.environ = {'addr': self.addr, 'context': self.context}
+
+                responses = [dns.message.from_wire(r.get_wire())
+                             for r in self.handler(request)]
+
+        # The RRSet doesn't fit in a single message, so it is spread over
+        # several rather than aborting the transfer.
+        self.assertTrue(len(responses) > 1)
+
+        rdatas = set()
+        for response in responses:
+            self.assertEqual(dns.rcode.NOERROR, response.rcode())
+            for rrset in response.answer:
+                if rrset.rdtype == dns.rdatatype.A:
+                    rdatas.update(rdata.to_text() for rdata in rrset)
+
+        self.assertEqual(20, len(rdatas))
+
+    def test_record_rrsets_grouped(self):
+        domain = objects.Domain.from_dict({'name': 'example.com.',
+                                           'ttl': 3600})
+
+        records = [
+            ('example.com.', 'NS', 3600, 'ns1.example.org.'),
+            ('example.com.', 'NS', 3600, 'ns2.example.org.'),
+            ('mail.example.com.', 'A', None, '192.0.2.1'),
+            ('mail.example.com.', 'AAAA', 300, '2001:db8::1'),
+            ('www.example.com.', 'A', 300, '192.0.2.2'),
+            ('www.example.com.', 'A', 300, '192.0.2.3'),
+        ]
+
+        rrsets = list(self.handler._record_rrsets(domain, records))
+
+        self.assertEqual(4, len(rrsets))
+        self.assertEqual(
+            [('example.com.', dns.rdatatype.NS, 3600, 2),
+             ('mail.example.com.', dns.rdatatype.A, 3600, 1),
+             ('mail.example.com.', dns.rdatatype.AAAA, 300, 1),
+             ('www.example.com.', dns.rdatatype.A, 300, 2)],
+            [(r.name.to_text(), r.rdtype, r.ttl, len(r)) for r in rrsets])
+
     def test_dispatch_opcode_query_AXFR_rr_over_max_size(self):
         # Query is for example.com. IN AXFR
         # id 18883
@@ -706,14 +879,14 @@ class MdnsRequestHandlerTest(MdnsTestCase):
 
         def _find_recordsets_axfr(context, criterion):
             if criterion['type'] == 'SOA':
-                return [['UUID1', 'SOA', '3600', 'example.com.',
+                return [('example.com.', 'SOA', 3600,
                          'ns1.example.org. example.example.com. 1427899961 '
-                         '3600 600 86400 3600', 'ACTION']]
+                         '3600 600 86400 3600')]
 
             elif criterion['type'] == '!SOA':
                 return [
-                    ['UUID2', 'NS', '3600', 'example.com.',
-                    'a' * 63 + '.' + 'a' * 63 + '.', 'ACTION'],
+                    ('example.com.', 'NS', 3600,
+                     'a' * 63 + '.' + 'a' * 63 + '.'),
                 ]
 
         with mock.patch.object(self.storage, 'find_domain',
@@ -739,6 +912,137 @@ class MdnsRequestHandlerTest(MdnsTestCase):
                 with testtools.ExpectedException(StopIteration):
                     next(response_generator)
 
+    def _ixfr_request(self, serial=None):
+        request = dns.message.make_query('example.com.', dns.rdatatype.IXFR)
+
+        if serial is not None:
+            request.authority.append(dns.rrset.from_text(
+                'example.com.', 3600, 'IN', 'SOA',
+                'ns1.example.org. example.example.com. %d '
+                '3600 600 86400 3600' % serial))
+
+        request = dns.message.from_wire(request.to_wire())
+        request.environ = {'addr': self.addr, 'context': self.context}
+
+        return request
+
+    def _ixfr_find_recordsets_axfr(self, context, criterion):
+        if criterion['type'] == 'SOA':
+            return [('example.com.', 'SOA', 3600,
+                     'ns1.example.org. example.example.com. 1427899963 '
+                     '3600 600 86400 3600')]
+
+        elif criterion['type'] == '!SOA':
+            return [
+                ('example.com.', 'NS', 3600, 'ns1.example.org.'),
+                ('mail.example.com.', 'A', 3600, '192.0.2.2'),
+            ]
+
+    def _ixfr_journal(self):
+        def _entry(serial, operation, data):
+            return {'serial': serial, 'previous_serial': serial - 1,
+                    'operation': operation, 'name': 'mail.example.com.',
+                    'type': 'A', 'ttl': 3600, 'data': data}
+
+        return [
+            _entry(1427899962, 'ADD', '192.0.2.1'),
+            _entry(1427899963, 'DELETE', '192.0.2.1'),
+            _entry(1427899963, 'ADD', '192.0.2.2'),
+        ]
+
+    def _ixfr(self, request, journal=None):
+        domain = objects.Domain.from_dict({
+            'id': '4f6a9a1c-3b56-4de6-8e2f-0ad8e6c3e0a1',
+            'name': 'example.com.',
+            'ttl': 3600,
+            'serial': 1427899963,
+            'email': 'example@example.com',
+        })
+
+        find_recordsets_axfr = self._ixfr_find_recordsets_axfr
+
+        with mock.patch.object(self.storage, 'find_domain',
+                               return_value=domain), \
+                mock.patch.object(self.storage, 'find_recordsets_axfr',
+                                  side_effect=find_recordsets_axfr), \
+                mock.patch.object(self.storage, 'find_journal_entries',
+                                  return_value=journal) as find_journal:
+            responses = [
+                dns.message.from_wire(r.get_wire(), one_rr_per_rrset=True)
+                for r in self.handler(request)]
+
+        return responses, find_journal
+
+    def test_dispatch_opcode_query_IXFR(self):
+        request = self._ixfr_request(1427899961)
+        responses, find_journal = self._ixfr(request, self._ixfr_journal())
+
+        find_journal.assert_called_once_with(
+            self.context, '4f6a9a1c-3b56-4de6-8e2f-0ad8e6c3e0a1', 1427899961)
+
+        self.assertEqual(1, len(responses))
+
+        answer = [(rrset.rdtype, rrset[0].to_text())
+                  for rrset in responses[0].answer]
+
+        def _soa(serial):
+            return (dns.rdatatype.SOA,
+                    'ns1.example.org. example.example.com. %d '
+                    '3600 600 86400 3600' % serial)
+
+        expected = [
+            _soa(1427899963),
+            # Changes between 1427899961 and 1427899962
+            _soa(1427899961),
+            _soa(1427899962),
+            (dns.rdatatype.A, '192.0.2.1'),
+            # Changes between 1427899962 and 1427899963
+            _soa(1427899962),
+            (dns.rdatatype.A, '192.0.2.1'),
+            _soa(1427899963),
+            (dns.rdatatype.A, '192.0.2.2'),
+            _soa(1427899963),
+        ]
+
+        self.assertEqual(expected, answer)
+
+    def test_dispatch_opcode_query_IXFR_up_to_date(self):
+        request = self._ixfr_request(1427899963)
+        responses, find_journal = self._ixfr(request)
+
+        self.assertFalse(find_journal.called)
+
+        # A single SOA tells the requester it is up to date
+        self.assertEqual(1, len(responses))
+        self.assertEqual(1, len(responses[0].answer))
+        self.assertEqual(dns.rdatatype.SOA, responses[0].answer[0].rdtype)
+        self.assertEqual(1427899963, responses[0].answer[0][0].serial)
+
+    def test_dispatch_opcode_query_IXFR_journal_gap(self):
+        # The journal no longer holds the changes made after 1427899960
+        request = self._ixfr_request(1427899960)
+        responses, find_journal = self._ixfr(request, self._ixfr_journal())
+
+        self.assertTrue(find_journal.called)
+
+        # A full zone transfer is sent instead
+        answer = [(rrset.rdtype, rrset[0].to_text())
+                  for rrset in responses[0].answer]
+
+        self.assertEqual(4, len(answer))
+        self.assertEqual(dns.rdatatype.SOA, answer[0][0])
+        self.assertIn((dns.rdatatype.A, '192.0.2.2'), answer)
+        self.assertEqual(dns.rdatatype.SOA, answer[-1][0])
+
+    def test_dispatch_opcode_query_IXFR_without_soa(self):
+        request = self._ixfr_request()
+        responses, find_journal = self._ixfr(request)
+
+        self.assertFalse(find_journal.called)
+
+        # A full zone transfer is sent instead
+        self.assertEqual(4, len(responses[0].answer))
+
     def test_dispatch_opcode_query_nonexistent_recordtype(self):
         # query is for mail.example.com. IN CNAME
         payload = ("271801000001000000000000046d61696c076578616d706c6503636f6d"
@@ -917,3 +1221,296 @@ class MdnsRequestHandlerTest(MdnsTestCase):
 
         response = next(self.handler(request)).to_wire()
         self.assertEqual(expected_response, binascii.b2a_hex(response))
+
+    def _zone_tree_query(self, name, rdtype, tsigkey=None):
+        request = dns.message.make_query(name, rdtype)
+        request = dns.message.from_wire(request.to_wire())
+        request.environ = {'addr': self.addr, 'context': self.context}
+
+        if tsigkey is not None:
+            request.environ['tsigkey'] = tsigkey
+
+        return next(self.handler(request))
+
+    def _zone_tree_setup(self):
+        self.config(zone_tree_size=10, group='service:mdns')
+        self.handler = handler.RequestHandler(self.storage, self.mock_tg)
+
+        domain = self.create_domain(name='example.com.')
+        recordset = self.create_recordset(
+            domain, name='mail.example.com.', type='A')
+        self.create_record(domain, recordset, data='192.0.2.1')
+
+        return self.storage.get_domain(self.context, domain.id)
+
+    def test_dispatch_opcode_query_zone_tree(self):
+        self._zone_tree_setup()
+
+        response = self._zone_tree_query('mail.example.com.', 'A')
+
+        self.assertEqual(dns.rcode.NOERROR, response.rcode())
+        self.assertTrue(response.flags & dns.flags.AA)
+        self.assertEqual(['mail.example.com. 3600 IN A 192.0.2.1'],
+                         [rrset.to_text() for rrset in response.answer])
+
+        # The zone is now held in memory, storage is no longer consulted
+        with mock.patch.object(self.storage, 'find_domain') as find_domain, \
+                mock.patch.object(self.storage, 'find_recordset') as find_rs:
+            response = self._zone_tree_query('mail.example.com.', 'A')
+
+            self.assertFalse(find_domain.called)
+            self.assertFalse(find_rs.called)
+
+        self.assertEqual(['mail.example.com. 3600 IN A 192.0.2.1'],
+                         [rrset.to_text() for rrset in response.answer])
+
+    def test_dispatch_opcode_query_zone_tree_nodata(self):
+        domain = self._zone_tree_setup()
+
+        response = self._zone_tree_query('mail.example.com.', 'MX')
+
+        self.assertEqual(dns.rcode.NOERROR, response.rcode())
+        self.assertTrue(response.flags & dns.flags.AA)
+        self.assertEqual([], response.answer)
+        self.assertEqual(1, len(response.authority))
+        self.assertEqual(dns.rdatatype.SOA, response.authority[0].rdtype)
+        self.assertEqual(domain.serial, response.authority[0][0].serial)
+
+    def test_dispatch_opcode_query_zone_tree_nxdomain(self):
+        self._zone_tree_setup()
+
+        response = self._zone_tree_query('missing.example.com.', 'A')
+
+        self.assertEqual(dns.rcode.NXDOMAIN, response.rcode())
+        self.assertTrue(response.flags & dns.flags.AA)
+        self.assertEqual([], response.answer)
+        self.assertEqual(dns.rdatatype.SOA, response.authority[0].rdtype)
+
+    def test_dispatch_opcode_query_zone_tree_not_hosted(self):
+        self._zone_tree_setup()
+
+        # Every enclosing name is looked for in a single query
+        with mock.patch.object(self.storage, 'find_domains',
+                               wraps=self.storage.find_domains) as find:
+            response = self._zone_tree_query('a.b.mail.example.org.', 'A')
+
+            find.assert_called_once_with(mock.ANY, {'name': [
+                'a.b.mail.example.org.', 'b.mail.example.org.',
+                'mail.example.org.', 'example.org.', 'org.']})
+
+        self.assertEqual(dns.rcode.REFUSED, response.rcode())
+
+    def test_dispatch_opcode_query_zone_tree_closest(self):
+        self._zone_tree_setup()
+
+        child = self.create_domain(name='sub.example.com.')
+        recordset = self.create_recordset(
+            child, name='www.sub.example.com.', type='A')
+        self.create_record(child, recordset, data='192.0.2.3')
+
+        # The deepest of the enclosing hosted zones is loaded
+        response = self._zone_tree_query('www.sub.example.com.', 'A')
+        self.assertEqual(['www.sub.example.com. 3600 IN A 192.0.2.3'],
+                         [rrset.to_text() for rrset in response.answer])
+
+    def test_dispatch_opcode_query_zone_tree_serial_change(self):
+        domain = self._zone_tree_setup()
+
+        response = self._zone_tree_query('example.com.', 'SOA')
+        self.assertEqual(domain.serial, response.answer[0][0].serial)
+
+        recordset = self.create_recordset(
+            domain, name='www.example.com.', type='A')
+        self.create_record(domain, recordset, data='192.0.2.2')
+        domain = self.storage.get_domain(self.context, domain.id)
+
+        # SOA queries always revalidate the serial held in memory
+        response = self._zone_tree_query('example.com.', 'SOA')
+        self.assertEqual(domain.serial, response.answer[0][0].serial)
+
+        response = self._zone_tree_query('www.example.com.', 'A')
+        self.assertEqual(['www.example.com. 3600 IN A 192.0.2.2'],
+                         [rrset.to_text() for rrset in response.answer])
+
+    def test_dispatch_opcode_query_zone_tree_referral(self):
+        domain = self._zone_tree_setup()
+
+        recordset = self.create_recordset(
+            domain, name='deleg.example.com.', type='NS')
+        self.create_record(domain, recordset, data='ns.deleg.example.com.')
+        recordset = self.create_recordset(
+            domain, name='ns.deleg.example.com.', type='A')
+        self.create_record(domain, recordset, data='192.0.2.53')
+
+        response = self._zone_tree_query('www.deleg.example.com.', 'A')
+
+        self.assertEqual(dns.rcode.NOERROR, response.rcode())
+        self.assertFalse(response.flags & dns.flags.AA)
+        self.assertEqual([], response.answer)
+        self.assertEqual(
+            ['deleg.example.com. 3600 IN NS ns.deleg.example.com.'],
+            [rrset.to_text() for rrset in response.authority])
+        self.assertEqual(
+            ['ns.deleg.example.com. 3600 IN A 192.0.2.53'],
+            [rrset.to_text() for rrset in response.additional])
+
+    def test_dispatch_opcode_query_zone_tree_child_created(self):
+        self._zone_tree_setup()
+        self._zone_tree_query('mail.example.com.', 'A')
+
+        child = self.create_domain(name='sub.example.com.')
+        recordset = self.create_recordset(
+            child, name='www.sub.example.com.', type='A')
+        self.create_record(child, recordset, data='192.0.2.3')
+
+        # The parent is dropped as the child is created, and loaded again
+        # with a cut for it
+        self.handler.zone_tree.info(
+            self.context, 'central', 'dns.domain.create',
+            {'name': 'sub.example.com.'}, {})
+
+        response = self._zone_tree_query('www.sub.example.com.', 'A')
+        self.assertEqual(['www.sub.example.com. 3600 IN A 192.0.2.3'],
+                         [rrset.to_text() for rrset in response.answer])
+
+    def test_dispatch_opcode_query_zone_tree_tsig_scope_pool(self):
+        self._zone_tree_setup()
+
+        response = self._zone_tree_query(
+            'mail.example.com.', 'A', self.tsigkey_pool_default)
+        self.assertEqual(dns.rcode.NOERROR, response.rcode())
+
+        response = self._zone_tree_query(
+            'mail.example.com.', 'A', self.tsigkey_pool_unknown)
+        self.assertEqual(dns.rcode.REFUSED, response.rcode())
+
+    def test_dispatch_opcode_query_zone_filter(self):
+        zone_filter = zonefilter.ZoneFilter(self.storage)
+        self.handler = handler.RequestHandler(
+            self.storage, self.mock_tg, zone_filter)
+
+        domain = self.create_domain(name='example.com.')
+        recordset = self.create_recordset(
+            domain, name='mail.example.com.', type='A')
+        self.create_record(domain, recordset, data='192.0.2.1')
+
+        zone_filter.rebuild()
+
+        response = self._zone_tree_query('mail.example.com.', 'A')
+        self.assertEqual(dns.rcode.NOERROR, response.rcode())
+
+        # Names outside of the hosted zones are refused without a lookup
+        with mock.patch.object(self.storage, 'find_recordset') as find, \
+                mock.patch.object(self.storage, 'find_domain') as find_one, \
+                mock.patch.object(self.storage, 'find_domains') as find_all:
+            for rdtype in ('A', 'AXFR'):
+                response = self._zone_tree_query('mail.example.org.', rdtype)
+                self.assertEqual(dns.rcode.REFUSED, response.rcode())
+
+            self.assertFalse(find.called)
+            self.assertFalse(find_one.called)
+            self.assertFalse(find_all.called)
+
+        self.assertEqual(2, zone_filter.stats()['zone_filter_rejects'])
+
+    def _fast_path_setup(self):
+        domain = self._zone_tree_setup()
+
+        self.application = dnsutils.SerializationMiddleware(self.handler)
+        self.fast_path = handler.FastPathMiddleware(
+            self.application, self.handler)
+
+        return domain
+
+    def _fast_path_query(self, query, protocol='udp'):
+        request = {'payload': query.to_wire(), 'addr': self.addr,
+                   'protocol': protocol}
+
+        # The same query through the full path
+        expected = next(self.application(dict(request)))
+
+        return next(iter(self.fast_path(request))), expected
+
+    def test_fast_path(self):
+        self._fast_path_setup()
+
+        queries = [
+            dns.message.make_query('mail.example.com.', 'A'),
+            dns.message.make_query('MAIL.Example.com.', 'A'),
+            dns.message.make_query('mail.example.com.', 'A', use_edns=0,
+                                   payload=4096),
+            dns.message.make_query('mail.example.com.', 'MX'),
+            dns.message.make_query('missing.example.com.', 'A'),
+            dns.message.make_query('example.com.', 'SOA'),
+        ]
+
+        for query in queries:
+            # Load the zone into the tree, and render the response once
+            self._fast_path_query(query)
+
+            hits = self.fast_path.hits
+            response, expected = self._fast_path_query(query)
+
+            self.assertEqual(hits + 1, self.fast_path.hits)
+            self.assertEqual(expected, response)
+
+        self.assertEqual(0, self.fast_path.stats()['fast_path_misses'])
+
+    def test_fast_path_rdtype_case(self):
+        domain = self._fast_path_setup()
+
+        recordset = self.create_recordset(
+            domain, name='mail.example.com.', type='SPF')
+        self.create_record(domain, recordset, data='"v=spf1 -all"')
+
+        # Type 67 differs from SPF (99) only by the 0x20 bit a name's case
+        # is folded with, their responses must not be confused
+        for rdtype in (67, dns.rdatatype.SPF):
+            query = dns.message.make_query('mail.example.com.', rdtype)
+            self._fast_path_query(query)
+
+            response, expected = self._fast_path_query(query)
+            self.assertEqual(expected, response)
+
+        self.assertEqual(['mail.example.com. 3600 IN SPF "v=spf1 -all"'],
+                         [rrset.to_text() for rrset in
+                          dns.message.from_wire(response).answer])
+
+    def test_fast_path_fallback(self):
+        self._fast_path_setup()
+
+        not_loaded = dns.message.make_query('mail.example.org.', 'A')
+
+        notify = dns.message.make_query('example.com.', 'SOA')
+        notify.set_opcode(dns.opcode.NOTIFY)
+
+        axfr = dns.message.make_query('example.com.', 'AXFR')
+
+        nsid = dns.message.make_query('mail.example.com.', 'A', use_edns=0)
+        nsid.options = [dns.edns.GenericOption(3, b'')]
+
+        for query in (not_loaded, notify, axfr, nsid):
+            response, expected = self._fast_path_query(query)
+            self.assertEqual(expected, response)
+
+        self.assertEqual(0, self.fast_path.hits)
+        self.assertEqual(4, self.fast_path.misses)
+
+    def test_fast_path_serial_change(self):
+        domain = self._fast_path_setup()
+
+        query = dns.message.make_query('www.example.com.', 'A')
+        self._fast_path_query(query)
+
+        recordset = self.create_recordset(
+            domain, name='www.example.com.', type='A')
+        self.create_record(domain, recordset, data='192.0.2.2')
+
+        # The SOA query revalidates the zone, dropping its responses
+        self._fast_path_query(dns.message.make_query('example.com.', 'SOA'))
+
+        response, expected = self._fast_path_query(query)
+        self.assertEqual(expected, response)
+        self.assertEqual(['www.example.com. 3600 IN A 192.0.2.2'],
+                         [rrset.to_text() for rrset in
+                          dns.message.from_wire(response).answer])
@@ -0,0 +1,201 @@
+# Copyright 2015 Hewlett-Packard Development Company, L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+"""
+Load test of a running mdns service.
+
+Starts the mdns service against the sqlite storage used by the test suite,
+seeded with ZONES zones of RECORDS A records each, and drives it over the
+loopback interface with a mix of UDP SOA queries, TCP AXFRs and NOTIFYs
+sent by concurrent dnspython clients. Reports QPS, p50/p99 latency per
+request type, AXFR throughput and the peak RSS of the process.
+
+The request mix is drawn from a seeded random generator, so runs with the
+same settings send the same requests. It is skipped unless
+DESIGNATE_BENCHMARK is set in the environment, settings are read from the
+environment too:
+
+    DESIGNATE_BENCHMARK=1 \\
+    DESIGNATE_BENCHMARK_ZONES=10 \\
+    DESIGNATE_BENCHMARK_RECORDS=100 \\
+    DESIGNATE_BENCHMARK_REQUESTS=2000 \\
+    DESIGNATE_BENCHMARK_CONCURRENCY=20 \\
+    DESIGNATE_BENCHMARK_MIX=soa:90,axfr:5,notify:5 \\
+    DESIGNATE_BENCHMARK_SEED=0 \\
+        python -m testtools.run \\
+            designate.tests.test_mdns.test_load_benchmark
+"""
+from __future__ import print_function
+
+import collections
+import os
+import random
+import resource
+import time
+
+import dns.flags
+import dns.message
+import dns.opcode
+import dns.query
+import dns.rdatatype
+import eventlet
+import testtools
+
+from designate.tests.test_mdns import MdnsTestCase
+
+
+def _setting(name, default):
+    return os.environ.get('DESIGNATE_BENCHMARK_%s' % name, default)
+
+
+def _percentile(samples, percent):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    index = int(round((len(samples) - 1) * percent / 100.0))
+    return samples[index]
+
+
+@testtools.skipUnless(os.environ.get('DESIGNATE_BENCHMARK'),
+                      'DESIGNATE_BENCHMARK is not set')
+class MdnsLoadBenchmark(MdnsTestCase):
+    def setUp(self):
+        super(MdnsLoadBenchmark, self).setUp()
+
+        self.zones = int(_setting('ZONES', 10))
+        self.records = int(_setting('RECORDS', 100))
+        self.requests = int(_setting('REQUESTS', 2000))
+        self.concurrency = int(_setting('CONCURRENCY', 20))
+        self.seed = int(_setting('SEED', 0))
+        self.mix = [(kind, int(weight)) for kind, weight in (
+            item.split(':') for item in
+            _setting('MIX', 'soa:90,axfr:5,notify:5').split(','))]
+
+        self.config(quota_domains=self.zones)
+        self.config(quota_domain_recordsets=self.records + 2)
+        self.config(quota_domain_records=self.records + 2)
+
+        self.domains = self._seed()
+
+        # Use a random port for MDNS
+        self.config(port=0, group='service:mdns')
+        self.service = self.start_service('mdns')
+
+        self.udp_port = self.service._dns_sock_udp.getsockname()[1]
+        self.tcp_port = self.service._dns_sock_tcp.getsockname()[1]
+
+    def _seed(self):
+        domains = []
+
+        for i in range(self.zones):
+            domain = self.create_domain(name='zone%d.example.com.' % i)
+
+            for j in range(self.records):
+                recordset = self.create_recordset(
+                    domain, increment_serial=False,
+                    name='host%d.%s' % (j, domain.name), type='A')
+                self.create_record(
+                    domain, recordset, increment_serial=False,
+                    data='10.0.%d.%d' % (j >> 8 & 255, j & 255))
+
+            domains.append(domain.name)
+
+        return domains
+
+    def _schedule(self):
+        generator = random.Random(self.seed)
+        kinds = [kind for kind, weight in self.mix for i in range(weight)]
+
+        return [(generator.choice(kinds), generator.choice(self.domains))
+                for i in range(self.requests)]
+
+    def _soa(self, zone):
+        query = dns.message.make_query(zone, dns.rdatatype.SOA)
+        dns.query.udp(query, '127.0.0.1', port=self.udp_port, timeout=5)
+        return 0
+
+    def _axfr(self, zone):
+        size = 0
+        for message in dns.query.xfr('127.0.0.1', zone, port=self.tcp_port,
+                                     timeout=5, relativize=False):
+            size += len(message.to_wire())
+        return size
+
+    def _notify(self, zone):
+        notify = dns.message.make_query(zone, dns.rdatatype.SOA)
+        notify.set_opcode(dns.opcode.NOTIFY)
+        notify.flags |= dns.flags.AA
+        dns.query.udp(notify, '127.0.0.1', port=self.udp_port, timeout=5)
+        return 0
+
+    def _run(self, schedule):
+        latencies = collections.defaultdict(list)
+        transferred = collections.Counter()
+        errors = collections.Counter()
+
+        def _request(item):
+            kind, zone = item
+            start = time.time()
+
+            try:
+                size = getattr(self, '_%s' % kind)(zone)
+            except Exception:
+                errors[kind] += 1
+                return
+
+            latencies[kind].append(time.time() - start)
+            transferred[kind] += size
+
+        pool = eventlet.GreenPool(self.concurrency)
+        start = time.time()
+        for item in schedule:
+            pool.spawn_n(_request, item)
+        pool.waitall()
+
+        return time.time() - start, latencies, transferred, errors
+
+    def test_load(self):
+        elapsed, latencies, transferred, errors = self._run(self._schedule())
+
+        print('mdns load: %(zones)d zones x %(records)d records, '
+              '%(requests)d requests, concurrency %(concurrency)d, '
+              'seed %(seed)d' %
+              {'zones': self.zones, 'records': self.records,
+               'requests': self.requests, 'concurrency': self.concurrency,
+               'seed': self.seed})
+
+        completed = sum(len(samples) for samples in latencies.values())
+        print('  total: %(qps).1f qps over %(elapsed).2fs' %
+              {'qps': completed / max(elapsed, 1e-6), 'elapsed': elapsed})
+
+        for kind, weight in self.mix:
+            samples = latencies[kind]
+            print('  %(kind)s: %(count)d ok, %(errors)d errors, '
+                  'p50 %(p50).2fms, p99 %(p99).2fms' %
+                  {'kind': kind, 'count': len(samples),
+                   'errors': errors[kind],
+                   'p50': _percentile(samples, 50) * 1000,
+                   'p99': _percentile(samples, 99) * 1000})
+
+        if latencies['axfr']:
+            print('  axfr: %.2f MB/s per transfer' % (
+                transferred['axfr'] / max(sum(latencies['axfr']), 1e-6) /
+                (1024 * 1024)))
+
+        # ru_maxrss is reported in kilobytes on Linux
+        print('  peak rss: %.1f MB' % (
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0))
+
+        print('  service stats: %s' % self.service.dns_stats())
+
+        self.assertTrue(completed > 0)
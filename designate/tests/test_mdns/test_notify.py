@@ -18,9 +18,11 @@ import dns
 import dns.message
 import dns.query
 import dns.exception
+import eventlet
 import mock
 from mock import patch
 
+from designate import dnsutils
 from designate.tests.test_mdns import MdnsTestCase
 from designate.mdns import notify
 from designate import objects
@@ -194,7 +196,8 @@ class MdnsNotifyTest(MdnsTestCase):
         self.assertEqual(retries, 0)
 
     @patch('dns.query.udp', side_effect=dns.exception.Timeout)
-    @patch('dns.query.tcp', side_effect=dns.exception.Timeout)
+    @patch.object(dnsutils.TCPConnectionPool, 'query',
+                  side_effect=dns.exception.Timeout)
     def test_send_dns_message_all_tcp(self, tcp, udp):
         self.config(
             all_tcp=True,
@@ -210,3 +213,48 @@ class MdnsNotifyTest(MdnsTestCase):
             self.nameserver.port, 0, 0, 2, 0)
         assert not udp.called
         assert tcp.called
+
+    def test_notify_zone_changed_coalesced(self):
+        self.config(notify_coalesce_window=0.1, group='service:mdns')
+        context = self.get_context()
+
+        domains = []
+        for serial in range(100, 105):
+            domain = objects.Domain.from_dict(self.test_domain)
+            domain.serial = serial
+            domains.append(domain)
+
+        with patch.object(self.notify, '_make_and_send_dns_message',
+                          return_value=('response', 1)) as send:
+            pool = eventlet.GreenPool()
+            results = [pool.spawn(
+                self.notify.notify_zone_changed, context, changed,
+                self.nameserver.host, self.nameserver.port, 0, 0, 2, 0)
+                for changed in domains]
+            pool.waitall()
+
+        # A single NOTIFY, sent once the window closed, for the latest
+        # serial
+        send.assert_called_once_with(
+            domains[-1], self.nameserver.host, self.nameserver.port, 0, 0,
+            2, notify=True)
+        self.assertEqual([('response', 1)] + [(None, 0)] * 4,
+                         [result.wait() for result in results])
+        self.assertEqual({'notify_coalesced': 4, 'notify_sent': 1,
+                          'notify_pending': 0}, self.notify.stats())
+
+    def test_notify_zone_changed_other_targets(self):
+        self.config(notify_coalesce_window=0.1, group='service:mdns')
+        context = self.get_context()
+        domain = objects.Domain.from_dict(self.test_domain)
+
+        with patch.object(self.notify, '_make_and_send_dns_message',
+                          return_value=('response', 1)) as send:
+            pool = eventlet.GreenPool()
+            for port in (53, 54):
+                pool.spawn(self.notify.notify_zone_changed, context, domain,
+                           self.nameserver.host, port, 0, 0, 2, 0)
+            pool.waitall()
+
+        self.assertEqual(2, send.call_count)
+        self.assertEqual(0, self.notify.notifies_coalesced)
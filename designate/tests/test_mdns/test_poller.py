@@ -0,0 +1,182 @@
+# Copyright 2015 Hewlett-Packard Development Company, L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import socket
+
+import dns.flags
+import dns.message
+import dns.rrset
+import eventlet
+import mock
+
+from designate import objects
+from designate.tests.test_mdns import MdnsTestCase
+from designate.mdns import poller
+
+
+class SerialPollerTest(MdnsTestCase):
+    def setUp(self):
+        super(SerialPollerTest, self).setUp()
+
+        # A nameserver answering SOA queries with self.serials, one per query
+        self.serials = []
+        self.queries = []
+        self.nameserver_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.nameserver_sock.bind(('127.0.0.1', 0))
+        self.nameserver_thread = eventlet.spawn(self._nameserver)
+        self.addCleanup(self.nameserver_thread.kill)
+        self.addCleanup(self.nameserver_sock.close)
+
+        self.nameserver = objects.PoolNameserver.from_dict({
+            'id': 'f278782a-07dc-4502-9177-b5d85c5f7c7e',
+            'host': '127.0.0.1',
+            'port': self.nameserver_sock.getsockname()[1],
+        })
+
+        self.report = mock.Mock()
+        self.poller = poller.SerialPoller(
+            self.report, sockets=2, batch_size=10, batch_interval=0.1)
+        self.poller.start()
+        self.addCleanup(self.poller.stop)
+
+        self.context = self.get_context()
+
+    def _nameserver(self):
+        while True:
+            payload, addr = self.nameserver_sock.recvfrom(65535)
+            query = dns.message.from_wire(payload)
+            self.queries.append(query)
+
+            if not self.serials:
+                # Time the query out
+                continue
+
+            response = dns.message.make_response(query)
+            response.flags |= dns.flags.AA
+            response.answer.append(dns.rrset.from_text(
+                query.question[0].name, 3600, 'IN', 'SOA',
+                'ns1.example.org. example.example.com. %d 3600 600 86400 '
+                '3600' % self.serials.pop(0)))
+
+            self.nameserver_sock.sendto(response.to_wire(), addr)
+
+    def _domain(self, name='example.com.', serial=100):
+        return objects.Domain.from_dict({
+            'id': '4f6a9a1c-3b56-4de6-8e2f-0ad8e6c3e0a1',
+            'name': name,
+            'serial': serial,
+            'pool_id': '794ccc2c-d751-44fe-b57f-8894c9f5c842',
+        })
+
+    def _results(self):
+        return [result[1:] for args in self.report.call_args_list
+                for result in args[0][0]]
+
+    def test_poll_success(self):
+        domain = self._domain()
+        self.serials = [100]
+
+        self.poller.poll(self.context, domain, self.nameserver, 1, 0.1, 3, 0)
+        eventlet.sleep(0.3)
+
+        self.assertEqual([(domain, self.nameserver, 'SUCCESS', 100)],
+                         self._results())
+        self.assertEqual(1, len(self.queries))
+
+    def test_poll_retries_lower_serial(self):
+        domain = self._domain()
+        self.serials = [99, 99, 100]
+
+        self.poller.poll(self.context, domain, self.nameserver, 1, 0.05, 5, 0)
+        eventlet.sleep(0.5)
+
+        self.assertEqual([(domain, self.nameserver, 'SUCCESS', 100)],
+                         self._results())
+        self.assertEqual(3, len(self.queries))
+
+    def test_poll_gives_up(self):
+        domain = self._domain()
+        self.serials = [99, 99]
+
+        self.poller.poll(self.context, domain, self.nameserver, 1, 0.05, 2, 0)
+        eventlet.sleep(0.5)
+
+        self.assertEqual([(domain, self.nameserver, 'ERROR', 99)],
+                         self._results())
+
+    def test_poll_timeout(self):
+        domain = self._domain()
+
+        self.poller.poll(self.context, domain, self.nameserver, 0.05, 0.05,
+                         2, 0)
+        eventlet.sleep(0.5)
+
+        self.assertEqual([(domain, self.nameserver, 'ERROR', None)],
+                         self._results())
+        self.assertEqual(2, self.poller.timeouts)
+
+    def test_poll_delay(self):
+        domain = self._domain()
+        self.serials = [100]
+
+        self.poller.poll(self.context, domain, self.nameserver, 1, 0.1, 3,
+                         0.2)
+        eventlet.sleep(0.1)
+        self.assertEqual(0, len(self.queries))
+
+        eventlet.sleep(0.3)
+        self.assertEqual(1, len(self.queries))
+
+    def test_poll_batches_results(self):
+        self.serials = [100] * 25
+
+        for i in range(25):
+            self.poller.poll(self.context,
+                             self._domain('zone%d.example.com.' % i),
+                             self.nameserver, 1, 0.1, 3, 0)
+        eventlet.sleep(0.5)
+
+        # Two full batches, and the rest once the batch interval passed
+        self.assertEqual([10, 10, 5], [len(args[0][0]) for args in
+                                       self.report.call_args_list])
+        self.assertEqual(25, len(set(self.queries[i].question[0].name
+                                     for i in range(25))))
+
+    def test_poll_tcp(self):
+        domain = self._domain()
+
+        def _query(query, host, port, timeout):
+            response = dns.message.make_response(query)
+            response.flags |= dns.flags.AA
+            response.answer.append(dns.rrset.from_text(
+                query.question[0].name, 3600, 'IN', 'SOA',
+                'ns1.example.org. example.example.com. 100 3600 600 86400 '
+                '3600'))
+            return response
+
+        tcp = mock.Mock()
+        tcp.query.side_effect = _query
+
+        tcp_poller = poller.SerialPoller(
+            self.report, tcp=tcp, batch_size=10, batch_interval=0.1)
+        tcp_poller.start()
+        self.addCleanup(tcp_poller.stop)
+
+        tcp_poller.poll(self.context, domain, self.nameserver, 1, 0.1, 3, 0)
+        eventlet.sleep(0.3)
+
+        self.assertEqual([(domain, self.nameserver, 'SUCCESS', 100)],
+                         self._results())
+        self.assertEqual(1, tcp.query.call_count)
+        # Nothing was sent over UDP
+        self.assertEqual(0, len(self.queries))
@@ -14,10 +14,15 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 import binascii
+import os
 import socket
+import struct
+import time
 
 import dns
 import dns.message
+import dns.rcode
+import eventlet.queue
 import mock
 
 from designate.tests.test_mdns import MdnsTestCase
@@ -63,3 +68,162 @@ class MdnsServiceTest(MdnsTestCase):
         self.service._dns_handle(self.addr, binascii.a2b_hex(payload))
         sendto_mock.assert_called_once_with(
             binascii.a2b_hex(expected_response), self.addr)
+
+    @mock.patch.object(socket.socket, 'sendto', new_callable=mock.MagicMock)
+    def test_handle_udp_payload_stats(self, sendto_mock):
+        # DNS packet with IQUERY opcode
+        payload = "271209000001000000000000076578616d706c6503636f6d0000010001"
+
+        self.service._dns_handle(self.addr, binascii.a2b_hex(payload))
+
+        stats = self.service.dns_stats()
+        self.assertEqual(1, stats['responses'])
+        self.assertEqual(0, stats['in_flight'])
+        self.assertEqual(os.getpid(), stats['pid'])
+
+    def test_stop_waits_for_in_flight_requests(self):
+        self.config(graceful_shutdown_timeout=5, group='service:mdns')
+
+        # Pretend a request is being handled, which completes while the
+        # service is draining.
+        self.service._dns_in_flight = 1
+
+        def _complete(seconds):
+            self.service._dns_in_flight = 0
+
+        with mock.patch('eventlet.sleep', side_effect=_complete) as sleep:
+            self.service.stop()
+
+        self.assertTrue(sleep.called)
+        self.assertEqual(0, self.service.dns_stats()['in_flight'])
+
+    @mock.patch('designate.rpc.get_listener')
+    def test_notification_pool_per_process(self, get_listener):
+        # Every worker keeps its own zone filter and TSIG key cache, so
+        # each listens for notifications in a pool of its own
+        service = self.start_service('mdns')
+
+        pool = get_listener.call_args[1]['pool']
+        self.assertEqual('mdns-notifications.%s.%d' % (
+            service._host, os.getpid()), pool)
+
+    def _fill_queue(self):
+        # Replace the handler queue with one that is already full
+        self.service._dns_queue = eventlet.queue.LightQueue(1)
+        self.service._dns_queue.put_nowait(None)
+
+    @mock.patch.object(socket.socket, 'sendto', new_callable=mock.MagicMock)
+    def test_dispatch_overload_refuse(self, sendto_mock):
+        self.config(overload_policy='refuse', group='service:mdns')
+        self._fill_queue()
+
+        # DNS packet with QUERY opcode for example.com. IN A
+        payload = "271201000001000000000000076578616d706c6503636f6d0000010001"
+
+        self.service._dns_dispatch(self.addr, binascii.a2b_hex(payload))
+
+        self.assertEqual(1, sendto_mock.call_count)
+        response = dns.message.from_wire(sendto_mock.call_args[0][0])
+        self.assertEqual(10002, response.id)
+        self.assertEqual(dns.rcode.REFUSED, response.rcode())
+
+        stats = self.service.dns_stats()
+        self.assertEqual(1, stats['dropped'])
+        self.assertEqual(1, stats['refused'])
+
+    @mock.patch.object(socket.socket, 'sendto', new_callable=mock.MagicMock)
+    def test_dispatch_overload_drop(self, sendto_mock):
+        self.config(overload_policy='drop', group='service:mdns')
+        self._fill_queue()
+
+        payload = "271201000001000000000000076578616d706c6503636f6d0000010001"
+
+        self.service._dns_dispatch(self.addr, binascii.a2b_hex(payload))
+
+        self.assertFalse(sendto_mock.called)
+        self.assertEqual(1, self.service.dns_stats()['dropped'])
+
+    def test_handle_queue_records_wait(self):
+        self.service._dns_queue = eventlet.queue.LightQueue(2)
+        for i in range(2):
+            self.service._dns_queue.put_nowait(
+                (time.time() - 1, self.addr, b'payload', None))
+
+        # Break out of the handler loop on the second request
+        with mock.patch.object(self.service, '_dns_handle',
+                               side_effect=[None, StopIteration]) as handle:
+            self.assertRaises(StopIteration, self.service._dns_handle_queue)
+
+        self.assertEqual(2, handle.call_count)
+        self.assertTrue(self.service.dns_stats()['queue_wait_avg'] >= 1)
+
+    def _tcp_query(self, sock, query_id):
+        # DNS packet with IQUERY opcode, answered with REFUSED
+        payload = bytearray(binascii.a2b_hex(
+            "271209000001000000000000076578616d706c6503636f6d0000010001"))
+        payload[0:2] = struct.pack('!H', query_id)
+
+        sock.sendall(struct.pack('!H', len(payload)) + bytes(payload))
+
+    def _tcp_response(self, sock):
+        def _recv(length):
+            data = b''
+            while len(data) < length:
+                chunk = sock.recv(length - len(data))
+                if not chunk:
+                    raise EOFError()
+                data += chunk
+            return data
+
+        (length, ) = struct.unpack('!H', _recv(2))
+        return dns.message.from_wire(_recv(length))
+
+    def test_handle_tcp_pipelined_queries(self):
+        port = self.service._dns_sock_tcp.getsockname()[1]
+        sock = socket.create_connection(('127.0.0.1', port))
+        self.addCleanup(sock.close)
+
+        # Send several queries before reading any of the responses
+        for query_id in (1, 2, 3):
+            self._tcp_query(sock, query_id)
+
+        responses = [self._tcp_response(sock) for i in range(3)]
+
+        # Responses may arrive in any order
+        self.assertEqual([1, 2, 3], sorted(r.id for r in responses))
+        for response in responses:
+            self.assertEqual(dns.rcode.REFUSED, response.rcode())
+
+        # The connection stays open for further queries
+        self._tcp_query(sock, 4)
+        self.assertEqual(4, self._tcp_response(sock).id)
+
+    def test_handle_tcp_idle_timeout(self):
+        self.config(tcp_idle_timeout=0.1, group='service:mdns')
+
+        port = self.service._dns_sock_tcp.getsockname()[1]
+        sock = socket.create_connection(('127.0.0.1', port))
+        self.addCleanup(sock.close)
+
+        # The server closes the connection once it has been idle too long
+        sock.settimeout(5)
+        self.assertEqual(b'', sock.recv(1))
+
+    def test_handle_tcp_max_connections(self):
+        self.config(tcp_max_connections=1, group='service:mdns')
+
+        port = self.service._dns_sock_tcp.getsockname()[1]
+        first = socket.create_connection(('127.0.0.1', port))
+        self.addCleanup(first.close)
+
+        # Make sure the first connection has been accepted
+        self._tcp_query(first, 1)
+        self.assertEqual(1, self._tcp_response(first).id)
+
+        second = socket.create_connection(('127.0.0.1', port))
+        self.addCleanup(second.close)
+
+        # The second connection is closed straight away
+        second.settimeout(5)
+        self.assertEqual(b'', second.recv(1))
+        self.assertEqual(1, self.service.dns_stats()['tcp_rejected'])
@@ -0,0 +1,182 @@
+# Copyright 2015 Hewlett-Packard Development Company, L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import datetime
+
+import dns.name
+import dns.rdata
+import dns.rdataclass
+import dns.rdatatype
+import dns.zone
+import mock
+
+from designate import dnsutils
+from designate import exceptions
+from designate import objects
+from designate.mdns import xfr
+from designate.tests.test_mdns import MdnsTestCase
+
+SOA = 'ns1.example.org. example.example.com. %d 3600 600 86400 3600'
+
+# The stored zone, as find_recordsets_axfr rows
+STORED = [
+    ('example.com.', 'NS', 3600, 'ns1.example.org.'),
+    ('example.com.', 'SOA', 3600, SOA % 100),
+    ('mail.example.com.', 'A', 3600, '192.0.2.2'),
+    ('www.example.com.', 'A', 3600, '192.0.2.1'),
+    ('www.example.com.', 'A', 3600, '192.0.2.3'),
+]
+
+
+def _rdata(rdtype, text):
+    return dns.rdata.from_text(dns.rdataclass.IN, rdtype, text)
+
+
+class MdnsXfrTest(MdnsTestCase):
+    def setUp(self):
+        super(MdnsXfrTest, self).setUp()
+
+        self.storage = mock.Mock()
+        self.storage.find_recordsets_axfr.side_effect = self._find
+
+        self.central_api = mock.Mock()
+
+        self.endpoint = xfr.XfrEndpoint(mock.Mock())
+        self.endpoint.storage = self.storage
+        patcher = mock.patch.object(xfr.XfrEndpoint, 'central_api',
+                                    new_callable=mock.PropertyMock,
+                                    return_value=self.central_api)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.context = self.get_context()
+
+    def _find(self, context, criterion):
+        return iter([row for row in STORED
+                     if row[0] == criterion.get('name', row[0]) and
+                     row[1] == criterion.get('type', row[1])])
+
+    def _domain(self, transferred_at=None):
+        domain = objects.Domain.from_dict({
+            'id': '4f6a9a1c-3b56-4de6-8e2f-0ad8e6c3e0a1',
+            'name': 'example.com.',
+            'serial': 100,
+            'transferred_at': transferred_at,
+        })
+        domain.masters = objects.DomainMasterList()
+        domain.masters.append(
+            objects.DomainMaster(host='192.0.2.53', port=53))
+        return domain
+
+    def _applied(self):
+        args = self.central_api.apply_domain_changes.call_args[0]
+        return args[2], args[3], args[4]
+
+    @mock.patch.object(dnsutils, 'do_ixfr')
+    @mock.patch.object(dnsutils, 'do_axfr')
+    def test_domain_sync_axfr(self, do_axfr, do_ixfr):
+        do_axfr.return_value = dns.zone.from_text(
+            '\n'.join([
+                'example.com. 3600 IN SOA %s' % SOA % 101,
+                'example.com. 3600 IN NS ns1.example.org.',
+                'www.example.com. 3600 IN A 192.0.2.3',
+                'www.example.com. 3600 IN A 192.0.2.1',
+                'ftp.example.com. 300 IN A 192.0.2.4',
+            ]), origin='example.com.', relativize=False)
+
+        # A domain which has never been transferred isn't sent an IXFR
+        self.endpoint.domain_sync(self.context, self._domain())
+        self.assertFalse(do_ixfr.called)
+
+        values, recordsets, deletions = self._applied()
+
+        self.assertEqual(101, values['serial'])
+        self.assertEqual('example@example.com', values['email'])
+
+        # Only the RecordSets which differ are sent, www's records being
+        # unchanged in a different order
+        self.assertEqual([
+            {'name': 'example.com.', 'type': 'SOA', 'ttl': 3600,
+             'records': [SOA % 101]},
+            {'name': 'ftp.example.com.', 'type': 'A', 'ttl': 300,
+             'records': ['192.0.2.4']},
+        ], recordsets)
+        self.assertEqual([['mail.example.com.', 'A']], deletions)
+
+    @mock.patch.object(dnsutils, 'do_axfr')
+    @mock.patch.object(dnsutils, 'do_ixfr')
+    def test_domain_sync_ixfr(self, do_ixfr, do_axfr):
+        name = dns.name.from_text
+        soa = _rdata(dns.rdatatype.SOA, SOA % 102)
+        do_ixfr.return_value = ((3600, soa), [
+            ('DELETE', name('www.example.com.'), 3600,
+             _rdata(dns.rdatatype.A, '192.0.2.3')),
+            ('ADD', name('ftp.example.com.'), 300,
+             _rdata(dns.rdatatype.A, '192.0.2.4')),
+            ('DELETE', name('mail.example.com.'), 3600,
+             _rdata(dns.rdatatype.A, '192.0.2.2')),
+            ('DELETE', name('ftp.example.com.'), 300,
+             _rdata(dns.rdatatype.A, '192.0.2.4')),
+            ('ADD', name('ftp.example.com.'), 300,
+             _rdata(dns.rdatatype.A, '192.0.2.5')),
+        ])
+
+        domain = self._domain(datetime.datetime(2015, 1, 1))
+        self.endpoint.domain_sync(self.context, domain)
+
+        self.assertFalse(do_axfr.called)
+        self.assertEqual(100, do_ixfr.call_args[0][2])
+
+        values, recordsets, deletions = self._applied()
+
+        self.assertEqual(102, values['serial'])
+        self.assertEqual([
+            {'name': 'example.com.', 'type': 'SOA', 'ttl': 3600,
+             'records': [SOA % 102]},
+            {'name': 'ftp.example.com.', 'type': 'A', 'ttl': 300,
+             'records': ['192.0.2.5']},
+            {'name': 'www.example.com.', 'type': 'A', 'ttl': 3600,
+             'records': ['192.0.2.1']},
+        ], recordsets)
+        self.assertEqual([['mail.example.com.', 'A']], deletions)
+
+        # Only the RecordSets the changes touch were read from storage
+        self.assertFalse(any(
+            'name' not in call[0][1]
+            for call in self.storage.find_recordsets_axfr.call_args_list))
+
+    @mock.patch.object(dnsutils, 'do_axfr')
+    @mock.patch.object(dnsutils, 'do_ixfr')
+    def test_domain_sync_ixfr_fallback(self, do_ixfr, do_axfr):
+        do_axfr.return_value = dns.zone.from_text(
+            'example.com. 3600 IN SOA %s\n' % SOA % 101 +
+            'example.com. 3600 IN NS ns1.example.org.\n',
+            origin='example.com.', relativize=False)
+
+        domain = self._domain(datetime.datetime(2015, 1, 1))
+
+        # The masters sent the whole zone
+        do_ixfr.return_value = None
+        self.endpoint.domain_sync(self.context, domain)
+        self.assertEqual(1, do_axfr.call_count)
+
+        # The masters refused the IXFR
+        do_ixfr.side_effect = exceptions.XFRFailure
+        self.endpoint.domain_sync(self.context, domain)
+        self.assertEqual(2, do_axfr.call_count)
+
+    @mock.patch.object(dnsutils, 'do_axfr', side_effect=exceptions.XFRFailure)
+    def test_domain_sync_failure(self, do_axfr):
+        self.endpoint.domain_sync(self.context, self._domain())
+
+        self.assertFalse(self.central_api.apply_domain_changes.called)
@@ -0,0 +1,83 @@
+# Copyright 2015 Hewlett-Packard Development Company, L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+from designate.tests.test_mdns import MdnsTestCase
+from designate.mdns import xfrcache
+
+
+class AXFRCacheTest(MdnsTestCase):
+    def setUp(self):
+        super(AXFRCacheTest, self).setUp()
+        self.cache = xfrcache.AXFRCache(100)
+
+    def test_get_miss(self):
+        self.assertIsNone(self.cache.get('zone', 1, 'v'))
+        self.assertEqual(1, self.cache.misses)
+        self.assertEqual(0, self.cache.hits)
+
+    def test_store_and_get(self):
+        self.assertTrue(self.cache.store('zone', 1, 'v', [b'a' * 10]))
+
+        self.assertEqual([b'a' * 10], self.cache.get('zone', 1, 'v'))
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(10, self.cache.bytes)
+
+    def test_store_too_big(self):
+        self.assertFalse(self.cache.store('zone', 1, 'v', [b'a' * 101]))
+        self.assertEqual(0, self.cache.bytes)
+
+    def test_store_disabled(self):
+        cache = xfrcache.AXFRCache(0)
+
+        self.assertFalse(cache.enabled)
+        self.assertFalse(cache.store('zone', 1, 'v', [b'a']))
+
+    def test_new_serial_evicts_old_serial(self):
+        self.cache.store('zone', 1, 'v1', [b'a' * 10])
+        self.cache.store('zone', 1, 'v2', [b'a' * 10])
+        self.cache.store('zone', 2, 'v1', [b'b' * 10])
+
+        self.assertIsNone(self.cache.get('zone', 1, 'v1'))
+        self.assertIsNone(self.cache.get('zone', 1, 'v2'))
+        self.assertEqual([b'b' * 10], self.cache.get('zone', 2, 'v1'))
+        self.assertEqual(10, self.cache.bytes)
+        self.assertEqual(2, self.cache.evictions)
+
+    def test_lru_eviction(self):
+        self.cache.store('zone1', 1, 'v', [b'a' * 40])
+        self.cache.store('zone2', 1, 'v', [b'b' * 40])
+
+        # Touch zone1, making zone2 the least recently used
+        self.cache.get('zone1', 1, 'v')
+
+        self.cache.store('zone3', 1, 'v', [b'c' * 40])
+
+        self.assertIsNone(self.cache.get('zone2', 1, 'v'))
+        self.assertIsNotNone(self.cache.get('zone1', 1, 'v'))
+        self.assertIsNotNone(self.cache.get('zone3', 1, 'v'))
+        self.assertEqual(80, self.cache.bytes)
+
+    def test_invalidate(self):
+        self.cache.store('zone', 1, 'v', [b'a' * 10])
+        self.cache.invalidate('zone')
+
+        self.assertIsNone(self.cache.get('zone', 1, 'v'))
+        self.assertEqual(0, self.cache.bytes)
+
+    def test_stats(self):
+        self.cache.store('zone', 1, 'v', [b'a' * 10, b'b' * 5])
+        self.cache.get('zone', 1, 'v')
+        self.cache.get('zone', 2, 'v')
+
+        self.assertEqual({'hits': 1, 'misses': 1, 'evictions': 0,
+                          'bytes': 15, 'entries': 1}, self.cache.stats())
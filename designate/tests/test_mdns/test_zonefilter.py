@@ -0,0 +1,107 @@
+# Copyright 2015 Hewlett-Packard Development Company, L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import dns.name
+import mock
+
+from designate.tests.test_mdns import MdnsTestCase
+from designate.mdns import zonefilter
+
+
+def _name(text):
+    return dns.name.from_text(text)
+
+
+class BloomFilterTest(MdnsTestCase):
+    def test_bloom_filter(self):
+        bloom = zonefilter.BloomFilter(1000, 0.01)
+
+        keys = [('zone%d.example.com.' % i).encode() for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+
+        # No false negatives
+        self.assertTrue(all(key in bloom for key in keys))
+
+        # And about the false positive rate asked for
+        false_positives = sum(1 for i in range(10000)
+                              if ('zone%d.example.org.' % i).encode() in bloom)
+        self.assertTrue(false_positives < 300)
+
+
+class ZoneFilterTest(MdnsTestCase):
+    def setUp(self):
+        super(ZoneFilterTest, self).setUp()
+
+        self.zone_filter = zonefilter.ZoneFilter(self.storage)
+
+    def test_excludes(self):
+        self.create_domain(name='example.com.')
+
+        # Nothing is refused until the filter is built
+        self.assertFalse(self.zone_filter.excludes(_name('example.org.')))
+
+        self.zone_filter.rebuild()
+
+        self.assertFalse(self.zone_filter.excludes(_name('example.com.')))
+        self.assertFalse(
+            self.zone_filter.excludes(_name('www.a.EXAMPLE.com.')))
+        self.assertTrue(self.zone_filter.excludes(_name('example.org.')))
+        self.assertTrue(self.zone_filter.excludes(_name('com.')))
+
+        self.assertEqual({'zone_filter_rejects': 2,
+                          'zone_filter_rebuilds': 1,
+                          'zone_filter_zones': 1}, self.zone_filter.stats())
+
+    def test_notification(self):
+        self.zone_filter.rebuild()
+        self.assertTrue(self.zone_filter.excludes(_name('example.org.')))
+
+        self.zone_filter.info({}, 'central', 'dns.domain.create',
+                              {'name': 'example.org.'}, {})
+
+        self.assertFalse(self.zone_filter.excludes(_name('example.org.')))
+
+    def test_rebuild_forgets_deleted(self):
+        domain = self.create_domain(name='example.com.')
+        self.zone_filter.rebuild()
+
+        self.storage.delete_domain(self.admin_context, domain.id)
+        self.zone_filter.rebuild()
+
+        self.assertTrue(self.zone_filter.excludes(_name('example.com.')))
+
+    def test_rebuild_keeps_created(self):
+        def _find_domains(context):
+            # A zone created while the rebuild reads from storage
+            self.zone_filter.info({}, 'central', 'dns.domain.create',
+                                  {'name': 'example.org.'}, {})
+            return [{'name': 'example.com.'}]
+
+        with mock.patch.object(self.storage, 'find_domains',
+                               side_effect=_find_domains):
+            self.zone_filter.rebuild()
+
+        self.assertFalse(self.zone_filter.excludes(_name('example.com.')))
+        self.assertFalse(self.zone_filter.excludes(_name('example.org.')))
+
+    def test_rebuild_failure(self):
+        self.zone_filter.rebuild()
+
+        with mock.patch.object(self.storage, 'find_domains',
+                               side_effect=Exception):
+            self.zone_filter.rebuild()
+
+        # The previous filter carries on being used
+        self.assertTrue(self.zone_filter.ready)
+        self.assertEqual(1, self.zone_filter.rebuilds)
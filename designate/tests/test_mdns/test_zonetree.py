@@ -0,0 +1,206 @@
+# Copyright 2015 Hewlett-Packard Development Company, L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+import dns.flags
+import dns.message
+import dns.name
+import dns.rcode
+import dns.rdatatype
+import dns.rrset
+
+from designate import objects
+from designate.tests.test_mdns import MdnsTestCase
+from designate.mdns import zonetree
+
+
+class ZoneTreeTest(MdnsTestCase):
+    def setUp(self):
+        super(ZoneTreeTest, self).setUp()
+
+        self.domain = objects.Domain.from_dict({
+            'id': '2d8e2e3e-0a8b-4fb3-9f3b-8b1ecdaf8ec1',
+            'pool_id': '794ccc2c-d751-44fe-b57f-8894c9f5c842',
+            'name': 'example.com.',
+            'serial': 1427899961,
+            'ttl': 3600,
+            'email': 'example@example.com',
+        })
+
+        rrsets = [
+            ('example.com.', 'SOA', 'ns1.example.org. example.example.com. '
+                                    '1427899961 3600 600 86400 300'),
+            ('example.com.', 'NS', 'ns1.example.org.'),
+            ('mail.example.com.', 'A', '192.0.2.1'),
+            ('a.b.example.com.', 'A', '192.0.2.2'),
+            ('*.wild.example.com.', 'A', '192.0.2.3'),
+            ('www.example.com.', 'CNAME', 'mail.example.com.'),
+            ('deleg.example.com.', 'NS', 'ns.deleg.example.com.'),
+            ('ns.deleg.example.com.', 'A', '192.0.2.53'),
+        ]
+
+        self.zone = zonetree.Zone(
+            self.domain,
+            [dns.rrset.from_text(name, 3600, 'IN', rrtype, data)
+             for name, rrtype, data in rrsets],
+            [dns.name.from_text('sub.example.com.')])
+
+    def _lookup(self, name, rdtype):
+        rcode, answer = self.zone.lookup(
+            dns.name.from_text(name), dns.rdatatype.from_text(rdtype))
+        return rcode, [rrset.to_text() for rrset in answer]
+
+    def test_lookup(self):
+        self.assertEqual(
+            (dns.rcode.NOERROR, ['mail.example.com. 3600 IN A 192.0.2.1']),
+            self._lookup('mail.example.com.', 'A'))
+
+    def test_lookup_nodata(self):
+        self.assertEqual((dns.rcode.NOERROR, []),
+                         self._lookup('mail.example.com.', 'MX'))
+
+    def test_lookup_empty_non_terminal(self):
+        self.assertEqual((dns.rcode.NOERROR, []),
+                         self._lookup('b.example.com.', 'A'))
+
+    def test_lookup_nxdomain(self):
+        self.assertEqual((dns.rcode.NXDOMAIN, []),
+                         self._lookup('missing.example.com.', 'A'))
+
+    def test_lookup_wildcard(self):
+        self.assertEqual(
+            (dns.rcode.NOERROR, ['host.wild.example.com. 3600 IN A '
+                                 '192.0.2.3']),
+            self._lookup('host.wild.example.com.', 'A'))
+
+    def test_lookup_cname(self):
+        self.assertEqual(
+            (dns.rcode.NOERROR, ['www.example.com. 3600 IN CNAME '
+                                 'mail.example.com.']),
+            self._lookup('www.example.com.', 'A'))
+
+    def _respond(self, name, rdtype):
+        response = dns.message.make_response(
+            dns.message.make_query(name, rdtype))
+        self.zone.respond(response, dns.name.from_text(name),
+                          dns.rdatatype.from_text(rdtype))
+        return response
+
+    def test_respond(self):
+        response = self._respond('mail.example.com.', 'MX')
+
+        self.assertEqual(dns.rcode.NOERROR, response.rcode())
+        self.assertTrue(response.flags & dns.flags.AA)
+        self.assertEqual([], response.answer)
+        self.assertEqual([self.zone.negative_soa()], response.authority)
+
+    def test_respond_referral(self):
+        for name in ('deleg.example.com.', 'ns.deleg.example.com.',
+                     'missing.deleg.example.com.'):
+            response = self._respond(name, 'A')
+
+            # Delegated names are referred, not answered authoritatively
+            self.assertEqual(dns.rcode.NOERROR, response.rcode())
+            self.assertFalse(response.flags & dns.flags.AA)
+            self.assertEqual([], response.answer)
+            self.assertEqual(
+                ['deleg.example.com. 3600 IN NS ns.deleg.example.com.'],
+                [rrset.to_text() for rrset in response.authority])
+            self.assertEqual(
+                ['ns.deleg.example.com. 3600 IN A 192.0.2.53'],
+                [rrset.to_text() for rrset in response.additional])
+
+        # The apex NS RRSet isn't a delegation
+        response = self._respond('example.com.', 'NS')
+        self.assertTrue(response.flags & dns.flags.AA)
+        self.assertEqual(['example.com. 3600 IN NS ns1.example.org.'],
+                         [rrset.to_text() for rrset in response.answer])
+
+    def test_referral_ds(self):
+        # The DS RRSet at a delegation is the parent's to answer
+        self.assertIsNone(self.zone.referral(
+            dns.name.from_text('deleg.example.com.'), dns.rdatatype.DS))
+        self.assertIsNotNone(self.zone.referral(
+            dns.name.from_text('x.deleg.example.com.'), dns.rdatatype.DS))
+
+    def test_negative_soa(self):
+        # The negative TTL is the lesser of the SOA TTL and minimum
+        self.assertEqual(300, self.zone.negative_soa().ttl)
+        self.assertEqual(3600, self.zone.soa.ttl)
+
+    def test_permits(self):
+        self.assertTrue(self.zone.permits({'pool_id': self.domain.pool_id}))
+        self.assertTrue(self.zone.permits({'id': self.domain.id}))
+        self.assertFalse(self.zone.permits({'id': 'other'}))
+
+    def test_find(self):
+        tree = zonetree.ZoneTree(10, 5)
+        tree.store(self.zone)
+
+        self.assertIs(self.zone,
+                      tree.find(dns.name.from_text('x.y.example.com.')))
+        self.assertIsNone(tree.find(dns.name.from_text('example.org.')))
+
+        # Names beneath another hosted zone aren't answered from the parent
+        self.assertIsNone(tree.find(dns.name.from_text('x.sub.example.com.')))
+
+        self.assertEqual(1, tree.hits)
+        self.assertEqual(2, tree.misses)
+
+    def test_store_evicts_least_recently_used(self):
+        tree = zonetree.ZoneTree(1, 5)
+        tree.store(self.zone)
+
+        domain = objects.Domain.from_dict({
+            'id': '0c9bd6a9-2ac4-4a4e-9b1f-8ae1b4a0f55b',
+            'pool_id': self.domain.pool_id,
+            'name': 'example.net.',
+            'serial': 1,
+        })
+        tree.store(zonetree.Zone(domain, []))
+
+        self.assertIsNone(tree.find(dns.name.from_text('example.com.')))
+        self.assertEqual(1, tree.evictions)
+
+    def test_store_disabled(self):
+        tree = zonetree.ZoneTree(0, 5)
+
+        self.assertFalse(tree.store(self.zone))
+        self.assertIsNone(tree.find(dns.name.from_text('example.com.')))
+
+    def test_stale(self):
+        tree = zonetree.ZoneTree(10, 5)
+
+        self.assertFalse(tree.stale(self.zone, self.zone.checked + 1))
+        self.assertTrue(tree.stale(self.zone, self.zone.checked + 5))
+
+    def test_invalidate(self):
+        tree = zonetree.ZoneTree(10, 5)
+        tree.store(self.zone)
+        tree.invalidate(self.zone)
+
+        self.assertIsNone(tree.find(dns.name.from_text('example.com.')))
+
+    def test_info(self):
+        tree = zonetree.ZoneTree(10, 5)
+        tree.store(self.zone)
+
+        tree.info({}, 'central', 'dns.domain.update',
+                  {'name': 'new.example.com.'}, {})
+        self.assertIs(self.zone,
+                      tree.find(dns.name.from_text('new.example.com.')))
+
+        # Creating a zone drops its parent, so it's loaded again with a cut
+        # for the new zone
+        tree.info({}, 'central', 'dns.domain.create',
+                  {'name': 'new.example.com.'}, {})
+        self.assertIsNone(tree.find(dns.name.from_text('new.example.com.')))
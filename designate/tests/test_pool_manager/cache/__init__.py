@@ -21,6 +21,9 @@ from designate.pool_manager.cache.base import PoolManagerCache
 
 
 class PoolManagerCacheTestCase(object):
+    # Whether the driver keeps the statuses stored in it
+    retains_statuses = True
+
     def create_pool_manager_status(self):
         values = {
             'nameserver_id': '896aa661-198c-4379-bccd-5d8de7007030',
@@ -45,6 +48,59 @@ class PoolManagerCacheTestCase(object):
                 self.admin_context, expected.nameserver_id, expected.domain_id,
                 expected.action)
 
+    def test_store_many_and_clear_many_and_retrieve_many(self):
+        expected = self.create_pool_manager_status()
+        self.cache.store_many(self.admin_context, [expected])
+
+        # Statuses which are not in the cache are ignored when clearing
+        missing = self.create_pool_manager_status()
+        missing.nameserver_id = '0dcd9a9e-0c4f-4d3a-9d6e-8f1f6e1fc9a4'
+        self.cache.clear_many(self.admin_context, [expected, missing])
+
+        nameserver_ids = [expected.nameserver_id, missing.nameserver_id]
+        actual = self.cache.retrieve_many(
+            self.admin_context, nameserver_ids, expected.domain_id,
+            expected.action)
+
+        self.assertEqual(0, len(actual))
+
+    def test_store_many_and_retrieve_many(self):
+        first = self.create_pool_manager_status()
+        second = self.create_pool_manager_status()
+        second.nameserver_id = '0dcd9a9e-0c4f-4d3a-9d6e-8f1f6e1fc9a4'
+        second.status = None
+        second.serial_number = 0
+        self.cache.store_many(self.admin_context, [first, second])
+
+        nameserver_ids = [first.nameserver_id, second.nameserver_id,
+                          'a6c3c2f5-4d0b-4b7e-9a8c-2e5d8f3b1c70']
+        actual = self.cache.retrieve_many(
+            self.admin_context, nameserver_ids, first.domain_id,
+            first.action)
+
+        if not self.retains_statuses:
+            self.assertEqual(0, len(actual))
+            return
+
+        # Nameservers without a status in the cache are omitted
+        self.assertEqual(2, len(actual))
+        actual = dict((s.nameserver_id, s) for s in actual)
+        self.assertEqual('SUCCESS', actual[first.nameserver_id].status)
+        self.assertEqual(1, actual[first.nameserver_id].serial_number)
+        self.assertIsNone(actual[second.nameserver_id].status)
+        self.assertEqual(0, actual[second.nameserver_id].serial_number)
+
+        # Storing retrieved statuses again updates them
+        actual[second.nameserver_id].status = 'SUCCESS'
+        actual[second.nameserver_id].serial_number = 2
+        self.cache.store_many(self.admin_context, list(actual.values()))
+
+        updated = self.cache.retrieve(
+            self.admin_context, second.nameserver_id, second.domain_id,
+            second.action)
+        self.assertEqual('SUCCESS', updated.status)
+        self.assertEqual(2, updated.serial_number)
+
     def test_retrieve(self):
         expected = self.create_pool_manager_status()
         with testtools.ExpectedException(exceptions.PoolManagerStatusNotFound):
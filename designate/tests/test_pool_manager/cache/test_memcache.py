@@ -45,22 +45,12 @@ class MemcachePoolManagerCacheTest(PoolManagerCacheTestCase, TestCase):
         self.assertEqual(expected.serial_number, actual.serial_number)
         self.assertEqual(expected.action, actual.action)
 
-    def test_serial_number_key_is_a_string(self):
+    def test_key_is_a_string(self):
         """Memcache requires keys be strings.
 
         RabbitMQ messages are unicode by default, so any string
         interpolation requires explicit encoding.
         """
-        key = self.cache._build_serial_number_key(self.mock_status)
+        key = self.cache._build_key(self.mock_status)
         self.assertIsInstance(key, str)
-        self.assertEqual(key, 'nameserver_id-domain_id-CREATE-serial_number')
-
-    def test_status_key_is_a_string(self):
-        """Memcache requires keys be strings.
-
-        RabbitMQ messages are unicode by default, so any string
-        interpolation requires explicit encoding.
-        """
-        key = self.cache._build_status_key(self.mock_status)
-        self.assertIsInstance(key, str)
-        self.assertEqual(key, 'nameserver_id-domain_id-CREATE-status')
+        self.assertEqual(key, 'nameserver_id-domain_id-CREATE')
@@ -22,6 +22,8 @@ from designate.tests.test_pool_manager.cache import PoolManagerCacheTestCase
 
 
 class NoopPoolManagerCacheTest(PoolManagerCacheTestCase, TestCase):
+    retains_statuses = False
+
     def setUp(self):
         super(NoopPoolManagerCacheTest, self).setUp()
 
@@ -0,0 +1,88 @@
+# Copyright 2015 Hewlett-Packard Development Company, L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+from designate import objects
+from designate.pool_manager import consensus
+from designate.tests.test_pool_manager import PoolManagerTestCase
+
+
+def _status(nameserver_id, status, serial_number):
+    return objects.PoolManagerStatus(
+        nameserver_id=nameserver_id, domain_id='domain', action='UPDATE',
+        status=status, serial_number=serial_number)
+
+
+class ConsensusTrackerTest(PoolManagerTestCase):
+    def test_required(self):
+        tracker = consensus.ConsensusTracker(3, 10)
+
+        self.assertEqual(0, tracker.required(0))
+        self.assertEqual(2, tracker.required(50))
+        self.assertEqual(2, tracker.required(66))
+        self.assertEqual(3, tracker.required(67))
+        self.assertEqual(3, tracker.required(100))
+
+    def test_consensus_serial(self):
+        tracker = consensus.ConsensusTracker(4, 10)
+        domain_consensus = tracker.track('domain', 'UPDATE', [
+            _status('ns1', 'SUCCESS', 5),
+            _status('ns2', 'SUCCESS', 3),
+            _status('ns3', None, 0),
+        ])
+
+        self.assertEqual(0, domain_consensus.consensus_serial(100))
+        self.assertEqual(3, domain_consensus.consensus_serial(50))
+        self.assertEqual(5, domain_consensus.consensus_serial(25))
+
+        # A nameserver reporting moves its serial, rather than adding one
+        domain_consensus.update(domain_consensus.get('ns3'), 'SUCCESS', 5)
+        self.assertEqual(5, domain_consensus.consensus_serial(50))
+        self.assertEqual(0, domain_consensus.consensus_serial(100))
+
+        domain_consensus.add(_status('ns4', 'SUCCESS', 4))
+        self.assertEqual(3, domain_consensus.consensus_serial(100))
+        self.assertEqual(4, domain_consensus.consensus_serial(75))
+
+        self.assertTrue(domain_consensus.is_consensus('SUCCESS', 100))
+
+    def test_error_serial(self):
+        tracker = consensus.ConsensusTracker(3, 10)
+        domain_consensus = tracker.track('domain', 'UPDATE', [
+            _status('ns1', 'ERROR', 4),
+            _status('ns2', 'ERROR', 7),
+            _status('ns3', 'SUCCESS', 9),
+        ])
+
+        # The lowest serial above the consensus, once enough are in error
+        self.assertEqual(4, domain_consensus.error_serial(0, 50))
+        self.assertEqual(7, domain_consensus.error_serial(4, 50))
+        self.assertEqual(0, domain_consensus.error_serial(9, 50))
+        self.assertEqual(0, domain_consensus.error_serial(0, 100))
+
+    def test_track_and_forget(self):
+        tracker = consensus.ConsensusTracker(2, 2)
+
+        first = tracker.track('domain1', 'UPDATE', [])
+        tracker.track('domain2', 'UPDATE', [])
+
+        # Getting a domain makes it the most recently used
+        self.assertIs(first, tracker.get('domain1', 'UPDATE'))
+        tracker.track('domain3', 'CREATE', [])
+
+        self.assertEqual(2, len(tracker))
+        self.assertIsNone(tracker.get('domain2', 'UPDATE'))
+        self.assertIs(first, tracker.get('domain1', 'UPDATE'))
+
+        tracker.forget('domain1', ['CREATE', 'UPDATE'])
+        self.assertIsNone(tracker.get('domain1', 'UPDATE'))
+        self.assertIsNotNone(tracker.get('domain3', 'CREATE'))
@@ -13,8 +13,13 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import time
+
+import eventlet
+import eventlet.event
 import oslo_messaging as messaging
 from oslo_config import cfg
+from mock import ANY
 from mock import call
 from mock import patch
 
@@ -23,6 +28,7 @@ from designate import objects
 from designate.backend import impl_fake
 from designate.central import rpcapi as central_rpcapi
 from designate.mdns import rpcapi as mdns_rpcapi
+from designate.pool_manager import service as pool_manager_service
 from designate.tests.test_pool_manager import PoolManagerTestCase
 
 
@@ -40,6 +46,11 @@ class PoolManagerServiceNoopTest(PoolManagerTestCase):
             cache_driver='noop',
             group='service:pool_manager')
 
+        # Track nothing in memory either, so every status comes from mdns
+        self.config(
+            consensus_tracker_size=0,
+            group='service:pool_manager')
+
         # TODO(kiall): Rework all this pool config etc into a fixture..
         # Configure the Pool ID
         self.config(
@@ -116,12 +127,12 @@ class PoolManagerServiceNoopTest(PoolManagerTestCase):
 
     @patch.object(mdns_rpcapi.MdnsAPI, 'get_serial_number',
                   side_effect=messaging.MessagingException)
-    @patch.object(mdns_rpcapi.MdnsAPI, 'poll_for_serial_number')
+    @patch.object(mdns_rpcapi.MdnsAPI, 'poll_for_serial_numbers')
     @patch.object(mdns_rpcapi.MdnsAPI, 'notify_zone_changed')
     @patch.object(central_rpcapi.CentralAPI, 'update_status')
     def test_create_domain(
             self, mock_update_status, mock_notify_zone_changed,
-            mock_poll_for_serial_number, _):
+            mock_poll_for_serial_numbers, _):
 
         domain = self._build_domain('example.org.', 'CREATE', 'PENDING')
 
@@ -133,14 +144,15 @@ class PoolManagerServiceNoopTest(PoolManagerTestCase):
         # not return any status
         self.assertEqual(0, len(create_statuses))
 
-        # Ensure poll_for_serial_number was called for each nameserver.
-        self.assertEqual(2, mock_poll_for_serial_number.call_count)
+        # Ensure poll_for_serial_numbers was called once, for each
+        # nameserver.
+        self.assertEqual(1, mock_poll_for_serial_numbers.call_count)
         self.assertEqual(
-            [call(self.admin_context, domain,
-                  self.service.pool.nameservers[0], 30, 0.5, 1, 5),
-             call(self.admin_context, domain,
-                  self.service.pool.nameservers[1], 30, 0.5, 1, 5)],
-            mock_poll_for_serial_number.call_args_list)
+            [call(self.admin_context,
+                  [(domain, self.service.pool.nameservers[0]),
+                   (domain, self.service.pool.nameservers[1])],
+                  30, 0.5, 1, 5)],
+            mock_poll_for_serial_numbers.call_args_list)
 
         # Pool manager needs to call into mdns to calculate consensus as
         # there is no cache. So update_status is never called.
@@ -149,12 +161,12 @@ class PoolManagerServiceNoopTest(PoolManagerTestCase):
     @patch.object(mdns_rpcapi.MdnsAPI, 'get_serial_number',
                   side_effect=messaging.MessagingException)
     @patch.object(impl_fake.FakeBackend, 'create_domain')
-    @patch.object(mdns_rpcapi.MdnsAPI, 'poll_for_serial_number')
+    @patch.object(mdns_rpcapi.MdnsAPI, 'poll_for_serial_numbers')
     @patch.object(mdns_rpcapi.MdnsAPI, 'notify_zone_changed')
     @patch.object(central_rpcapi.CentralAPI, 'update_status')
     def test_create_domain_target_both_failure(
             self, mock_update_status, mock_notify_zone_changed,
-            mock_poll_for_serial_number, mock_create_domain, _):
+            mock_poll_for_serial_numbers, mock_create_domain, _):
 
         domain = self._build_domain('example.org.', 'CREATE', 'PENDING')
 
@@ -166,10 +178,10 @@ class PoolManagerServiceNoopTest(PoolManagerTestCase):
             self.admin_context, domain, 'CREATE')
         self.assertEqual(0, len(create_statuses))
 
-        # Ensure notify_zone_changed and poll_for_serial_number
+        # Ensure notify_zone_changed and poll_for_serial_numbers
         # were never called.
         self.assertFalse(mock_notify_zone_changed.called)
-        self.assertFalse(mock_poll_for_serial_number.called)
+        self.assertFalse(mock_poll_for_serial_numbers.called)
 
         # Since consensus is not reached this early, we immediatly call
         # central's update_status.
@@ -178,12 +190,12 @@ class PoolManagerServiceNoopTest(PoolManagerTestCase):
     @patch.object(mdns_rpcapi.MdnsAPI, 'get_serial_number',
                   side_effect=messaging.MessagingException)
     @patch.object(impl_fake.FakeBackend, 'create_domain')
-    @patch.object(mdns_rpcapi.MdnsAPI, 'poll_for_serial_number')
+    @patch.object(mdns_rpcapi.MdnsAPI, 'poll_for_serial_numbers')
     @patch.object(mdns_rpcapi.MdnsAPI, 'notify_zone_changed')
     @patch.object(central_rpcapi.CentralAPI, 'update_status')
     def test_create_domain_target_one_failure(
             self, mock_update_status, mock_notify_zone_changed,
-            mock_poll_for_serial_number, mock_create_domain, _):
+            mock_poll_for_serial_numbers, mock_create_domain, _):
 
         domain = self._build_domain('example.org.', 'CREATE', 'PENDING')
 
@@ -202,12 +214,12 @@ class PoolManagerServiceNoopTest(PoolManagerTestCase):
     @patch.object(mdns_rpcapi.MdnsAPI, 'get_serial_number',
                   side_effect=messaging.MessagingException)
     @patch.object(impl_fake.FakeBackend, 'create_domain')
-    @patch.object(mdns_rpcapi.MdnsAPI, 'poll_for_serial_number')
+    @patch.object(mdns_rpcapi.MdnsAPI, 'poll_for_serial_numbers')
     @patch.object(mdns_rpcapi.MdnsAPI, 'notify_zone_changed')
     @patch.object(central_rpcapi.CentralAPI, 'update_status')
     def test_create_domain_target_one_failure_consensus(
             self, mock_update_status, mock_notify_zone_changed,
-            mock_poll_for_serial_number, mock_create_domain, _):
+            mock_poll_for_serial_numbers, mock_create_domain, _):
 
         self.service.stop()
         self.config(
@@ -225,13 +237,13 @@ class PoolManagerServiceNoopTest(PoolManagerTestCase):
             self.admin_context, domain, 'CREATE')
         self.assertEqual(0, len(create_statuses))
 
-        # Ensure poll_for_serial_number was called for each nameserver.
+        # Ensure poll_for_serial_numbers was called for each nameserver.
         self.assertEqual(
-            [call(self.admin_context, domain,
-                  self.service.pool.nameservers[0], 30, 0.5, 1, 5),
-             call(self.admin_context, domain,
-                  self.service.pool.nameservers[1], 30, 0.5, 1, 5)],
-            mock_poll_for_serial_number.call_args_list)
+            [call(self.admin_context,
+                  [(domain, self.service.pool.nameservers[0]),
+                   (domain, self.service.pool.nameservers[1])],
+                  30, 0.5, 1, 5)],
+            mock_poll_for_serial_numbers.call_args_list)
 
         self.assertFalse(mock_update_status.called)
 
@@ -294,6 +306,106 @@ class PoolManagerServiceNoopTest(PoolManagerTestCase):
         mock_update_status.assert_called_once_with(
             self.admin_context, domain.id, 'ERROR', domain.serial)
 
+    @patch.object(mdns_rpcapi.MdnsAPI, 'poll_for_serial_numbers')
+    @patch.object(impl_fake.FakeBackend, 'update_domain')
+    @patch.object(central_rpcapi.CentralAPI, 'update_status')
+    def test_update_domain_targets_concurrent(
+            self, mock_update_status, mock_update_domain, _):
+
+        domain = self._build_domain('example.org.', 'UPDATE', 'PENDING')
+
+        mock_update_domain.side_effect = lambda *args: eventlet.sleep(0.5)
+
+        start = time.time()
+        self.service.update_domain(self.admin_context, domain)
+
+        # Both targets were updated at once
+        self.assertEqual(2, mock_update_domain.call_count)
+        self.assertTrue(time.time() - start < 0.9)
+        self.assertFalse(mock_update_status.called)
+
+    @patch.object(mdns_rpcapi.MdnsAPI, 'poll_for_serial_numbers')
+    @patch.object(impl_fake.FakeBackend, 'create_domain')
+    @patch.object(central_rpcapi.CentralAPI, 'update_status')
+    def test_create_domain_target_slow_consensus(
+            self, mock_update_status, mock_create_domain,
+            mock_poll_for_serial_numbers):
+
+        self.service.stop()
+        self.config(
+            threshold_percentage=50,
+            group='service:pool_manager')
+        self.service = self.start_service('pool_manager')
+
+        domain = self._build_domain('example.org.', 'CREATE', 'PENDING')
+
+        # The first target is slow to respond
+        delays = [2, 0]
+        mock_create_domain.side_effect = \
+            lambda *args: eventlet.sleep(delays.pop(0))
+
+        start = time.time()
+        self.service.create_domain(self.admin_context, domain)
+
+        # Consensus was reached without waiting on the slow target
+        self.assertTrue(time.time() - start < 1)
+        self.assertTrue(mock_poll_for_serial_numbers.called)
+        self.assertFalse(mock_update_status.called)
+
+    @patch.object(mdns_rpcapi.MdnsAPI, 'poll_for_serial_numbers')
+    @patch.object(central_rpcapi.CentralAPI, 'update_status')
+    def test_create_domain_target_down(
+            self, mock_update_status, mock_poll_for_serial_numbers):
+
+        self.service.stop()
+        self.config(
+            threshold_percentage=50,
+            target_concurrency=1,
+            group='service:pool_manager')
+        self.service = self.start_service('pool_manager')
+
+        # The first target never answers, until the test is over
+        answer = eventlet.event.Event()
+        self.addCleanup(answer.send)
+
+        target = self.service.pool.targets[0]
+        backend = self.service.target_backends[target.id]
+
+        start = time.time()
+        with patch.object(backend, 'create_domain',
+                          side_effect=lambda *args: answer.wait()):
+            for name in ('example.org.', 'example.net.', 'example.com.'):
+                domain = self._build_domain(name, 'CREATE', 'PENDING')
+                self.service.create_domain(self.admin_context, domain)
+
+        # The operations waiting on the first target didn't hold up those on
+        # the second
+        self.assertTrue(time.time() - start < 1)
+        self.assertEqual(3, mock_poll_for_serial_numbers.call_count)
+        self.assertFalse(mock_update_status.called)
+
+    @patch.object(impl_fake.FakeBackend, 'delete_domain')
+    @patch.object(central_rpcapi.CentralAPI, 'update_status')
+    def test_delete_domain_target_failure_early(
+            self, mock_update_status, mock_delete_domain):
+
+        domain = self._build_domain('example.org.', 'DELETE', 'PENDING')
+
+        def _delete_domain(context, domain):
+            if mock_delete_domain.call_count == 1:
+                raise exceptions.Backend()
+            eventlet.sleep(2)
+
+        mock_delete_domain.side_effect = _delete_domain
+
+        start = time.time()
+        self.service.delete_domain(self.admin_context, domain)
+
+        # Deletes need every target, so the first failure decides them
+        self.assertTrue(time.time() - start < 1.5)
+        mock_update_status.assert_called_once_with(
+            self.admin_context, domain.id, 'ERROR', domain.serial)
+
     @patch.object(mdns_rpcapi.MdnsAPI, 'get_serial_number',
                   side_effect=messaging.MessagingException)
     @patch.object(central_rpcapi.CentralAPI, 'update_status')
@@ -323,6 +435,23 @@ class PoolManagerServiceNoopTest(PoolManagerTestCase):
         # Ensure update_status was not called.
         self.assertFalse(mock_update_status.called)
 
+    @patch.object(pool_manager_service.Service, 'update_status')
+    def test_update_status_many(self, mock_update_status):
+        domain = self._build_domain('example.org.', 'UPDATE', 'PENDING')
+        nameservers = self.service.pool.nameservers
+
+        self.service.update_status_many(self.admin_context, [
+            (domain, nameservers[0], 'SUCCESS', domain.serial),
+            (domain, nameservers[1], 'ERROR', None),
+        ])
+
+        self.assertEqual(
+            [call(self.admin_context, domain, nameservers[0], 'SUCCESS',
+                  domain.serial),
+             call(self.admin_context, domain, nameservers[1], 'ERROR',
+                  None)],
+            mock_update_status.call_args_list)
+
     @patch.object(mdns_rpcapi.MdnsAPI, 'get_serial_number',
                   side_effect=messaging.MessagingException)
     @patch.object(central_rpcapi.CentralAPI, 'update_status')
@@ -419,3 +548,140 @@ class PoolManagerServiceNoopTest(PoolManagerTestCase):
 
         mock_update_status.assert_called_once_with(
             self.admin_context, domain.id, 'ERROR', 0)
+
+    @patch.object(mdns_rpcapi.MdnsAPI, 'get_serial_number',
+                  side_effect=messaging.MessagingException)
+    @patch.object(central_rpcapi.CentralAPI, 'update_status')
+    def test_update_status_tracked(self, mock_update_status,
+                                   mock_get_serial_number):
+
+        self.service.stop()
+        self.config(
+            consensus_tracker_size=10,
+            group='service:pool_manager')
+        self.service = self.start_service('pool_manager')
+
+        domain = self._build_domain('example.org.', 'UPDATE', 'PENDING')
+
+        self.service.update_status(self.admin_context, domain,
+                                   self.service.pool.nameservers[0],
+                                   'SUCCESS', domain.serial)
+
+        # Untracked statuses are asked of mdns once, when first tracked
+        self.assertEqual(2, mock_get_serial_number.call_count)
+        self.assertFalse(mock_update_status.called)
+
+        self.service.update_status(self.admin_context, domain,
+                                   self.service.pool.nameservers[1],
+                                   'SUCCESS', domain.serial)
+
+        self.assertEqual(2, mock_get_serial_number.call_count)
+        mock_update_status.assert_called_once_with(
+            self.admin_context, domain.id, 'SUCCESS', domain.serial)
+
+        # Every nameserver has the change, so it is no longer tracked
+        self.assertIsNone(self.service.consensus_tracker.get(
+            domain.id, 'UPDATE'))
+
+    @patch.object(pool_manager_service.Service, 'update_domain')
+    @patch.object(central_rpcapi.CentralAPI, 'find_domains')
+    def test_periodic_sync_watermark(self, mock_find_domains,
+                                     mock_update_domain):
+        self.config(periodic_sync_sample=0, periodic_sync_interval=100,
+                    group='service:pool_manager')
+
+        domain = self._build_domain('example.org.', 'UPDATE', 'ACTIVE')
+        mock_find_domains.return_value = [domain]
+
+        def _sync(serial):
+            mock_find_domains.reset_mock()
+            with patch.object(pool_manager_service.utils, 'increment_serial',
+                              return_value=serial):
+                self.service.periodic_sync()
+            return mock_find_domains.call_args[0][1]['serial']
+
+        # The first sync covers the last periodic_sync_seconds
+        self.assertEqual('>%d' % (1000 - 21600), _sync(1000))
+        mock_update_domain.assert_called_once_with(ANY, domain)
+
+        # Later ones only the domains changed since the last success, with
+        # an interval to spare for late commits and clock skew
+        self.assertEqual('>900', _sync(2000))
+
+        mock_update_domain.side_effect = exceptions.Backend
+        self.assertEqual('>1900', _sync(3000))
+        self.assertEqual('>1900', _sync(4000))
+
+    @patch.object(pool_manager_service, 'SYNC_PAGE_SIZE', 2)
+    @patch.object(pool_manager_service.Service, 'update_domain')
+    @patch.object(central_rpcapi.CentralAPI, 'find_domains')
+    def test_periodic_sync_pages(self, mock_find_domains, mock_update_domain):
+        self.config(periodic_sync_sample=2, group='service:pool_manager')
+
+        domains = []
+        for i in range(4):
+            domain = self._build_domain(
+                'example%d.org.' % i, 'UPDATE', 'ACTIVE')
+            domain.id = '75ea1626-eea7-46b5-acb7-41e5897c2d4%d' % i
+            domains.append(domain)
+
+        changed, sampled = domains[:3], domains[3]
+
+        def _find_domains(context, criterion, marker=None, limit=None,
+                          sort_key=None):
+            # The sample isn't limited to the changed domains
+            if 'serial' not in criterion:
+                return [changed[0], sampled]
+
+            start = 0
+            if marker is not None:
+                start = [d.id for d in changed].index(marker) + 1
+            return changed[start:start + limit]
+
+        mock_find_domains.side_effect = _find_domains
+
+        self.service.periodic_sync()
+
+        # Two pages of changed domains, then the sample
+        self.assertEqual(
+            [None, changed[1].id, None],
+            [c[1].get('marker') for c in mock_find_domains.call_args_list])
+
+        # Each domain is only synchronized once
+        self.assertEqual(
+            sorted(d.id for d in domains),
+            sorted(c[0][1].id for c in mock_update_domain.call_args_list))
+
+    @patch.object(central_rpcapi.CentralAPI, 'find_domains')
+    def test_rebalance(self, mock_find_domains):
+        mock_find_domains.return_value = []
+
+        self.service.stop()
+        self.config(
+            consensus_tracker_size=10,
+            group='service:pool_manager')
+        self.service = self.start_service('pool_manager')
+
+        # Without coordination this is the only Pool Manager of the pool
+        self.assertEqual((0, 4095), self.service._shards)
+        self.assertEqual(10, self.service.consensus_tracker.size)
+
+        # Another has joined, and taken half of the shards
+        self.service._rebalance(list(range(0, 2048)), ['a', 'b'], None)
+        self.assertEqual(0, self.service.consensus_tracker.size)
+
+        self.service.periodic_recovery()
+        self.assertEqual(3, mock_find_domains.call_count)
+        for c in mock_find_domains.call_args_list:
+            self.assertEqual('BETWEEN 0,2047', c[0][1]['shard'])
+
+        # With no shards left to it, nothing is recovered or synchronized
+        mock_find_domains.reset_mock()
+        self.service._rebalance([], ['a', 'b', 'c'], None)
+
+        self.service.periodic_recovery()
+        self.service.periodic_sync()
+        self.assertFalse(mock_find_domains.called)
+
+        self.service._rebalance(list(range(0, 4096)), ['a'], None)
+        self.assertEqual(10, self.service.consensus_tracker.size)
@@ -13,6 +13,7 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import datetime
 import uuid
 import math
 
@@ -20,6 +21,7 @@ import mock
 import testtools
 from oslo_config import cfg
 from oslo_log import log as logging
+from oslo_utils import timeutils
 
 from designate import exceptions
 from designate import objects
@@ -576,6 +578,21 @@ class StorageTestCase(object):
         self.assertEqual(results[0]['email'], domain_two['email'])
         self.assertIn('status', domain_two)
 
+    def test_find_domains_criterion_list(self):
+        domain_one = self.create_domain()
+        domain_two = self.create_domain(fixture=1)
+        self.create_domain(fixture=2)
+
+        criterion = dict(
+            name=[domain_one['name'], domain_two['name'], 'missing.org.']
+        )
+
+        results = self.storage.find_domains(self.admin_context, criterion)
+
+        self.assertEqual(
+            sorted([domain_one['name'], domain_two['name']]),
+            sorted(r['name'] for r in results))
+
     def test_find_domains_all_tenants(self):
         # Create two contexts with different tenant_id's
         one_context = self.get_admin_context()
@@ -1484,6 +1501,30 @@ class StorageTestCase(object):
         records = self.storage.count_records(self.admin_context)
         self.assertEqual(records, 0)
 
+    def test_find_recordsets_axfr(self):
+        domain = self.create_domain()
+        recordset = self.create_recordset(domain)
+        self.create_record(domain, recordset)
+
+        criterion = {'domain_id': domain.id, 'type': '!SOA'}
+        records = list(self.storage.find_recordsets_axfr(
+            self.admin_context, criterion))
+
+        # The NS record created along with the domain, and our own record
+        self.assertEqual(2, len(records))
+        self.assertEqual(sorted(records, key=lambda r: (r[0], r[1])),
+                         records)
+
+        for name, type_, ttl, data in records:
+            self.assertNotEqual('SOA', type_)
+
+        criterion = {'domain_id': domain.id, 'type': 'SOA'}
+        records = list(self.storage.find_recordsets_axfr(
+            self.admin_context, criterion))
+
+        self.assertEqual(1, len(records))
+        self.assertEqual(domain.name, records[0][0])
+
     def test_count_records_none_result(self):
         rp = mock.Mock()
         rp.fetchone.return_value = None
@@ -1492,6 +1533,71 @@ class StorageTestCase(object):
             records = self.storage.count_records(self.admin_context)
             self.assertEqual(records, 0)
 
+    # Zone Journal Tests
+    def _journal_entries(self, serial, count=1):
+        return [{
+            'serial': serial,
+            'previous_serial': serial - 1,
+            'operation': 'ADD',
+            'name': 'www.%d.example.com.' % i,
+            'type': 'A',
+            'ttl': 3600,
+            'data': '192.0.2.%d' % i,
+        } for i in range(count)]
+
+    def test_find_journal_entries(self):
+        domain = self.create_domain()
+
+        for serial in (11, 12, 13):
+            self.storage.create_journal_entries(
+                self.admin_context, domain.id,
+                self._journal_entries(serial, 2))
+
+        entries = self.storage.find_journal_entries(
+            self.admin_context, domain.id, 11)
+
+        # Only the entries newer than the given serial, oldest first
+        self.assertEqual(4, len(entries))
+        self.assertEqual([12, 12, 13, 13], [e['serial'] for e in entries])
+        self.assertEqual('ADD', entries[0]['operation'])
+
+    def test_delete_journal_entries(self):
+        domain = self.create_domain()
+        self.storage.create_journal_entries(
+            self.admin_context, domain.id, self._journal_entries(11))
+
+        self.storage.delete_journal_entries(self.admin_context, domain.id)
+
+        entries = self.storage.find_journal_entries(
+            self.admin_context, domain.id, 0)
+        self.assertEqual(0, len(entries))
+
+    def test_purge_journal_max_versions(self):
+        domain = self.create_domain()
+
+        for serial in (11, 12, 13, 14):
+            self.storage.create_journal_entries(
+                self.admin_context, domain.id,
+                self._journal_entries(serial, 2))
+
+        count = self.storage.purge_journal(
+            self.admin_context, max_versions=2)
+        self.assertEqual(4, count)
+
+        entries = self.storage.find_journal_entries(
+            self.admin_context, domain.id, 0)
+        self.assertEqual([13, 13, 14, 14], [e['serial'] for e in entries])
+
+    def test_purge_journal_created_before(self):
+        domain = self.create_domain()
+        self.storage.create_journal_entries(
+            self.admin_context, domain.id, self._journal_entries(11))
+
+        created_before = timeutils.utcnow() + datetime.timedelta(seconds=60)
+        count = self.storage.purge_journal(
+            self.admin_context, created_before=created_before)
+        self.assertEqual(1, count)
+
     def test_ping(self):
         pong = self.storage.ping(self.admin_context)
 
@@ -32,6 +32,7 @@ from oslo_utils import timeutils
 from designate import exceptions
 from designate.i18n import _
 from designate.i18n import _LI
+from designate.i18n import _LW
 from designate.openstack.common.report import guru_meditation_report as gmr
 from designate import version as designate_version
 
@@ -466,10 +467,13 @@ def bind_tcp(host, port, tcp_backlog, tcp_keepidle=None):
     sock_tcp.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
 
     # NOTE: Linux supports socket.SO_REUSEPORT only in 3.9 and later releases.
+    #       Without it, only a single worker process can bind to the port.
     try:
         sock_tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
     except Exception:
-        pass
+        LOG.warning(_LW('SO_REUSEPORT is not supported, only one process '
+                        'can listen on %(host)s:%(port)d') %
+                    {'host': host, 'port': port})
 
     # This option isn't available in the OS X version of eventlet
     if tcp_keepidle and hasattr(socket, 'TCP_KEEPIDLE'):
@@ -492,10 +496,13 @@ def bind_udp(host, port):
     sock_udp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 
     # NOTE: Linux supports socket.SO_REUSEPORT only in 3.9 and later releases.
+    #       Without it, only a single worker process can bind to the port.
     try:
         sock_udp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
     except Exception:
-        pass
+        LOG.warning(_LW('SO_REUSEPORT is not supported, only one process '
+                        'can listen on %(host)s:%(port)d') %
+                    {'host': host, 'port': port})
 
     sock_udp.setblocking(True)
     sock_udp.bind((host, port))
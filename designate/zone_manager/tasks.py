@@ -146,6 +146,56 @@ class DeletedDomainPurgeTask(PeriodicTask):
         )
 
 
+class JournalPurgeTask(PeriodicTask):
+    """Purge zone journal entries that are too old, or that exceed the number
+    of versions retained per zone. Clients asking for an IXFR from a serial
+    that has been purged receive a full AXFR instead.
+    """
+
+    __plugin_name__ = 'journal_purge'
+    __interval__ = 3600
+
+    def __init__(self):
+        super(JournalPurgeTask, self).__init__()
+
+    @classmethod
+    def get_cfg_opts(cls):
+        group = cfg.OptGroup(cls.get_canonical_name())
+        options = cls.get_base_opts() + [
+            cfg.IntOpt(
+                'time_threshold',
+                default=604800,
+                help="How old journal entries should be (created_at) to be "
+                "purged, in seconds"
+            ),
+            cfg.IntOpt(
+                'max_versions',
+                default=100,
+                help='How many zone versions to retain in the journal for '
+                'each zone, 0 to retain all'
+            ),
+        ]
+        return [(group, options)]
+
+    def __call__(self):
+        """Call the Central API to purge old entries from the zone journal.
+        """
+        LOG.debug("Purging zone journal entries older than %s seconds",
+                  self.options.time_threshold)
+
+        ctxt = context.DesignateContext.get_admin_context()
+        ctxt.all_tenants = True
+
+        count = self.central_api.purge_journal(
+            ctxt,
+            max_age=self.options.time_threshold or None,
+            max_versions=self.options.max_versions or None,
+        )
+
+        LOG.info(_LI("Purged %(count)s zone journal entries") %
+                 {"count": count})
+
+
 class PeriodicExistsTask(PeriodicTask):
     __plugin_name__ = 'periodic_exists'
     __interval__ = 3600